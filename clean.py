@@ -4,12 +4,13 @@ from typing import Callable, List
 import sys, argparse
 import pandas as pd
 import numpy as np
-from copy import deepcopy
+from pdastro import pdrowbuffer
 from lightcurve import (
     DEFAULT_CUT_NAMES,
     Cut,
     CutList,
     LimCutsTable,
+    LightCurveView,
     SnInfoTable,
     Supernova,
     AveragedSupernova,
@@ -206,7 +207,19 @@ class OutputReadMe:
         self.f.close()
 
 
-class UncertEstTable:
+class UncertEstTable(pdrowbuffer):
+    # dtypes of the added rows
+    coldtypes = {
+        "tnsname": object,
+        "filter": object,
+        "sigma_extra": np.float64,
+        "sigma_typical_old": np.float64,
+        "sigma_typical_new": np.float64,
+        "sigma_typical_new_pct_greater": np.float64,
+        "recommended": bool,
+        "applied": bool,
+    }
+
     def __init__(self, directory, filename=None):
         if filename is None:
             self.filename = f"{directory}/uncert_est_info.txt"
@@ -255,10 +268,10 @@ class UncertEstTable:
                 self.t.loc[idx, :] = row
             else:
                 # new row
-                self.t = pd.concat([self.t, pd.DataFrame([row])], ignore_index=True)
+                self.appendrow(row)
         else:
             # new row
-            self.t = pd.concat([self.t, pd.DataFrame([row])], ignore_index=True)
+            self.appendrow(row)
 
     def save(self):
         print(f"\nSaving true uncertainties estimation table at {self.filename}...")
@@ -266,7 +279,18 @@ class UncertEstTable:
         print("Success")
 
 
-class ChiSquareCutTable:
+class ChiSquareCutTable(pdrowbuffer):
+    # dtypes of the added rows
+    coldtypes = {
+        "tnsname": object,
+        "filter": object,
+        "x2_cut": np.float64,
+        "use_pre_mjd0_lc": bool,
+        "stn_bound": np.float64,
+        "pct_contamination": np.float64,
+        "pct_loss": np.float64,
+    }
+
     def __init__(self, directory, filename=None):
         if filename is None:
             self.filename = f"{directory}/x2_cut_info.txt"
@@ -310,10 +334,10 @@ class ChiSquareCutTable:
                 self.t.loc[idx, :] = row
             else:
                 # new row
-                self.t = pd.concat([self.t, pd.DataFrame([row])], ignore_index=True)
+                self.appendrow(row)
         else:
             # new row
-            self.t = pd.concat([self.t, pd.DataFrame([row])], ignore_index=True)
+            self.appendrow(row)
 
     def save(self):
         print(f"\nSaving chi-square cut table at {self.filename}...")
@@ -451,18 +475,23 @@ class CleanLoop:
                 raise RuntimeError(
                     "ERROR: MJD0 cannot be None. Please provide MJD0 throught the SN info table or --mjd0 argument, or set the use_pre_MJD0_lc field in the config file to False."
                 )
-            lc_temp = deepcopy(self.sn.lcs[0])
-            ix = lc_temp.ix_inrange("MJD", uplim=self.sn.mjd0)
+            lc_view = LightCurveView(
+                [self.sn.lcs[0]],
+                positions=[
+                    self.sn.lcs[0].getpositions(
+                        self.sn.lcs[0].ix_inrange("MJD", uplim=self.sn.mjd0)
+                    )
+                ],
+            )
         else:
             print("Using control light curves to determine contamination and loss")
             if self.sn.num_controls < 1:
                 raise RuntimeError(
                     "ERROR: No control light curves loaded. Use the --num_controls argument to load control light curves, or change the [x2_cut][use_pre_mjd0_lc] field to True."
                 )
-            lc_temp = self.sn.get_all_controls()
-            ix = lc_temp.t.index.values
+            lc_view = self.sn.get_controls_view()
 
-        limcuts = LimCutsTable(lc_temp, cut.params["stn_bound"], indices=ix)
+        limcuts = LimCutsTable(lc_view, cut.params["stn_bound"])
         limcuts.calculate_table(
             cut.params["min_cut"], cut.params["max_cut"], cut.params["cut_step"]
         )
@@ -815,9 +844,9 @@ def parse_config_cuts(args, config):
     if args.x2_cut:
         params = {
             "stn_bound": float(config["x2_cut"]["stn_bound"]),
-            "min_cut": int(config["x2_cut"]["min_cut"]),
-            "max_cut": int(config["x2_cut"]["max_cut"]),
-            "cut_step": int(config["x2_cut"]["cut_step"]),
+            "min_cut": float(config["x2_cut"]["min_cut"]),
+            "max_cut": float(config["x2_cut"]["max_cut"]),
+            "cut_step": float(config["x2_cut"]["cut_step"]),
             "use_pre_mjd0_lc": config["x2_cut"]["use_pre_mjd0_lc"] == "True",
         }
         x2_cut = Cut(
@@ -20,6 +20,7 @@ from getpass import getpass
 from astropy import units as u
 from astropy.coordinates import Angle, SkyCoord
 from lightcurve import Coordinates, Credentials, SnInfoTable, FullLightCurve
+from pdastro import pdrowbuffer
 
 CTRL_COORDINATES_COLNAMES = [
     "tnsname",
@@ -60,7 +61,21 @@ def load_config(config_file):
     return cfg
 
 
-class ControlCoordinatesTable:
+class ControlCoordinatesTable(pdrowbuffer):
+    # dtypes of the added rows; the offsets are strings, or numbers for the SN row
+    coldtypes = {
+        "tnsname": object,
+        "control_index": np.int64,
+        "ra": object,
+        "dec": object,
+        "ra_offset": object,
+        "dec_offset": object,
+        "radius_arcsec": np.float64,
+        "n_detec": np.int64,
+        "n_detec_o": np.int64,
+        "n_detec_c": np.int64,
+    }
+
     def __init__(self):
         self.num_controls = None
         self.radius = None
@@ -141,7 +156,7 @@ class ControlCoordinatesTable:
             "n_detec_c": n_detec_c,
         }
 
-        self.t = pd.concat([self.t, pd.DataFrame([row])], ignore_index=True)
+        self.appendrow(row)
 
     def get_distance(self, coord1: Coordinates, coord2: Coordinates) -> Angle:
         c1 = SkyCoord(coord1.ra.angle, coord1.dec.angle, frame="fk5")
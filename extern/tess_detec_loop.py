@@ -1,4 +1,3 @@
-import random
 from typing import Dict, List
 from generate_detec_table import SimDetecLoop, define_args
 from generate_sim_table import load_json_config, parse_params
@@ -71,52 +70,24 @@ class TessSimDetecLoop(SimDetecLoop):
         )
 
     def loop(
-        self, valid_control_ix: List, detec_tables_dir: str, flag=0x800000, **kwargs
+        self,
+        valid_control_ix: List,
+        detec_tables_dir: str,
+        flag=0x800000,
+        engine="linear",
+        workers=1,
+        seed=None,
+        **kwargs,
     ):
-        # loop through each rolling sum kernel size
-        for sigma_kern in self.sigma_kerns:
-            print(f"\n\tUsing rolling sum kernel size sigma_kern={sigma_kern} days...")
-            self.sn.apply_rolling_sums(sigma_kern, flag=flag)
-
-            # loop through each possible peak apparent magnitude
-            for peak_appmag in self.peak_appmags:
-                sim_detec_table = self.sd.get_table(sigma_kern, peak_appmag)
-                print(
-                    f"\nCommencing {len(sim_detec_table.t)} simulations for peak app mag {peak_appmag} (peak flux {mag2flux(peak_appmag):0.2f} uJy)..."
-                )
-
-                # load the Simulation object based on the data in the first row
-                # we assume here that every row adds the same type of model
-                sim = self.load_sim(dict(sim_detec_table.t.loc[0, :]))
-
-                for i in range(len(sim_detec_table.t)):
-                    # pick random control light curve
-                    rand_control_index = random.choice(valid_control_ix)
-
-                    # add the simulated flux to the chosen control light curve
-                    params = sim_detec_table.get_params_at_index(i)
-                    sim_lc = self.sn.avg_lcs[rand_control_index].add_simulation(
-                        sim, peak_appmag, flag=flag, remove_old=True, **params
-                    )
-
-                    # get the max simulated FOM within certain indices of the light curve
-                    indices = self.get_max_fom_indices(sim_lc, **params)
-                    max_fom_mjd, max_fom = sim_lc.get_max_fom(indices=indices)
-
-                    # update the corresponding row in the SimDetecTable
-                    self.update_sd_row(
-                        sigma_kern,
-                        peak_appmag,
-                        i,
-                        rand_control_index,
-                        max_fom,
-                        max_fom_mjd,
-                    )
-
-                self.sd.save_detec_table(sigma_kern, peak_appmag, detec_tables_dir)
-                print("Success")
-
-        print("\nFinished generating all SimDetecTables")
+        return super().loop(
+            valid_control_ix,
+            detec_tables_dir,
+            flag=flag,
+            engine=engine,
+            workers=workers,
+            seed=seed,
+            **kwargs,
+        )
 
 
 if __name__ == "__main__":
@@ -164,7 +135,14 @@ if __name__ == "__main__":
         )
         simdetec.load_sd(args.model_name, sim_tables_dir=sim_tables_dir)
 
-        simdetec.loop(valid_control_ix, detec_tables_dir, flag=sn_info["badday_flag"])
+        simdetec.loop(
+            valid_control_ix,
+            detec_tables_dir,
+            flag=sn_info["badday_flag"],
+            engine=args.engine,
+            workers=args.workers,
+            seed=args.seed,
+        )
 
     if args.efficiencies:
         parsed_params = parse_params(model_settings)
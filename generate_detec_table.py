@@ -1,21 +1,19 @@
 #!/usr/bin/env python
 
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
 import itertools
 import os
-import random
 import argparse, re
-from copy import deepcopy
 import sys
-from typing import Dict, List, Self
+from typing import Dict, List, Self, Tuple
 import numpy as np
 import pandas as pd
-from scipy.interpolate import interp1d
 from scipy.optimize import root
-from astropy.modeling.functional_models import Gaussian1D
 
 from download import make_dir_if_not_exists
-from pdastro import pdastrostatsclass
+from pdastro import pdastrostatsclass, unmasked
 from generate_sim_table import (
     SimTable,
     SimTables,
@@ -25,8 +23,19 @@ from generate_sim_table import (
     ASYMMETRIC_GAUSSIAN_MODEL_NAME,
     print_progress_bar,
 )
-from lightcurve import SimDetecLightCurve, SimDetecSupernova, Simulation
+from lightcurve import SimDetecLightCurve, SimDetecSupernova, Simulation, AandB
 
+# possible engines for injecting simulations in the SimDetecTable generation loop
+# serial: inject the simulations one by one
+# batch: inject all simulations added to the same control light curve at once
+# linear: inject each simulation once at a peak flux of 1 uJy and scale its rolling sum
+#         to every peak_appmag (the simulated flux must be proportional to the peak flux)
+# the engines agree to within floating-point rounding, since they add the sums in different orders,
+# so serial is the default and batch and linear are opt-in
+DETEC_ENGINES = ["serial", "batch", "linear"]
+
+# max number of simulations to convolve at once in the linear engine
+LINEAR_CHUNK_SIZE = 1000
 
 NON_PARAM_COLNAMES = [
     "sigma_kern",
@@ -53,6 +62,21 @@ def mag2flux(mag: float):
     return 10 ** ((mag - 23.9) / -2.5)
 
 
+# closed-form flux of an asymmetric Gaussian at the given MJDs:
+# sigma_minus before the peak MJD and sigma_plus at and after it.
+# peak_flux, peak_mjd, sigma_plus, and sigma_minus may be arrays with one entry per simulation,
+# in which case a (number of simulations x number of MJDs) array is returned.
+def asym_gaussian_flux(mjds, peak_flux, peak_mjd, sigma_plus, sigma_minus):
+    mjds = np.asarray(mjds, dtype=np.float64)
+    peak_flux, peak_mjd, sigma_plus, sigma_minus = (
+        np.asarray(x, dtype=np.float64)[..., np.newaxis]
+        for x in (peak_flux, peak_mjd, sigma_plus, sigma_minus)
+    )
+    dt = mjds - peak_mjd
+    sigma = np.where(dt >= 0, sigma_plus, sigma_minus)
+    return peak_flux * np.exp(-0.5 * (dt / sigma) ** 2)
+
+
 class AsymmetricGaussian(Simulation):
     def __init__(self, model_name: str = ASYMMETRIC_GAUSSIAN_MODEL_NAME, **kwargs):
         """
@@ -64,7 +88,6 @@ class AsymmetricGaussian(Simulation):
         :param model_name: Name of the Gaussian model in the config file.
         """
         Simulation.__init__(self, model_name=model_name, **kwargs)
-        self.g = None
         self.sigma_plus: float = None
         self.sigma_minus: float = None
 
@@ -73,36 +96,14 @@ class AsymmetricGaussian(Simulation):
         self.sigma_minus = sigma_minus
         self.peak_appmag = peak_appmag
 
-        peak_flux = mag2flux(peak_appmag)
-        x = np.arange(-100, 100, 0.01)
-        g1 = Gaussian1D(amplitude=peak_flux, stddev=sigma_minus)(x)
-        g2 = Gaussian1D(amplitude=peak_flux, stddev=sigma_plus)(x)
-
-        ind = np.argmin(abs(x))
-        g3 = np.copy(g1)
-        g3[ind:] = g2[ind:]
-
-        self.g = np.array([x, g3])
-
-    def get_sim_flux(
+    # get sigma_plus, sigma_minus, and peak MJD from the parameters of one simulation
+    def get_shape_params(
         self,
-        mjds,
-        peak_appmag: float,
         sigma_sim_plus: float = None,
         sigma_sim_minus: float = None,
         peak_mjd: float = None,
         **kwargs,
     ):
-        """
-        Get the interpolated function of the Gaussian at a given peak MJD and match it to the given time array.
-
-        :param mjds: Time array of MJDs.
-        :param peak_appmag: Desired peak apparent magnitude of the Gaussian.
-        :param sigma: Desired sigma or kernel size of the Gaussian.
-        :param peak_mjd: MJD at which the Gaussian should reach its peak apparent magnitude.
-
-        :return: The simulated flux corresponding to the given time array.
-        """
         if sigma_sim_plus is None or sigma_sim_minus is None:
             raise RuntimeError(
                 "ERROR: sim_sigma_plus and sim_sigma_minus required to get flux of simulated asymmetric Gaussian."
@@ -111,15 +112,43 @@ class AsymmetricGaussian(Simulation):
             raise RuntimeError(
                 "ERROR: Peak MJD required to get flux of simulated asymmetric Gaussian."
             )
+        return sigma_sim_plus, sigma_sim_minus, peak_mjd
 
-        self.new(sigma_sim_plus, sigma_sim_minus, peak_appmag)
+    def get_sim_flux(self, mjds, peak_appmag: float, **kwargs):
+        """
+        Evaluate the Gaussian with the given peak MJD at the given time array.
 
-        g = deepcopy(self.g)
-        g[0, :] += peak_mjd
+        :param mjds: Time array of MJDs.
+        :param peak_appmag: Desired peak apparent magnitude of the Gaussian.
+        :param sigma_sim_plus: Desired sigma or kernel size of the Gaussian at and after the peak MJD.
+        :param sigma_sim_minus: Desired sigma or kernel size of the Gaussian before the peak MJD.
+        :param peak_mjd: MJD at which the Gaussian should reach its peak apparent magnitude.
 
-        fn = interp1d(g[0], g[1], bounds_error=False, fill_value=0)
-        sim_flux = fn(mjds)
-        return sim_flux
+        :return: The simulated flux corresponding to the given time array.
+        """
+        sigma_plus, sigma_minus, peak_mjd = self.get_shape_params(**kwargs)
+        return asym_gaussian_flux(
+            mjds, mag2flux(peak_appmag), peak_mjd, sigma_plus, sigma_minus
+        )
+
+    def get_sim_fluxes(self, mjds, peak_appmag, params: List[Dict]):
+        """
+        Evaluate the Gaussians of several simulations with different parameters at once.
+
+        :param mjds: List or array of MJDs.
+        :param peak_appmag: Desired peak apparent magnitude of the Gaussians.
+        :param params: List of dictionaries with the keyword arguments of get_sim_flux() for each simulation.
+
+        :return: A (number of simulations x number of MJDs) array of flux values.
+        """
+        if len(params) < 1:
+            return np.zeros((0, len(mjds)))
+        sigma_plus, sigma_minus, peak_mjd = np.array(
+            [self.get_shape_params(**p) for p in params], dtype=np.float64
+        ).T
+        return asym_gaussian_flux(
+            mjds, mag2flux(peak_appmag), peak_mjd, sigma_plus, sigma_minus
+        )
 
     def __str__(self):
         return (
@@ -139,27 +168,23 @@ class Gaussian(AsymmetricGaussian):
         """
         AsymmetricGaussian.__init__(self, model_name=model_name, **kwargs)
 
-    def get_sim_flux(
-        self,
-        mjds,
-        peak_appmag: float,
-        sigma_sim: float = None,
-        peak_mjd: float = None,
-        **kwargs,
+    def get_shape_params(
+        self, sigma_sim: float = None, peak_mjd: float = None, **kwargs
     ):
-        return super().get_sim_flux(
-            mjds,
-            peak_appmag,
-            sigma_sim_plus=sigma_sim,
-            sigma_sim_minus=sigma_sim,
-            peak_mjd=peak_mjd,
-            **kwargs,
+        return super().get_shape_params(
+            sigma_sim_plus=sigma_sim, sigma_sim_minus=sigma_sim, peak_mjd=peak_mjd
         )
 
     def __str__(self):
         return Simulation().__str__() + f", sigma = {self.sigma_plus}"
 
 
+# models loaded from file, with (filename, mjd_colname, mag_colname, flux_colname) as the keys
+# and the loaded table, template MJDs, and template flux as the values.
+# The template arrays are read-only and shared by all Models; each Model gets its own copy of the table.
+MODEL_CACHE: Dict[Tuple, Tuple[pd.DataFrame, np.ndarray, np.ndarray]] = {}
+
+
 class Model(Simulation):
     def __init__(
         self,
@@ -182,12 +207,25 @@ class Model(Simulation):
         Simulation.__init__(self, model_name=model_name, **kwargs)
         self.t = None
 
-        self.load(
-            filename,
-            mjd_colname=mjd_colname,
-            mag_colname=mag_colname,
-            flux_colname=flux_colname,
-        )
+        # MJDs relative to the peak and flux normalized to the peak
+        self.template_mjds: np.ndarray = None
+        self.template_flux: np.ndarray = None
+
+        # only load each model file once
+        key = (filename, mjd_colname, mag_colname, flux_colname)
+        if not key in MODEL_CACHE:
+            self.load(
+                filename,
+                mjd_colname=mjd_colname,
+                mag_colname=mag_colname,
+                flux_colname=flux_colname,
+            )
+            template_mjds, template_flux = self.get_template()
+            template_mjds.flags.writeable = False
+            template_flux.flags.writeable = False
+            MODEL_CACHE[key] = (self.t, template_mjds, template_flux)
+        t, self.template_mjds, self.template_flux = MODEL_CACHE[key]
+        self.t = t.copy()
 
     def load(
         self,
@@ -220,13 +258,13 @@ class Model(Simulation):
             if not mjd_colname and not mag_colname and not flux_colname:
                 # all three column names are null or false
                 header = None
-            self.t = pd.read_table(filename, delim_whitespace=True, header=header)
+            self.t = pd.read_table(filename, sep=r"\s+", header=header)
         except Exception as e:
             raise RuntimeError(f"ERROR: Could not load model at {filename}: {str(e)}")
 
         if mjd_colname is False:
             # create MJD column and make it the first column
-            columns = ["MJD"] + self.t.columns
+            columns = ["MJD"] + list(self.t.columns)
             self.t["MJD"] = range(len(self.t))
             self.t = self.t[columns]
         else:
@@ -243,7 +281,7 @@ class Model(Simulation):
                 inplace=True,
             )
             # create mag column
-            self.t["m"] = self.t["uJy"].apply(lambda flux: flux2mag(flux))
+            self.t["m"] = flux2mag(self.t["uJy"])
         else:
             # rename mag column to "m"
             self.t.rename(
@@ -251,7 +289,7 @@ class Model(Simulation):
             )
             if flux_colname is False:
                 # create flux column
-                self.t["uJy"] = self.t["m"].apply(lambda mag: mag2flux(mag))
+                self.t["uJy"] = mag2flux(self.t["m"])
             else:
                 # rename flux column to "uJy"
                 self.t.rename(
@@ -263,9 +301,27 @@ class Model(Simulation):
             print(self.t[["MJD", "m", "uJy"]].head().to_string())
             print("Success")
 
+    def get_template(self):
+        """
+        Get the peak-normalized template of the loaded model, sorted by MJD.
+
+        :return: MJDs relative to the peak MJD and flux divided by the peak flux.
+        """
+        # get original peak appmag index
+        peak_idx = self.t["m"].idxmin()
+
+        t = self.t.sort_values("MJD")
+        template_mjds = (
+            t["MJD"].to_numpy(dtype=np.float64) - self.t.loc[peak_idx, "MJD"]
+        )
+        template_flux = (
+            t["uJy"].to_numpy(dtype=np.float64) / self.t.loc[peak_idx, "uJy"]
+        )
+        return template_mjds, template_flux
+
     def get_sim_flux(self, mjds, peak_appmag: float, peak_mjd: float = None, **kwargs):
         """
-        Get the interpolated function of the model at a given peak MJD and peak apparent magnitude and match it to the given time array.
+        Interpolate the model at a given peak MJD and peak apparent magnitude to the given time array.
 
         :param mjds: Time array of MJDs.
         :param peak_appmag: Desired peak apparent magnitude of the model.
@@ -273,27 +329,36 @@ class Model(Simulation):
 
         :return: The simulated flux array corresponding to the given time array.
         """
-        self.peak_appmag = peak_appmag
         if peak_mjd is None:
             raise RuntimeError("ERROR: Peak MJD required to construct simulated model.")
 
-        # get original peak appmag index
-        peak_idx = self.t["m"].idxmin()
+        mjds = np.asarray(mjds, dtype=np.float64)
+        return mag2flux(peak_appmag) * np.interp(
+            mjds - peak_mjd, self.template_mjds, self.template_flux, left=0, right=0
+        )
 
-        # scale flux to the desired peak appmag
-        self.t["uJy"] *= mag2flux(peak_appmag) / self.t.loc[peak_idx, "uJy"]
+    def get_sim_fluxes(self, mjds, peak_appmag, params: List[Dict]):
+        """
+        Interpolate the model for several simulations with different peak MJDs at once.
 
-        # recalulate appmag column
-        self.t["m"] = self.t["uJy"].apply(lambda flux: flux2mag(flux))
+        :param mjds: List or array of MJDs.
+        :param peak_appmag: Desired peak apparent magnitude of the simulations.
+        :param params: List of dictionaries with the keyword arguments of get_sim_flux() for each simulation.
 
-        # put peak appmag at peak_mjd
-        self.t["MJD"] -= self.t.loc[peak_idx, "MJD"]
-        self.t["MJD"] += peak_mjd
+        :return: A (number of simulations x number of MJDs) array of flux values.
+        """
+        peak_mjds = np.array([p.get("peak_mjd") for p in params], dtype=np.float64)
+        if np.isnan(peak_mjds).any():
+            raise RuntimeError("ERROR: Peak MJD required to construct simulated model.")
 
-        # interpolate lc and match to time array
-        fn = interp1d(self.t["MJD"], self.t["uJy"], bounds_error=False, fill_value=0)
-        sim_flux = fn(mjds)
-        return sim_flux
+        mjds = np.asarray(mjds, dtype=np.float64)
+        return mag2flux(peak_appmag) * np.interp(
+            mjds[np.newaxis, :] - peak_mjds[:, np.newaxis],
+            self.template_mjds,
+            self.template_flux,
+            left=0,
+            right=0,
+        )
 
     def __str__(self):
         return super().__str__()
@@ -304,25 +369,44 @@ class SimDetecTable(SimTable):
         SimTable.__init__(self, peak_appmag, **kwargs)
         self.sigma_kern: float = sigma_kern
 
-    def get_params_at_index(self, index: int, time_colname: str = None) -> Dict:
+    def get_param_colnames(self, time_colname: str = None) -> List[str]:
         """
-        Get a dictionary of the parameter column-value pairs of the Simulation object at a certain row.
+        Get the parameter column names of the Simulation objects in the table.
         Any known non-parameter column names will be skipped.
 
-        :param index: Index of the table from which to get the parameter column-value pairs.
-        :param time_colname: Any peak MJD, MJD0, or time-related parameter name that denotes where to inject the Simulation. If provided, will be additionally skipped when getting the column-value pairs.
+        :param time_colname: Any peak MJD, MJD0, or time-related parameter name that denotes where to inject the Simulation. If provided, will be additionally skipped.
         """
         if time_colname is None:
             skip_params = NON_PARAM_COLNAMES
         else:
-            skip_params = NON_PARAM_COLNAMES.append(time_colname)
+            skip_params = NON_PARAM_COLNAMES + [time_colname]
 
         colnames = []
         for colname in self.t.columns:
             if not colname in skip_params:
                 colnames.append(colname)
+        return colnames
+
+    def get_params_at_index(self, index: int, time_colname: str = None) -> Dict:
+        """
+        Get a dictionary of the parameter column-value pairs of the Simulation object at a certain row.
+        Any known non-parameter column names will be skipped.
+
+        :param index: Index of the table from which to get the parameter column-value pairs.
+        :param time_colname: Any peak MJD, MJD0, or time-related parameter name that denotes where to inject the Simulation. If provided, will be additionally skipped when getting the column-value pairs.
+        """
+        colnames = self.get_param_colnames(time_colname=time_colname)
         return dict(self.t.loc[index, colnames])
 
+    def get_params(self, time_colname: str = None) -> List[Dict]:
+        """
+        Get a list of dictionaries of the parameter column-value pairs of the Simulation objects in every row.
+
+        :param time_colname: Any peak MJD, MJD0, or time-related parameter name that denotes where to inject the Simulation. If provided, will be additionally skipped when getting the column-value pairs.
+        """
+        colnames = self.get_param_colnames(time_colname=time_colname)
+        return self.t[colnames].to_dict("records")
+
     def update_row_at_index(self, index: int, data: Dict):
         """
         Update a certain row of the table.
@@ -334,6 +418,16 @@ class SimDetecTable(SimTable):
         for key, value in data.items():
             self.t.at[index, key] = value
 
+    def update_rows(self, data: Dict):
+        """
+        Update every row of the table at once.
+
+        :param data: Dictionary of column names and arrays with one value per row.
+        """
+        for key, value in data.items():
+            # store as float, like the columns created by update_row_at_index()
+            self.t[key] = np.asarray(value, dtype=np.float64)
+
     def get_detec_filename(self, model_name: str, detec_tables_dir: str) -> str:
         """
         Get the filename of the SimDetecTable.
@@ -422,6 +516,9 @@ class SimDetecTables:
     ):
         self.d[sigma_kern][peak_appmag].update_row_at_index(index, data)
 
+    def update_rows(self, sigma_kern: float, peak_appmag: float, data: Dict):
+        self.d[sigma_kern][peak_appmag].update_rows(data)
+
     def get_efficiency(
         self, sigma_kern: float, peak_appmag: float, fom_limit: float, **params
     ):
@@ -825,10 +922,10 @@ class SimDetecLoop(ABC):
         mag_colname = get_col_val("mag_colname", table_row)
         flux_colname = get_col_val("flux_colname", table_row)
 
-        if args.model_name == GAUSSIAN_MODEL_NAME:
+        if model_name == GAUSSIAN_MODEL_NAME:
             print("Using Gaussian simulations")
             sim = Gaussian()
-        elif args.model_name == ASYMMETRIC_GAUSSIAN_MODEL_NAME:
+        elif model_name == ASYMMETRIC_GAUSSIAN_MODEL_NAME:
             print("Using asymmetric Gaussian simulations")
             sim = AsymmetricGaussian()
         else:
@@ -857,6 +954,321 @@ class SimDetecLoop(ABC):
         """
         pass
 
+    def get_max_fom_mask(self, lc: SimDetecLightCurve, params: List[Dict]):
+        """
+        For a batch of Simulations, get the bins of a light curve within which to search for the max FOM.
+        Default behavior calls get_max_fom_indices() for each Simulation.
+
+        :param lc: SimDetecLightCurve the Simulations are added to.
+        :param params: List of parameter dictionaries, one for each Simulation.
+
+        :return: (number of Simulations x number of bins) boolean array.
+        """
+        mask = np.full((len(params), len(lc.t)), False)
+        for i in range(len(params)):
+            indices = self.get_max_fom_indices(lc, **params[i])
+            if indices is None:
+                mask[i, :] = True
+            else:
+                mask[i, lc.t.index.get_indexer(indices)] = True
+        return mask
+
+    def batch_inject(
+        self,
+        sigma_kern: float,
+        peak_appmag: float,
+        sim: Simulation,
+        valid_control_ix: List,
+        flag=0x800000,
+        rng: np.random.Generator = None,
+    ):
+        """
+        Inject every Simulation of a SimDetecTable into random control light curves at once and update the table.
+        All Simulations added to the same control light curve are convolved together as one matrix.
+
+        :param sigma_kern: Sigma of the desired SimDetecTable; the rolling sums must already be applied with it.
+        :param peak_appmag: Peak apparent magnitude of the desired SimDetecTable.
+        :param sim: Simulation object to inject.
+        :param valid_control_ix: List of indices of control light curves which may be randomly selected to have a Simulation injected.
+        :param flag: Flag that denotes bad days in the averaged light curves.
+        :param rng: Random number generator of the SimDetecTable (see get_rng()).
+        """
+        sim_detec_table = self.sd.get_table(sigma_kern, peak_appmag)
+        params = sim_detec_table.get_params()
+        num_rows = len(params)
+
+        # pick random control light curves
+        control_ix = self.choose_control_ix(valid_control_ix, num_rows, rng=rng)
+
+        max_foms = np.full(num_rows, np.nan)
+        max_fom_mjds = np.full(num_rows, np.nan)
+        for control_index in np.unique(control_ix):
+            rows = np.flatnonzero(control_ix == control_index)
+            rows_params = [params[i] for i in rows]
+
+            lc = self.sn.avg_lcs[int(control_index)]
+            good_ix = AandB(
+                lc.indexset(), lc.indexset(predicate=unmasked("Mask", flag))
+            ).get_indices()
+            sim_fluxes = sim.get_sim_fluxes(
+                lc.t.loc[good_ix, "MJD"], peak_appmag, rows_params
+            )
+            SNRsimsums = lc.get_sim_SNRsums(good_ix, sim_fluxes)
+
+            # get the max simulated FOMs within certain bins of the light curve
+            mask = self.get_max_fom_mask(lc, rows_params)
+            max_fom_mjds[rows], max_foms[rows] = lc.get_max_foms(SNRsimsums, mask)
+
+        self.sd.update_rows(
+            sigma_kern,
+            peak_appmag,
+            {
+                "control_index": control_ix,
+                "max_fom": max_foms,
+                "max_fom_mjd": max_fom_mjds,
+            },
+        )
+
+    def linear_inject(
+        self,
+        sigma_kern: float,
+        sim: Simulation,
+        valid_control_ix: List,
+        flag=0x800000,
+        rngs: List[np.random.Generator] = None,
+    ):
+        """
+        Inject the Simulations of the SimDetecTables of every peak_appmag with the given sigma_kern and update the tables.
+        Since SNRsimsum is linear in the simulated flux, each Simulation is only injected once per control light curve with a peak flux of 1 uJy.
+        The max FOM for each peak_appmag is then found in SNRsum + peak flux * (unit rolling sum).
+        This agrees with injecting the Simulations at each peak flux to within floating-point tolerance (~1e-12),
+        not exactly, since the sums are added in a different order.
+
+        :param sigma_kern: Sigma of the desired SimDetecTables; the rolling sums must already be applied with it.
+        :param sim: Simulation object to inject; its flux must be proportional to its peak flux.
+        :param valid_control_ix: List of indices of control light curves which may be randomly selected to have a Simulation injected.
+        :param flag: Flag that denotes bad days in the averaged light curves.
+        :param rngs: Random number generators of the SimDetecTables of every peak_appmag (see get_rng()).
+        """
+        if rngs is None:
+            rngs = [None] * len(self.peak_appmags)
+
+        tables = [
+            self.sd.get_table(sigma_kern, peak_appmag)
+            for peak_appmag in self.peak_appmags
+        ]
+        colnames = tables[0].get_param_colnames()
+        for table in tables[1:]:
+            if table.get_param_colnames() != colnames or not table.t[colnames].equals(
+                tables[0].t[colnames]
+            ):
+                print(
+                    "WARNING: SimDetecTables have different Simulation parameters; injecting each table separately..."
+                )
+                for peak_appmag, rng in zip(self.peak_appmags, rngs):
+                    self.batch_inject(
+                        sigma_kern,
+                        peak_appmag,
+                        sim,
+                        valid_control_ix,
+                        flag=flag,
+                        rng=rng,
+                    )
+                return
+
+        params = tables[0].get_params()
+        num_rows = len(params)
+        peak_fluxes = list(map(mag2flux, self.peak_appmags))
+
+        # pick random control light curves for every table
+        control_ix = np.array(
+            [
+                self.choose_control_ix(valid_control_ix, num_rows, rng=rng)
+                for rng in rngs
+            ]
+        ).reshape(len(self.peak_appmags), num_rows)
+
+        max_foms = np.full(control_ix.shape, np.nan)
+        max_fom_mjds = np.full(control_ix.shape, np.nan)
+        for control_index in np.unique(control_ix):
+            lc = self.sn.avg_lcs[int(control_index)]
+            good_ix = AandB(
+                lc.indexset(), lc.indexset(predicate=unmasked("Mask", flag))
+            ).get_indices()
+            mjds = lc.t.loc[good_ix, "MJD"]
+            SNRsum = lc.t["SNRsum"].to_numpy()[np.newaxis, :]
+
+            # rows that are added to this control light curve for at least one peak_appmag
+            rows = np.flatnonzero((control_ix == control_index).any(axis=0))
+            for start in range(0, len(rows), LINEAR_CHUNK_SIZE):
+                chunk = rows[start : start + LINEAR_CHUNK_SIZE]
+                chunk_params = [params[i] for i in chunk]
+
+                # rolling sums of the Simulations with a peak flux of 1 uJy
+                unit_fluxes = sim.get_sim_fluxes(mjds, flux2mag(1.0), chunk_params)
+                unit_sums = lc.get_sim_rolling_sums(good_ix, unit_fluxes)
+                mask = self.get_max_fom_mask(lc, chunk_params)
+
+                for j in range(len(self.peak_appmags)):
+                    sel = np.flatnonzero(control_ix[j, chunk] == control_index)
+                    if len(sel) < 1:
+                        continue
+                    SNRsimsums = SNRsum + peak_fluxes[j] * unit_sums[sel]
+                    (
+                        max_fom_mjds[j, chunk[sel]],
+                        max_foms[j, chunk[sel]],
+                    ) = lc.get_max_foms(SNRsimsums, mask[sel])
+
+        for j in range(len(self.peak_appmags)):
+            self.sd.update_rows(
+                sigma_kern,
+                self.peak_appmags[j],
+                {
+                    "control_index": control_ix[j],
+                    "max_fom": max_foms[j],
+                    "max_fom_mjd": max_fom_mjds[j],
+                },
+            )
+
+    def serial_inject(
+        self,
+        sigma_kern: float,
+        peak_appmag: float,
+        sim: Simulation,
+        valid_control_ix: List,
+        flag=0x800000,
+        rng: np.random.Generator = None,
+    ):
+        """
+        Inject every Simulation of a SimDetecTable into random control light curves one by one and update the table.
+
+        :param sigma_kern: Sigma of the desired SimDetecTable; the rolling sums must already be applied with it.
+        :param peak_appmag: Peak apparent magnitude of the desired SimDetecTable.
+        :param sim: Simulation object to inject.
+        :param valid_control_ix: List of indices of control light curves which may be randomly selected to have a Simulation injected.
+        :param flag: Flag that denotes bad days in the averaged light curves.
+        :param rng: Random number generator of the SimDetecTable (see get_rng()).
+        """
+        sim_detec_table = self.sd.get_table(sigma_kern, peak_appmag)
+
+        # pick random control light curves
+        control_ix = self.choose_control_ix(
+            valid_control_ix, len(sim_detec_table.t), rng=rng
+        )
+
+        for i in range(len(sim_detec_table.t)):
+            rand_control_index = int(control_ix[i])
+
+            # add the simulated flux to the chosen control light curve
+            params = sim_detec_table.get_params_at_index(i)
+            sim_lc = self.sn.avg_lcs[rand_control_index].add_simulation(
+                sim,
+                peak_appmag,
+                flag=flag,
+                remove_old=True,
+                incremental=True,
+                **params,
+            )
+
+            # get the max simulated FOM within certain indices of the light curve
+            indices = self.get_max_fom_indices(sim_lc, **params)
+            max_fom_mjd, max_fom = sim_lc.get_max_fom(indices=indices)
+
+            # update the corresponding row in the SimDetecTable
+            self.update_sd_row(
+                sigma_kern,
+                peak_appmag,
+                i,
+                rand_control_index,
+                max_fom,
+                max_fom_mjd,
+            )
+
+    def get_rng(self, entropy, sigma_kern: float, peak_appmag: float):
+        """
+        Get the random number generator of a SimDetecTable.
+        Its stream only depends on the seed entropy and the position of the table in the grid of sigma_kerns and peak_appmags,
+        so results do not depend on the engine, the number of workers, or the order in which the tables are generated.
+
+        :param entropy: Entropy of the seed of the whole loop.
+        :param sigma_kern: Sigma of the SimDetecTable.
+        :param peak_appmag: Peak apparent magnitude of the SimDetecTable.
+        """
+        spawn_key = (
+            self.sigma_kerns.index(sigma_kern),
+            self.peak_appmags.index(peak_appmag),
+        )
+        return np.random.default_rng(
+            np.random.SeedSequence(entropy, spawn_key=spawn_key)
+        )
+
+    # pick a random control light curve for each of num_rows Simulations
+    def choose_control_ix(
+        self, valid_control_ix: List, num_rows: int, rng: np.random.Generator = None
+    ):
+        if rng is None:
+            rng = np.random.default_rng()
+        return rng.choice(np.asarray(valid_control_ix), size=num_rows)
+
+    def run_tables(
+        self,
+        sigma_kern: float,
+        peak_appmags: List,
+        valid_control_ix: List,
+        detec_tables_dir: str,
+        flag=0x800000,
+        engine="serial",
+        entropy=None,
+    ):
+        """
+        Generate and save the SimDetecTables of one sigma_kern and the given peak_appmags.
+        This is one task of loop(), which may run in a worker process.
+
+        :param sigma_kern: Sigma of the SimDetecTables.
+        :param peak_appmags: Peak apparent magnitudes of the SimDetecTables; all of them for the linear engine.
+        :param valid_control_ix: List of indices of control light curves which may be randomly selected to have a Simulation injected.
+        :param detec_tables_dir: Directory where the SimDetecTables should be saved.
+        :param flag: Flag that denotes bad days in the averaged light curves.
+        :param engine: How to inject the Simulations (see DETEC_ENGINES).
+        :param entropy: Entropy of the seed of the whole loop.
+
+        :return: Dictionary with peak_appmags as the keys and the updated columns of the SimDetecTables as the values.
+        """
+        self.sn.apply_rolling_sums(sigma_kern, flag=flag)
+        rngs = [
+            self.get_rng(entropy, sigma_kern, peak_appmag)
+            for peak_appmag in peak_appmags
+        ]
+
+        if engine == "linear":
+            sim_detec_table = self.sd.get_table(sigma_kern, peak_appmags[0])
+            sim = self.load_sim(dict(sim_detec_table.t.loc[0, :]))
+            self.linear_inject(sigma_kern, sim, valid_control_ix, flag=flag, rngs=rngs)
+        else:
+            for peak_appmag, rng in zip(peak_appmags, rngs):
+                # load the Simulation object based on the data in the first row
+                # we assume here that every row adds the same type of model
+                sim_detec_table = self.sd.get_table(sigma_kern, peak_appmag)
+                sim = self.load_sim(dict(sim_detec_table.t.loc[0, :]))
+
+                inject = self.batch_inject if engine == "batch" else self.serial_inject
+                inject(
+                    sigma_kern, peak_appmag, sim, valid_control_ix, flag=flag, rng=rng
+                )
+
+        res = {}
+        for peak_appmag in peak_appmags:
+            self.sd.save_detec_table(sigma_kern, peak_appmag, detec_tables_dir)
+            t = self.sd.get_table(sigma_kern, peak_appmag).t
+            res[peak_appmag] = {
+                colname: t[colname].to_numpy()
+                for colname in ["control_index", "max_fom", "max_fom_mjd"]
+            }
+            print(
+                f"Finished SimDetecTable for sigma_kern={sigma_kern} days and peak app mag {peak_appmag} (peak flux {mag2flux(peak_appmag):0.2f} uJy)"
+            )
+        return res
+
     @abstractmethod
     def update_sd_row(
         self,
@@ -908,12 +1320,25 @@ class SimDetecLoop(ABC):
         self.e.get_efficiencies(self.sd, fom_limits, time_param_name)
         self.e.save(detec_tables_dir, model_name)
 
-    @abstractmethod
+    def get_worker_loop(self) -> Self:
+        """
+        Get a copy of the loop to send to the worker processes of loop(), which shares the supernova
+        but has no SimDetecTables or EfficiencyTable, so that they are not pickled for every worker.
+        """
+        worker_loop = copy(self)
+        worker_loop.e = None
+        worker_loop.sd = copy(self.sd)
+        worker_loop.sd.d = {sigma_kern: {} for sigma_kern in self.sd.d}
+        return worker_loop
+
     def loop(
         self,
         valid_control_ix: List,
         detec_tables_dir: str,
         flag=0x800000,
+        engine="serial",
+        workers=1,
+        seed=None,
         **kwargs,
     ):
         """
@@ -924,8 +1349,80 @@ class SimDetecLoop(ABC):
         :param valid_control_ix: List of indices of control light curves which may be randomly selected to have a Simulation injected.
         :param detec_tables_dir: Directory where the SimDetecTables should be saved.
         :param flag: Flag that denotes bad days in the averaged light curves.
+        :param engine: How to inject the Simulations (see DETEC_ENGINES).
+        :param workers: Number of worker processes to generate the SimDetecTables with.
+        :param seed: Seed of the random control light curve picks; results are identical for any number of workers.
         """
-        pass
+        if not engine in DETEC_ENGINES:
+            raise RuntimeError(
+                f"ERROR: Engine must be one of {DETEC_ENGINES}, not {engine}."
+            )
+        if workers < 1:
+            raise RuntimeError(
+                f"ERROR: Number of workers must be at least 1, got {workers}."
+            )
+
+        entropy = np.random.SeedSequence(seed).entropy
+        print(f"\nUsing random seed {entropy}")
+
+        # calculate the rolling sums of all kernel sizes at once
+        self.sn.precompute_rolling_sums(self.sigma_kerns, flag=flag)
+
+        # the linear engine generates the tables of all peak_appmags of a sigma_kern together
+        tasks = []
+        for sigma_kern in self.sigma_kerns:
+            if engine == "linear":
+                tasks.append((sigma_kern, self.peak_appmags))
+            else:
+                tasks += [
+                    (sigma_kern, [peak_appmag]) for peak_appmag in self.peak_appmags
+                ]
+        print(
+            f"Commencing {len(tasks)} tasks for {len(self.sigma_kerns)} sigma_kerns and {len(self.peak_appmags)} peak app mags with {workers} worker(s)..."
+        )
+
+        if workers == 1:
+            for sigma_kern, peak_appmags in tasks:
+                self.run_tables(
+                    sigma_kern,
+                    peak_appmags,
+                    valid_control_ix,
+                    detec_tables_dir,
+                    flag=flag,
+                    engine=engine,
+                    entropy=entropy,
+                )
+        else:
+            # each worker gets the loop without the SimDetecTables once,
+            # and each task only the SimDetecTables it generates
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=init_detec_worker,
+                initargs=(self.get_worker_loop(),),
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        run_detec_task,
+                        {
+                            peak_appmag: self.sd.get_table(sigma_kern, peak_appmag)
+                            for peak_appmag in peak_appmags
+                        },
+                        sigma_kern,
+                        peak_appmags,
+                        valid_control_ix,
+                        detec_tables_dir,
+                        flag=flag,
+                        engine=engine,
+                        entropy=entropy,
+                    )
+                    for sigma_kern, peak_appmags in tasks
+                ]
+                # copy the results of the workers into the SimDetecTables
+                for (sigma_kern, _), future in zip(tasks, futures):
+                    for peak_appmag, data in future.result().items():
+                        self.sd.update_rows(sigma_kern, peak_appmag, data)
+
+        print("\nFinished generating all SimDetecTables")
 
 
 class AtlasSimDetecLoop(SimDetecLoop):
@@ -948,6 +1445,14 @@ class AtlasSimDetecLoop(SimDetecLoop):
     def load_sim(self, data: Dict) -> Simulation:
         return super().load_sim(data)
 
+    def get_max_fom_bounds(self, peak_mjd=None, sigma_sim=None, **kwargs):
+        if peak_mjd is None:
+            raise RuntimeError("ERROR: A peak MJD is required to find the max FOM.")
+        if sigma_sim is None:
+            # replace with default sigma sim for Charlie's model
+            sigma_sim = 2.8
+        return peak_mjd - sigma_sim, peak_mjd + sigma_sim
+
     def get_max_fom_indices(
         self, sim_lc: SimDetecLightCurve, peak_mjd=None, sigma_sim=None, **kwargs
     ):
@@ -956,18 +1461,20 @@ class AtlasSimDetecLoop(SimDetecLoop):
         For Gaussians, use the sigma provided.
         For Charlie's model, use the manually calculated value of 2.8.
         """
-        if peak_mjd is None:
-            raise RuntimeError("ERROR: A peak MJD is required to find the max FOM.")
-        if sigma_sim is None:
-            # replace with default sigma sim for Charlie's model
-            sigma_sim = 2.8
+        lowlim, uplim = self.get_max_fom_bounds(peak_mjd=peak_mjd, sigma_sim=sigma_sim)
 
         # measurements within 1 sigma of the peak MJD
-        indices = sim_lc.ix_inrange(
-            colnames="MJDbin", lowlim=peak_mjd - sigma_sim, uplim=peak_mjd + sigma_sim
-        )
+        indices = sim_lc.ix_inrange(colnames="MJDbin", lowlim=lowlim, uplim=uplim)
         return indices
 
+    def get_max_fom_mask(self, lc: SimDetecLightCurve, params: List[Dict]):
+        """
+        Get the bins within 1 sigma of the peak MJD for a batch of Simulations.
+        """
+        bounds = np.array([self.get_max_fom_bounds(**p) for p in params]).reshape(-1, 2)
+        mjdbins = lc.t["MJDbin"].to_numpy()
+        return (mjdbins >= bounds[:, [0]]) & (mjdbins <= bounds[:, [1]])
+
     def update_sd_row(
         self, sigma_kern, peak_appmag, index, control_index, max_fom, max_fom_mjd
     ):
@@ -993,52 +1500,36 @@ class AtlasSimDetecLoop(SimDetecLoop):
         valid_control_ix: List,
         detec_tables_dir: str,
         flag=0x800000,
+        engine="serial",
+        workers=1,
+        seed=None,
         **kwargs,
     ):
-        # loop through each rolling sum kernel size
-        for sigma_kern in self.sigma_kerns:
-            print(f"\n\tUsing rolling sum kernel size sigma_kern={sigma_kern} days...")
-            self.sn.apply_rolling_sums(sigma_kern, flag=flag)
-
-            # loop through each possible peak apparent magnitude
-            for peak_appmag in self.peak_appmags:
-                sim_detec_table = self.sd.get_table(sigma_kern, peak_appmag)
-                print(
-                    f"\nCommencing {len(sim_detec_table.t)} simulations for peak app mag {peak_appmag} (peak flux {mag2flux(peak_appmag):0.2f} uJy)..."
-                )
-
-                # load the Simulation object based on the data in the first row
-                # we assume here that every row adds the same type of model
-                sim = self.load_sim(dict(sim_detec_table.t.loc[0, :]))
+        return super().loop(
+            valid_control_ix,
+            detec_tables_dir,
+            flag=flag,
+            engine=engine,
+            workers=workers,
+            seed=seed,
+            **kwargs,
+        )
 
-                for i in range(len(sim_detec_table.t)):
-                    # pick random control light curve
-                    rand_control_index = random.choice(valid_control_ix)
 
-                    # add the simulated flux to the chosen control light curve
-                    params = sim_detec_table.get_params_at_index(i)
-                    sim_lc = self.sn.avg_lcs[rand_control_index].add_simulation(
-                        sim, peak_appmag, flag=flag, remove_old=True, **params
-                    )
+# SimDetecLoop of the current worker process, set by init_detec_worker()
+worker_loop: SimDetecLoop = None
 
-                    # get the max simulated FOM within certain indices of the light curve
-                    indices = self.get_max_fom_indices(sim_lc, **params)
-                    max_fom_mjd, max_fom = sim_lc.get_max_fom(indices=indices)
 
-                    # update the corresponding row in the SimDetecTable
-                    self.update_sd_row(
-                        sigma_kern,
-                        peak_appmag,
-                        i,
-                        rand_control_index,
-                        max_fom,
-                        max_fom_mjd,
-                    )
+def init_detec_worker(loop: SimDetecLoop):
+    global worker_loop
+    worker_loop = loop
 
-                self.sd.save_detec_table(sigma_kern, peak_appmag, detec_tables_dir)
-                print("Success")
 
-        print("\nFinished generating all SimDetecTables")
+# run one task of SimDetecLoop.loop() in a worker process,
+# with tables the SimDetecTables of the task with peak_appmags as the keys
+def run_detec_task(tables: Dict, sigma_kern: float, *args, **kwargs):
+    worker_loop.sd.d[sigma_kern] = tables
+    return worker_loop.run_tables(sigma_kern, *args, **kwargs)
 
 
 # define command line arguments
@@ -1073,6 +1564,24 @@ def define_args(parser=None, usage=None, conflict_handler="resolve"):
         action="store_true",
         help="calculate efficiencies using FOM limits",
     )
+    parser.add_argument(
+        "--engine",
+        default="serial",
+        choices=DETEC_ENGINES,
+        help="inject simulations one by one (serial), all simulations added to the same control light curve at once (batch), or once for all peak apparent magnitudes (linear)",
+    )
+    parser.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        help="number of worker processes to generate the SimDetecTables with",
+    )
+    parser.add_argument(
+        "--seed",
+        default=None,
+        type=int,
+        help="seed of the random control light curve picks; results are identical for any number of workers",
+    )
 
     return parser
 
@@ -1122,7 +1631,14 @@ if __name__ == "__main__":
         )
         simdetec.load_sd(args.model_name, sim_tables_dir=sim_tables_dir)
 
-        simdetec.loop(valid_control_ix, detec_tables_dir, flag=sn_info["badday_flag"])
+        simdetec.loop(
+            valid_control_ix,
+            detec_tables_dir,
+            flag=sn_info["badday_flag"],
+            engine=args.engine,
+            workers=args.workers,
+            seed=args.seed,
+        )
 
     if args.efficiencies:
         parsed_params = parse_params(model_settings)
@@ -269,7 +269,7 @@ class SimTable(pdastrostatsclass):
 
         :param data: Dictionary of column-value pairs.
         """
-        self.t = pd.concat([self.t, pd.DataFrame([data])], ignore_index=True)
+        self.newrow(data)
 
     def get_sim_filename(self, model_name, tables_dir):
         return f"{tables_dir}/sim_{model_name}_{self.peak_appmag:0.2f}.txt"
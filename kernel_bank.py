@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+
+"""
+Bank of the discrete Gaussian kernels used by the rolling sum of the detection algorithm.
+
+The rolling sums are the same as the ones of pandas'
+rolling(windowsize, center=True, win_type="gaussian").sum(std=sigma)
+applied to a light curve that is zero-padded on both sides.
+As with pandas, a window that covers a NaN or an infinite value is NaN.
+"""
+
+from typing import Dict, List, Tuple
+import numpy as np
+from scipy.fft import rfft, irfft, next_fast_len
+from scipy.signal import windows, convolve
+
+# convolve through FFT for windows at least this large (in bins); directly otherwise
+FFT_MIN_WINDOWSIZE = 64
+
+
+class GaussianKernel:
+    def __init__(self, sigma_kern: float, mjdbinsize: float = 1.0):
+        """
+        Discrete Gaussian kernel of the rolling sum.
+
+        :param sigma_kern: Sigma of the kernel in days.
+        :param mjdbinsize: Size of the MJD bins of the light curve in days.
+        """
+        self.sigma_kern = sigma_kern
+        self.mjdbinsize = mjdbinsize
+
+        # sigma and window size in bins
+        self.sigma = round(sigma_kern / mjdbinsize)
+        self.windowsize = int(6 * self.sigma)
+        if self.windowsize < 1:
+            raise RuntimeError(
+                f"ERROR: Kernel size sigma_kern={sigma_kern} days is too small for MJD bin size {mjdbinsize} days"
+            )
+        self.weights = windows.gaussian(self.windowsize, std=self.sigma)
+
+        # a centered window at position i covers the positions
+        # i - windowsize//2 through i + offset
+        self.offset = self.windowsize - 1 - self.windowsize // 2
+
+        # edge normalization vectors, with the light curve length as the keys
+        self.edge_norms: Dict[int, np.ndarray] = {}
+        # FFTs of the weights, with the FFT length as the keys
+        self.weights_ffts: Dict[int, np.ndarray] = {}
+
+    def use_fft(self):
+        return self.windowsize >= FFT_MIN_WINDOWSIZE
+
+    def get_weights_fft(self, n: int):
+        if not n in self.weights_ffts:
+            self.weights_ffts[n] = rfft(self.weights, n)
+        return self.weights_ffts[n]
+
+    def get_edge_norm(self, l: int):
+        """
+        Get the vector that normalizes the rolling sum of a light curve with l bins
+        for the missing bins at its edges, i.e., max(norm)/norm with norm the rolling sum of ones.
+
+        :param l: Number of bins of the light curve.
+        """
+        if not l in self.edge_norms:
+            norm = np.convolve(np.ones(l), self.weights)[self.offset : self.offset + l]
+            self.edge_norms[l] = max(norm) / norm
+        return self.edge_norms[l]
+
+    def slice(self, full_sums: np.ndarray, l: int):
+        """
+        Get the centered rolling sum from a full convolution.
+
+        :param full_sums: Full convolution of data with l bins along the last axis with the weights.
+        :param l: Number of bins of the data.
+        """
+        return full_sums[..., self.offset : self.offset + l]
+
+    def convolve(self, data: np.ndarray):
+        """
+        Full convolution of the data along the last axis with the weights.
+
+        :param data: 1D array or 2D array with one light curve per row.
+        """
+        l = data.shape[-1]
+        if l < 1:
+            return np.zeros(data.shape[:-1] + (self.windowsize - 1,))
+        if not self.use_fft():
+            if data.ndim == 1:
+                return np.convolve(data, self.weights)
+            return convolve(data, self.weights[np.newaxis, :], method="direct")
+        n = next_fast_len(l + self.windowsize - 1, real=True)
+        full_sums = irfft(rfft(data, n) * self.get_weights_fft(n), n)
+        return full_sums[..., : l + self.windowsize - 1]
+
+    def rolling_sum(self, data: np.ndarray):
+        """
+        Rolling sum of the data along the last axis.
+        Like pandas, a window that covers a NaN or an infinite value is NaN.
+
+        :param data: 1D array or 2D array with one light curve per row.
+
+        :return: Array with the same shape as the data.
+        """
+        data = np.asarray(data, dtype=np.float64)
+        # infinite values are left out like NaNs, since the FFT would spread them over all positions
+        nan_mask = ~np.isfinite(data)
+        if not nan_mask.any():
+            return self.slice(self.convolve(data), data.shape[-1])
+
+        sums = self.slice(self.convolve(np.where(nan_mask, 0.0, data)), data.shape[-1])
+        sums[self.covers_nan(nan_mask)] = np.nan
+        return sums
+
+    def covers_nan(self, nan_mask: np.ndarray):
+        """
+        Get the positions whose window covers a NaN or an infinite value.
+
+        :param nan_mask: Boolean array, True where the data is NaN or infinite.
+        """
+        l = nan_mask.shape[-1]
+        # number of NaNs in each window from the cumulative sum
+        counts = np.cumsum(nan_mask, axis=-1)
+        counts = np.concatenate(
+            (np.zeros(nan_mask.shape[:-1] + (1,), dtype=counts.dtype), counts), axis=-1
+        )
+        ix = np.arange(l)
+        hi = np.minimum(ix + self.offset + 1, l)
+        lo = np.maximum(ix - self.windowsize // 2, 0)
+        return (counts[..., hi] - counts[..., lo]) > 0
+
+    def local_rolling_sum(self, data: np.ndarray):
+        """
+        Rolling sum of 1D data that is only non-zero in a few bins.
+
+        :param data: 1D array.
+
+        :return: The first affected position and the rolling sum over all affected positions.
+        """
+        nonzero_ix = np.flatnonzero(data)
+        if len(nonzero_ix) < 1:
+            return 0, np.zeros(0)
+        first, last = nonzero_ix[0], nonzero_ix[-1]
+
+        local_data = data[first : last + 1]
+        nan_mask = ~np.isfinite(local_data)
+        if not nan_mask.any():
+            local_sum = self.convolve(local_data)
+        else:
+            local_sum = self.convolve(np.where(nan_mask, 0.0, local_data))
+            # the windows that cover a NaN or an infinite value
+            local_sum[np.convolve(nan_mask, np.ones(self.windowsize)) > 0] = np.nan
+        start = first - self.offset
+        lo = max(start, 0)
+        hi = min(start + len(local_sum), len(data))
+        return lo, local_sum[lo - start : hi - start]
+
+    def __str__(self):
+        return f"Gaussian kernel: sigma_kern = {self.sigma_kern:0.2f} days; MJD bin size: {self.mjdbinsize:0.2f} days; sigma: {self.sigma:0.2f} bins; window size: {self.windowsize} bins"
+
+
+class GaussianKernelBank:
+    def __init__(self):
+        """
+        Cache of GaussianKernels, with (sigma_kern, mjdbinsize) as the keys.
+        """
+        self.kernels: Dict[Tuple[float, float], GaussianKernel] = {}
+
+    def get_kernel(self, sigma_kern: float, mjdbinsize: float = 1.0):
+        key = (float(sigma_kern), float(mjdbinsize))
+        if not key in self.kernels:
+            self.kernels[key] = GaussianKernel(sigma_kern, mjdbinsize=mjdbinsize)
+        return self.kernels[key]
+
+    def rolling_sums(
+        self, data: np.ndarray, sigma_kerns: List, mjdbinsize: float = 1.0
+    ):
+        """
+        Rolling sums of the data with several kernels at once.
+        The FFT of the data is shared by all kernels that convolve through FFT.
+
+        :param data: 1D array or 2D array with one light curve per row.
+        :param sigma_kerns: List of kernel sizes in days.
+        :param mjdbinsize: Size of the MJD bins of the light curve in days.
+
+        :return: Dictionary with sigma_kerns as the keys and the rolling sums as the values.
+        """
+        data = np.asarray(data, dtype=np.float64)
+        l = data.shape[-1]
+        kernels = [
+            self.get_kernel(sigma_kern, mjdbinsize) for sigma_kern in sigma_kerns
+        ]
+
+        nan_mask = ~np.isfinite(data)
+        has_nans = nan_mask.any()
+        if has_nans:
+            data = np.where(nan_mask, 0.0, data)
+
+        res = {}
+        fft_kernels = [kernel for kernel in kernels if kernel.use_fft()]
+        if len(fft_kernels) > 0 and l > 0:
+            max_windowsize = max(kernel.windowsize for kernel in fft_kernels)
+            n = next_fast_len(l + max_windowsize - 1, real=True)
+            data_fft = rfft(data, n)
+            for kernel in fft_kernels:
+                full_sums = irfft(data_fft * kernel.get_weights_fft(n), n)
+                res[kernel.sigma_kern] = kernel.slice(full_sums, l)
+
+        for kernel in kernels:
+            if not kernel.sigma_kern in res:
+                res[kernel.sigma_kern] = kernel.slice(kernel.convolve(data), l)
+            if has_nans:
+                res[kernel.sigma_kern][kernel.covers_nan(nan_mask)] = np.nan
+        return res
+
+
+# kernels shared by all light curves
+KERNEL_BANK = GaussianKernelBank()
@@ -2,16 +2,31 @@
 
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List, Tuple, Type
-import re, json, requests, time, sys, io
+import re, json, requests, time, sys, io, os
 from astropy import units as u
 from astropy.coordinates import Angle
 from astropy.time import Time
 from collections import OrderedDict
-from pdastro import pdastrostatsclass
+from concurrent.futures import ThreadPoolExecutor
+from pdastro import (
+    pdastrostatsclass,
+    pdrowbuffer,
+    masked_rowsums,
+    sigmacut_stats,
+    sigmacut_rows,
+    flux2mag_arrays,
+    inrange,
+    equal,
+    isnull,
+    unmasked,
+    IndexSet,
+    hex2int,
+)
 import numpy as np
 import pandas as pd
-from copy import deepcopy
+from copy import copy, deepcopy
 from pathlib import Path
+from kernel_bank import KERNEL_BANK, GaussianKernel
 
 # number of days to subtract from TNS discovery date to make sure no SN flux before discovery date
 DISC_DATE_BUFFER = 20
@@ -22,6 +37,44 @@ REQUIRED_COLUMN_NAMES = ["MJD", "uJy", "duJy"]
 # required averaged light curve column names for the script to work
 REQUIRED_AVG_COLUMN_NAMES = ["MJDbin", "uJy", "duJy", "Mask"]
 
+# dtypes of the light curve columns when loading, so that pandas does not have to infer them.
+# Other columns are inferred, and the hexadecimal "Mask" column is converted to uint32 after loading.
+# uJy and duJy are inferred too, since ATLAS writes them as integers and they are saved the same way.
+LC_COLUMN_DTYPES = {
+    "MJD": np.float64,
+    "m": np.float64,
+    "dm": np.float64,
+    "F": str,
+    "chi/N": np.float64,
+    "RA": np.float64,
+    "Dec": np.float64,
+    "x": np.float64,
+    "y": np.float64,
+    "maj": np.float64,
+    "min": np.float64,
+    "phi": np.float64,
+    "apfit": np.float64,
+    "mag5sig": np.float64,
+    "Sky": np.float64,
+    "ZP": np.float64,
+    "Obs": str,
+}
+
+# dtypes of the averaged light curve columns when loading
+AVG_LC_COLUMN_DTYPES = {
+    "MJD": np.float64,
+    "MJDbin": np.float64,
+    "uJy": np.float64,
+    "duJy": np.float64,
+    "stdev": np.float64,
+    "x2": np.float64,
+    "m": np.float64,
+    "dm": np.float64,
+}
+
+# strings that are read as NaN in addition to the pandas defaults
+LC_NA_VALUES = ["None", "-", "--"]
+
 ATLAS_FILTERS = ["c", "o"]
 
 DEFAULT_CUT_NAMES = ["uncert_cut", "x2_cut", "controls_cut", "badday_cut", "averaging"]
@@ -31,22 +84,101 @@ UTILITY
 """
 
 
+def read_lc_file(filename, dtype: Dict = None) -> pd.DataFrame:
+    """
+    Read an ATLAS or ATClean light curve file with whitespace-separated columns.
+
+    :param filename: File name of the light curve.
+    :param dtype: Dictionary of the dtypes of the columns; other columns are inferred.
+
+    :return: The light curve table, with the hexadecimal "Mask" column decoded to uint32.
+    """
+    t = pd.read_csv(
+        filename, sep=r"\s+", engine="c", dtype=dtype, na_values=LC_NA_VALUES
+    )
+    # ATLAS writes the header as a comment, e.g. ###MJD
+    if len(t.columns) > 0 and t.columns[0].startswith("#"):
+        t = t.rename(columns={t.columns[0]: t.columns[0].lstrip("#")})
+    if "Mask" in t.columns and pd.api.types.is_string_dtype(t["Mask"]):
+        t["Mask"] = hex2int(t["Mask"].to_numpy()).astype(np.uint32)
+    return t
+
+
 def AandB(A, B):
+    if isinstance(A, IndexSet) and isinstance(B, IndexSet):
+        return A & B
     return np.intersect1d(A, B, assume_unique=False)
 
 
 def AnotB(A, B):
+    if isinstance(A, IndexSet) and isinstance(B, IndexSet):
+        return A - B
     return np.setdiff1d(A, B)
 
 
 def AorB(A, B):
+    if isinstance(A, IndexSet) and isinstance(B, IndexSet):
+        return A | B
     return np.union1d(A, B)
 
 
 def not_AandB(A, B):
+    if isinstance(A, IndexSet) and isinstance(B, IndexSet):
+        return A ^ B
     return np.setxor1d(A, B)
 
 
+def match_mjds(target_mjd, mjd, tolerance=0.0):
+    """
+    Merge-join two sorted MJD arrays.
+
+    :param target_mjd: Sorted MJDs of the grid to align onto.
+    :param mjd: Sorted MJDs of the light curve to align.
+    :param tolerance: Maximum MJD difference for two epochs to count as the same epoch; 0 requires an exact match.
+
+    :return: Array of the same length as target_mjd with, for each target epoch, the position of its matching epoch in mjd, or -1 if there is none. Each position in mjd is matched at most once: repeated MJDs are matched occurrence by occurrence, and with tolerance > 0 an epoch of mjd that is the nearest one of several target epochs is only matched to the closest of them.
+    """
+    target_mjd = np.asarray(target_mjd, dtype=np.float64)
+    mjd = np.asarray(mjd, dtype=np.float64)
+    positions = np.full(len(target_mjd), -1, dtype=np.int64)
+    if len(target_mjd) == 0 or len(mjd) == 0:
+        return positions
+
+    if tolerance is None or tolerance <= 0:
+        # exact matches; repeated target MJDs are paired with successive
+        # repeated MJDs, so the k-th occurrence matches the k-th occurrence
+        first = np.searchsorted(target_mjd, target_mjd, side="left")
+        occurrence = np.arange(len(target_mjd)) - first
+        candidates = np.searchsorted(mjd, target_mjd, side="left") + occurrence
+        in_range = candidates < len(mjd)
+        matched = np.zeros(len(target_mjd), dtype=bool)
+        matched[in_range] = mjd[candidates[in_range]] == target_mjd[in_range]
+        positions[matched] = candidates[matched]
+        return positions
+
+    # nearest epoch on either side of each target MJD
+    right = np.searchsorted(mjd, target_mjd, side="left")
+    left = right - 1
+    dist_right = np.full(len(target_mjd), np.inf)
+    dist_left = np.full(len(target_mjd), np.inf)
+    ok = right < len(mjd)
+    dist_right[ok] = mjd[right[ok]] - target_mjd[ok]
+    ok = left >= 0
+    dist_left[ok] = target_mjd[ok] - mjd[left[ok]]
+    candidates = np.where(dist_right <= dist_left, right, left)
+    dist = np.minimum(dist_right, dist_left)
+    matched = dist <= tolerance
+
+    # if several target epochs share the same nearest epoch, only the closest
+    # one is matched
+    ix = np.flatnonzero(matched)
+    ix = ix[np.lexsort((dist[ix], candidates[ix]))]
+    keep = np.ones(len(ix), dtype=bool)
+    keep[1:] = candidates[ix[1:]] != candidates[ix[:-1]]
+    positions[ix[keep]] = candidates[ix[keep]]
+    return positions
+
+
 class Credentials:
     def __init__(
         self, atlas_username, atlas_password, tns_api_key, tns_id, tns_bot_name
@@ -291,7 +423,10 @@ def query_atlas(headers, ra, dec, min_mjd, max_mjd):
 
 # input/output table containing TNS names, RA, Dec, and MJD0
 # (TODO: if MJD0=None, consider entire light curve as pre-SN light curve)
-class SnInfoTable:
+class SnInfoTable(pdrowbuffer):
+    # dtypes of the added rows; ra and dec are strings, or NaN if unknown
+    coldtypes = {"tnsname": object, "ra": object, "dec": object, "mjd0": np.float64}
+
     def __init__(self, directory, filename=None):
         if filename is None:
             self.filename = f"{directory}/sninfo.txt"
@@ -387,7 +522,7 @@ class SnInfoTable:
             dec = f"{coords.dec.angle.degree:0.14f}"
 
         row = {"tnsname": tnsname, "ra": ra, "dec": dec, "mjd0": mjd0}
-        self.t = pd.concat([self.t, pd.DataFrame([row])], ignore_index=True)
+        self.appendrow(row)
 
     def update_row(
         self, tnsname, coords: Coordinates = None, mjd0: float = None, overwrite=False
@@ -589,96 +724,108 @@ class CutList:
         return output
 
 
-class LimCutsTable:
-    def __init__(self, lc: pdastrostatsclass, stn_bound, indices=None):
+class LimCutsTable(pdrowbuffer):
+    def __init__(self, lc, stn_bound, indices=None):
+        """
+        Contamination and loss of chi-square cuts.
+
+        :param lc: Light curve with "uJy/duJy" and "chi/N" columns, either a pdastrostatsclass or a (read-only) LightCurveView.
+        :param stn_bound: |flux/dflux| bound that determines a good vs. bad measurement.
+        :param indices: Indices of the rows of a pdastrostatsclass to use (all rows if None).
+        """
         self.t = None
 
         self.lc = lc
-        if indices is None:
-            indices = self.lc.getindices()
+        self.stn_bound = stn_bound
+        if isinstance(lc, LightCurveView):
+            if not indices is None:
+                raise RuntimeError(
+                    "ERROR: Cannot select indices of a LightCurveView; select the rows when creating the view."
+                )
+            stn = lc.get("uJy/duJy")
+            x2 = lc.get("chi/N")
+        else:
+            if indices is None:
+                indices = self.lc.getindices()
+            positions = self.lc.getpositions(indices)
+            stn = self.lc.t["uJy/duJy"].to_numpy(dtype=np.float64)[positions]
+            x2 = self.lc.t["chi/N"].to_numpy(dtype=np.float64)[positions]
         self.indices = indices
+        self.N = len(x2)
 
-        self.good_ix, self.bad_ix = self.get_goodbad_indices(stn_bound)
-
-    def get_goodbad_indices(self, stn_bound):
-        good_ix = self.lc.ix_inrange(
-            colnames=["uJy/duJy"],
-            lowlim=-stn_bound,
-            uplim=stn_bound,
-            indices=self.indices,
-        )
-        bad_ix = AnotB(self.indices, good_ix)
-        return good_ix, bad_ix
-
-    def get_keptcut_indices(self, x2_max):
-        kept_ix = self.lc.ix_inrange(
-            colnames=["chi/N"], uplim=x2_max, indices=self.indices
-        )
-        cut_ix = AnotB(self.indices, kept_ix)
-        return kept_ix, cut_ix
-
-    def calculate_row(self, x2_max, kept_ix=None, cut_ix=None):
-        if kept_ix is None or cut_ix is None:
-            kept_ix, cut_ix = self.get_keptcut_indices(x2_max)
-        data = {
-            "PSF Chi-Square Cut": x2_max,
-            "N": len(self.indices),
-            "Ngood": len(self.good_ix),
-            "Nbad": len(self.bad_ix),
-            "Nkept": len(kept_ix),
-            "Ncut": len(cut_ix),
-            "Ngood,kept": len(AandB(self.good_ix, kept_ix)),
-            "Ngood,cut": len(AandB(self.good_ix, cut_ix)),
-            "Nbad,kept": len(AandB(self.bad_ix, kept_ix)),
-            "Nbad,cut": len(AandB(self.bad_ix, cut_ix)),
-            "Pgood,kept": 100 * len(AandB(self.good_ix, kept_ix)) / len(self.indices),
-            "Pgood,cut": 100 * len(AandB(self.good_ix, cut_ix)) / len(self.indices),
-            "Pbad,kept": 100 * len(AandB(self.bad_ix, kept_ix)) / len(self.indices),
-            "Pbad,cut": 100 * len(AandB(self.bad_ix, cut_ix)) / len(self.indices),
-            "Ngood,kept/Ngood": 100
-            * len(AandB(self.good_ix, kept_ix))
-            / len(self.good_ix),
-            "Ploss": 100 * len(AandB(self.good_ix, cut_ix)) / len(self.good_ix),
-            "Pcontamination": 100 * len(AandB(self.bad_ix, kept_ix)) / len(kept_ix),
-        }
+        # sorted chi-square values of the good and bad measurements (NaNs last),
+        # so that the number of kept measurements for any cut is a searchsorted
+        good = inrange("uJy/duJy", lowlim=-stn_bound, uplim=stn_bound).evaluate_column(
+            np.asarray(stn, dtype=np.float64)
+        )
+        x2 = np.asarray(x2, dtype=np.float64)
+        self.good_x2 = np.sort(x2[good])
+        self.bad_x2 = np.sort(x2[~good])
+
+    def calculate_rows(self, x2_max_values):
+        """
+        Calculate the contamination and loss for many chi-square cuts at once,
+        using cumulative counts of the sorted chi-square values.
+
+        :param x2_max_values: Array of chi-square cuts (measurements with chi/N <= cut are kept).
+
+        :return: Dictionary with one array per column of the table.
+        """
+        x2_max_values = np.asarray(x2_max_values)
+        N = self.N
+        Ngood = len(self.good_x2)
+        Nbad = len(self.bad_x2)
+        Ngood_kept = np.searchsorted(self.good_x2, x2_max_values, side="right")
+        Nbad_kept = np.searchsorted(self.bad_x2, x2_max_values, side="right")
+        Nkept = Ngood_kept + Nbad_kept
+        Ngood_cut = Ngood - Ngood_kept
+        Nbad_cut = Nbad - Nbad_kept
+        with np.errstate(divide="ignore", invalid="ignore"):
+            data = {
+                "PSF Chi-Square Cut": x2_max_values,
+                "N": np.full(len(x2_max_values), N),
+                "Ngood": np.full(len(x2_max_values), Ngood),
+                "Nbad": np.full(len(x2_max_values), Nbad),
+                "Nkept": Nkept,
+                "Ncut": N - Nkept,
+                "Ngood,kept": Ngood_kept,
+                "Ngood,cut": Ngood_cut,
+                "Nbad,kept": Nbad_kept,
+                "Nbad,cut": Nbad_cut,
+                "Pgood,kept": 100 * Ngood_kept / N,
+                "Pgood,cut": 100 * Ngood_cut / N,
+                "Pbad,kept": 100 * Nbad_kept / N,
+                "Pbad,cut": 100 * Nbad_cut / N,
+                "Ngood,kept/Ngood": 100 * Ngood_kept / Ngood,
+                "Ploss": 100 * Ngood_cut / Ngood,
+                "Pcontamination": 100 * Nbad_kept / Nkept,
+            }
         return data
 
+    def calculate_row(self, x2_max):
+        """
+        Calculate the contamination and loss for one chi-square cut.
+
+        :param x2_max: Chi-square cut (measurements with chi/N <= cut are kept).
+        """
+        data = self.calculate_rows([x2_max])
+        return {key: values[0].item() for key, values in data.items()}
+
     def calculate_table(self, cut_start, cut_stop, cut_step):
         print(
             f"Calculating loss and contamination for chi-square cuts from {cut_start} to {cut_stop}..."
         )
 
-        self.t = pd.DataFrame(
-            columns=[
-                "PSF Chi-Square Cut",
-                "N",
-                "Ngood",
-                "Nbad",
-                "Nkept",
-                "Ncut",
-                "Ngood,kept",
-                "Ngood,cut",
-                "Nbad,kept",
-                "Nbad,cut",
-                "Pgood,kept",
-                "Pgood,cut",
-                "Pbad,kept",
-                "Pbad,cut",
-                "Ngood,kept/Ngood",
-                "Ploss",
-                "Pcontamination",
-            ]
-        )
+        # chi-square cuts from cut_start to cut_stop (inclusive); the steps can be floats
+        num_cuts = int(np.floor((cut_stop - cut_start) / cut_step + 1e-9)) + 1
+        cuts = cut_start + cut_step * np.arange(max(num_cuts, 0))
+        if not all(isinstance(x, (int, np.integer)) for x in (cut_start, cut_step)):
+            cuts = np.round(cuts, 10)
 
-        # for different x2 cuts decreasing from 50
-        for cut in range(cut_start, cut_stop + 1, cut_step):
-            kept_ix, cut_ix = self.get_keptcut_indices(cut)
-            percent_kept = 100 * len(kept_ix) / len(self.indices)
-            if percent_kept < 10:
-                # less than 10% of measurements kept, so no chi-square cuts beyond this point are valid
-                continue
-            row = self.calculate_row(cut, kept_ix=kept_ix, cut_ix=cut_ix)
-            self.t = pd.concat([self.t, pd.DataFrame([row])], ignore_index=True)
+        data = self.calculate_rows(cuts)
+        # less than 10% of measurements kept, so these chi-square cuts are not valid
+        valid = 100 * data["Nkept"] / self.N >= 10
+        self.t = pd.DataFrame({key: values[valid] for key, values in data.items()})
 
 
 """
@@ -686,6 +833,198 @@ LIGHT CURVES
 """
 
 
+class ControlStack:
+    def __init__(self, lcs: Dict, indices: List[int]):
+        """
+        Stacked (light curves x epochs) arrays of the SN and control light curves, which must be aligned
+        onto the same MJDs (see Supernova.verify_mjds()). Row i of each array belongs to light curve indices[i].
+        The light curve tables stay the per-light curve views of the data: a column is stacked the first time
+        it is requested and kept until invalidate() is called. Flags changed here are written back to the
+        "Mask" columns of the light curves, but changes of the light curves made in any other way are not
+        seen by the stack, so Supernova.get_stack() invalidates it at the start of each stage.
+
+        :param lcs: Dictionary of light curves by control index.
+        :param indices: Control indices of the light curves to stack, in row order.
+        """
+        self.lcs = lcs
+        self.indices = list(indices)
+        self.mjd = lcs[self.indices[0]].t["MJD"].to_numpy(dtype=np.float64).copy()
+
+        # column name -> stacked array
+        self.columns = {}
+
+    @property
+    def num_epochs(self):
+        return len(self.mjd)
+
+    def get_row(self, control_index):
+        return self.indices.index(control_index)
+
+    def invalidate(self):
+        """
+        Read all columns from the light curves again the next time they are requested.
+        """
+        self.columns = {}
+
+    def _read_column(self, control_index, colname):
+        lc = self.lcs[control_index]
+        if colname == "Mask":
+            values = lc.flags.get_values()
+        else:
+            values = lc.t[colname].to_numpy()
+        if len(values) != self.num_epochs:
+            raise RuntimeError(
+                f"ERROR: Light curve {control_index} has {len(values)} rows, but the stack has {self.num_epochs} epochs! Rerun verify_mjds()."
+            )
+        return values
+
+    def get(self, colname):
+        """
+        Get a column of all stacked light curves as a (light curves x epochs) array.
+        The returned array must not be modified.
+
+        :param colname: Name of the column; "Mask" gives the flags as uint32.
+        """
+        if not colname in self.columns:
+            self.columns[colname] = np.stack(
+                [
+                    self._read_column(control_index, colname)
+                    for control_index in self.indices
+                ]
+            )
+        return self.columns[colname]
+
+    def get_rows(self, colname, rows: List[int]):
+        """
+        Get a column of some of the stacked light curves as a (len(rows) x epochs) array.
+        If the column is not stacked yet, only these light curves are stacked, and the result is not kept.
+        The returned array must not be modified.
+
+        :param colname: Name of the column; "Mask" gives the flags as uint32.
+        :param rows: Rows of the light curves.
+        """
+        if len(rows) == 0:
+            return np.empty((0, self.num_epochs))
+        if colname in self.columns:
+            stacked = self.columns[colname]
+            if list(rows) == list(range(rows[0], rows[0] + len(rows))):
+                # consecutive rows without a copy
+                return stacked[rows[0] : rows[-1] + 1]
+            return stacked[rows]
+        return np.stack(
+            [self._read_column(self.indices[row], colname) for row in rows]
+        )
+
+    def set_flags_array(self, mask, rows=None):
+        """
+        Write flags back to the "Mask" columns of the light curves.
+
+        :param mask: uint32 (light curves x epochs) array with the new flags of all stacked light curves.
+        :param rows: Rows of the light curves that changed (all if None).
+        """
+        mask = np.asarray(mask, dtype=np.uint32)
+        for row in range(len(self.indices)) if rows is None else rows:
+            self.lcs[self.indices[row]].flags.set_values(mask[row])
+        self.columns["Mask"] = mask
+
+    def update_flags(self, flag, flagged, rows=None, remove_old=True):
+        """
+        Flag epochs of the stacked light curves, all light curves at once.
+
+        :param flag: Flag to set.
+        :param flagged: Boolean array that is True for the epochs to flag, either (light curves x epochs) or one row of epochs for all light curves.
+        :param rows: Rows of the light curves to flag (all if None); flagged then has one row per entry of rows.
+        :param remove_old: Remove any old flags of the same value first.
+        """
+        mask = self.get("Mask").copy()
+        rows = np.arange(len(self.indices)) if rows is None else np.asarray(rows)
+        flag = np.uint32(flag)
+        selected = mask[rows]
+        if remove_old:
+            selected &= ~flag
+        selected[np.broadcast_to(flagged, selected.shape)] |= flag
+        mask[rows] = selected
+        self.set_flags_array(mask, rows=rows)
+
+    def copy_flags(self, flags_to_copy, rows=None):
+        """
+        Add the flags of one light curve to the stacked light curves.
+
+        :param flags_to_copy: uint32 array with the flags of each epoch.
+        :param rows: Rows of the light curves to add the flags to (all if None).
+        """
+        mask = self.get("Mask").copy()
+        rows = np.arange(len(self.indices)) if rows is None else np.asarray(rows)
+        mask[rows] |= np.asarray(flags_to_copy, dtype=np.uint32)
+        self.set_flags_array(mask, rows=rows)
+
+    def apply_cut(self, column_name, flag, min_value=None, max_value=None):
+        """
+        Flag the epochs of all stacked light curves outside [min_value, max_value] of a column.
+
+        :return: Array with the percentage of flagged epochs of each light curve.
+        """
+        if min_value is None and max_value is None:
+            raise RuntimeError(
+                f"ERROR: Cannot apply cut without min value ({min_value}) or max value ({max_value})."
+            )
+        values = self.get(column_name)
+        cut = (
+            ~inrange(column_name, lowlim=min_value, uplim=max_value)
+            .evaluate_column(values.ravel())
+            .reshape(values.shape)
+        )
+        self.update_flags(flag, cut)
+        return 100 * np.count_nonzero(cut, axis=1) / self.num_epochs
+
+
+class LightCurveView:
+    def __init__(
+        self, lcs: List, positions: List | None = None, stack: ControlStack = None
+    ):
+        """
+        Read-only view of the rows of one or more light curves, with the concatenated column arrays of all rows.
+        Only the requested columns are concatenated, without copying the tables. If the light curves are
+        rows of a ControlStack, the columns are its stacked arrays (without copying them if the rows are consecutive),
+        and columns that it has not stacked yet are stacked for these light curves only.
+
+        :param lcs: List of light curves.
+        :param positions: List with the table positions of the rows of each light curve to include (all rows if None).
+        :param stack: ControlStack with all light curves, if their MJDs are aligned.
+        """
+        self.lcs = list(lcs)
+        self.positions = [None] * len(self.lcs) if positions is None else positions
+        self.stack = stack
+        if any(not p is None for p in self.positions):
+            # rows of single light curves are selected
+            self.stack = None
+
+    def __len__(self):
+        return sum(
+            len(lc.t) if positions is None else len(positions)
+            for lc, positions in zip(self.lcs, self.positions)
+        )
+
+    def get(self, colname):
+        """
+        Get the concatenated values of a column of all rows in the view. The array cannot be modified.
+
+        :param colname: Name of the column.
+        """
+        if not self.stack is None:
+            rows = [self.stack.get_row(lc.control_index) for lc in self.lcs]
+            values = self.stack.get_rows(colname, rows).reshape(-1)
+        else:
+            values = [
+                lc.t[colname].to_numpy() if p is None else lc.t[colname].to_numpy()[p]
+                for lc, p in zip(self.lcs, self.positions)
+            ]
+            values = np.concatenate(values) if len(values) > 0 else np.array([])
+        values = values.view()
+        values.flags.writeable = False
+        return values
+
+
 class Supernova:
     def __init__(
         self,
@@ -701,6 +1040,8 @@ class Supernova:
         self.filt = filt
 
         self.lcs: Dict[int, LightCurve] = {}
+        # stacked arrays of the lcs once their MJDs are aligned
+        self.stack: ControlStack | None = None
 
         self.num_controls = 0
         self.all_indices = None
@@ -730,11 +1071,19 @@ class Supernova:
 
             print("Success")
 
-    def verify_mjds(self, verbose=False):
+    def verify_mjds(self, verbose=False, mjd_tolerance=0.0):
+        """
+        Sort the SN and control light curves by MJD and align each control light curve onto the SN light curve's MJDs,
+        so that row i of every light curve is the same epoch.
+
+        :param mjd_tolerance: Maximum MJD difference for a control epoch to be matched to an SN epoch; 0 requires an exact match.
+        With mjd_tolerance > 0, the MJDs of the matched control epochs are overwritten with the MJDs of their SN epochs.
+        """
         # sort SN lc by MJD
-        self.lcs[0].t.sort_values(by=["MJD"], ignore_index=True, inplace=True)
+        self.lcs[0].sort_by_mjd()
 
         if self.num_controls == 0:
+            self.stack = ControlStack(self.lcs, self.get_all_indices())
             return
 
         if verbose:
@@ -744,9 +1093,7 @@ class Supernova:
 
         for control_index in self.get_control_indices():
             # sort by MJD
-            self.lcs[control_index].t.sort_values(
-                by=["MJD"], ignore_index=True, inplace=True
-            )
+            self.lcs[control_index].sort_by_mjd()
             control_sorted_mjd = self.lcs[control_index].t["MJD"].to_numpy()
 
             if (len(sn_sorted_mjd) != len(control_sorted_mjd)) or not np.array_equal(
@@ -757,38 +1104,36 @@ class Supernova:
                         f"MJDs out of agreement for control light curve {control_index}, fixing..."
                     )
 
-                only_sn_mjd = AnotB(sn_sorted_mjd, control_sorted_mjd)
-                only_control_mjd = AnotB(control_sorted_mjd, sn_sorted_mjd)
-
-                # for the MJDs only in SN, add row with that MJD to control light curve,
-                # with all values of other columns NaN
-                if len(only_sn_mjd) > 0:
-                    for mjd in only_sn_mjd:
-                        self.lcs[control_index].newrow({"MJD": mjd, "Mask": 0})
-
-                # remove indices of rows in control light curve for which there is no MJD in the SN lc
-                if len(only_control_mjd) > 0:
-                    ix_to_skip = []
-                    for mjd in only_control_mjd:
-                        matching_ix = self.lcs[control_index].ix_equal("MJD", mjd)
-                        if len(matching_ix) != 1:
-                            raise RuntimeError(
-                                f"ERROR: Couldn't find MJD={mjd} in column MJD, but should be there!"
-                            )
-                        ix_to_skip.extend(matching_ix)
-                    ix = AnotB(self.lcs[control_index].getindices(), ix_to_skip)
-                else:
-                    ix = self.lcs[control_index].getindices()
-
-                # sort again
-                sorted_ix = self.lcs[control_index].ix_sort_by_cols("MJD", indices=ix)
-                self.lcs[control_index].t = self.lcs[control_index].t.loc[sorted_ix]
+                # MJDs only in the SN lc get a row with all other columns NaN,
+                # and MJDs only in the control lc are removed
+                self.lcs[control_index].align_to_mjds(
+                    sn_sorted_mjd, tolerance=mjd_tolerance
+                )
 
             self.lcs[control_index].t.reset_index(drop=True, inplace=True)
 
+        self.stack = ControlStack(self.lcs, self.get_all_indices())
         print("Success")
 
-    def prep_for_cleaning(self, verbose=False):
+    def get_stack(self):
+        """
+        Get the stacked arrays of the SN and control light curves at the start of a stage.
+        The stack is invalidated, so its columns are read again from the light curves,
+        which may have been changed since the last stage.
+
+        :return: ControlStack, or None if the MJDs of the light curves are not aligned (see verify_mjds()).
+        """
+        if self.stack is None or self.stack.indices != self.get_all_indices():
+            sn_mjd = self.lcs[0].t["MJD"].to_numpy()
+            for control_index in self.get_control_indices():
+                if not np.array_equal(sn_mjd, self.lcs[control_index].t["MJD"]):
+                    return None
+            self.stack = ControlStack(self.lcs, self.get_all_indices())
+        else:
+            self.stack.invalidate()
+        return self.stack
+
+    def prep_for_cleaning(self, verbose=False, mjd_tolerance=0.0):
         if verbose:
             print(
                 'Adding blank "Mask" columns, replacing infs with NaNs, and calculating flux/dflux...'
@@ -796,7 +1141,7 @@ class Supernova:
 
         for control_index in self.get_all_indices():
             # add blank 'Mask' column
-            self.lcs[control_index].t["Mask"] = 0
+            self.lcs[control_index].t["Mask"] = np.uint32(0)
             # remove rows with duJy=0 or uJy=NaN
             self.lcs[control_index].remove_invalid_rows()
             # calculate flux/dflux column
@@ -804,12 +1149,20 @@ class Supernova:
         print("Success")
 
         # make sure SN and control lc MJDs match up exactly
-        self.verify_mjds(verbose=verbose)
+        self.verify_mjds(verbose=verbose, mjd_tolerance=mjd_tolerance)
 
     def apply_cut(self, cut: Cut):
         if not cut.can_apply_directly():
             raise RuntimeError(f"ERROR: Cannot directly apply the following cut: {cut}")
 
+        stack = self.get_stack()
+        if not stack is None:
+            # all lcs at once
+            percent_cuts = stack.apply_cut(
+                cut.column, cut.flag, min_value=cut.min_value, max_value=cut.max_value
+            )
+            return percent_cuts[stack.get_row(0)]
+
         sn_percent_cut = None
         for control_index in self.get_all_indices():
             percent_cut = self.lcs[control_index].apply_cut(
@@ -831,15 +1184,13 @@ class Supernova:
         stats.set_index("control_index", inplace=True)
 
         for control_index in self.get_control_indices():
-            dflux_clean_ix = self.lcs[control_index].ix_unmasked(
-                "Mask", maskval=cut.params["uncert_cut_flag"]
-            )
-            x2_clean_ix = self.lcs[control_index].ix_inrange(
-                colnames=["chi/N"],
-                uplim=cut.params["temp_x2_max_value"],
-                exclude_uplim=True,
+            dflux_clean = unmasked("Mask", maskval=cut.params["uncert_cut_flag"])
+            clean_ix = self.lcs[control_index].where(
+                dflux_clean
+                & inrange(
+                    "chi/N", uplim=cut.params["temp_x2_max_value"], exclude_uplim=True
+                )
             )
-            clean_ix = AandB(dflux_clean_ix, x2_clean_ix)
 
             median_dflux = self.lcs[control_index].get_median_dflux(indices=clean_ix)
 
@@ -849,7 +1200,7 @@ class Supernova:
                     f'WARNING: Could not get flux std dev using clean indices; retrying without preliminary chi-square cut of {cut.params["temp_x2_max_value"]}...'
                 )
                 stdev_flux = self.lcs[control_index].get_stdev_flux(
-                    indices=dflux_clean_ix
+                    indices=self.lcs[control_index].where(dflux_clean)
                 )
                 if stdev_flux is None:
                     print(
@@ -871,65 +1222,84 @@ class Supernova:
         for control_index in self.get_all_indices():
             self.lcs[control_index].add_noise_to_dflux(sigma_extra)
 
-    def get_all_controls(self):
-        controls = [
-            deepcopy(self.lcs[control_index].t)
-            for control_index in self.lcs
-            if control_index > 0
-        ]
-        all_controls = pdastrostatsclass()
-        all_controls.t = pd.concat(controls, ignore_index=True)
-        return all_controls
+    def get_control_columns(self, colnames: List[str], flag=None):
+        """
+        Get columns of all control light curves, concatenated in control index order.
 
-    def calculate_control_stats(self, previous_flags):
-        print("Calculating control light curve statistics...")
+        :param colnames: Names of the columns.
+        :param flag: If not None, only get the epochs without any of these flags.
 
-        len_mjd = len(self.lcs[0].t["MJD"])
+        :return: List with one array per column.
+        """
+        control_indices = self.get_control_indices()
+        stack = self.get_stack()
+        if stack is None:
+            columns = []
+            for colname in colnames:
+                values = []
+                for control_index in control_indices:
+                    lc = self.lcs[control_index]
+                    ix = lc.getindices() if flag is None else lc.get_good_indices(flag)
+                    values.append(lc.t.loc[ix, colname].to_numpy())
+                columns.append(np.concatenate(values))
+            return columns
+
+        rows = [stack.get_row(control_index) for control_index in control_indices]
+        keep = None
+        if not flag is None:
+            keep = (
+                np.bitwise_and(stack.get("Mask")[rows], np.uint32(flag)) == 0
+            ).ravel()
+        columns = []
+        for colname in colnames:
+            values = stack.get(colname)[rows].ravel()
+            columns.append(values if keep is None else values[keep])
+        return columns
+
+    def get_controls_view(self):
+        """
+        Get a read-only LightCurveView of the rows of all control light curves.
+        """
+        return LightCurveView(
+            [self.lcs[control_index] for control_index in self.get_control_indices()],
+            stack=self.get_stack(),
+        )
 
-        # construct arrays for control lc data
-        uJy = np.full((self.num_controls, len_mjd), np.nan)
-        duJy = np.full((self.num_controls, len_mjd), np.nan)
-        Mask = np.full((self.num_controls, len_mjd), 0, dtype=np.int32)
+    def calculate_control_stats(self, previous_flags):
+        print("Calculating control light curve statistics...")
 
-        i = 1
-        for control_index in self.get_control_indices():
-            if len(self.lcs[control_index].t) != len_mjd or not np.array_equal(
-                self.lcs[0].t["MJD"], self.lcs[control_index].t["MJD"]
-            ):
-                raise RuntimeError(
-                    f"ERROR: SN lc not equal to control lc for control_index {control_index}! Rerun or debug verify_mjds()."
-                )
-            else:
-                uJy[i - 1, :] = self.lcs[control_index].t["uJy"]
-                duJy[i - 1, :] = self.lcs[control_index].t[
-                    self.lcs[control_index].dflux_colname
-                ]
-                Mask[i - 1, :] = self.lcs[control_index].t["Mask"]
+        stack = self.get_stack()
+        if stack is None:
+            raise RuntimeError(
+                f"ERROR: SN lc not equal to control lcs! Rerun or debug verify_mjds()."
+            )
 
-            i += 1
+        # control lc data, one row per control lc
+        control_rows = [
+            stack.get_row(control_index) for control_index in self.get_control_indices()
+        ]
+        uJy = stack.get("uJy")[control_rows].astype(np.float64)
+        duJy = stack.get(self.lcs[0].dflux_colname)[control_rows].astype(np.float64)
+        Mask = stack.get("Mask")[control_rows]
 
         c2_param2columnmapping = self.lcs[0].intializecols4statparams(
-            prefix="c2_", format4outvals="{:.2f}", skipparams=["converged", "i"]
-        )
-
-        for index in range(uJy.shape[-1]):
-            pda4MJD = pdastrostatsclass()
-            pda4MJD.t["uJy"] = uJy[0:, index]
-            pda4MJD.t[self.lcs[0].dflux_colname] = duJy[0:, index]
-            pda4MJD.t["Mask"] = np.bitwise_and(Mask[0:, index], previous_flags)
-
-            pda4MJD.calcaverage_sigmacutloop(
-                "uJy",
-                noisecol=self.lcs[0].dflux_colname,
-                maskcol="Mask",
-                maskval=previous_flags,
-                verbose=1,
-                Nsigma=3.0,
-                median_firstiteration=True,
-            )
-            self.lcs[0].statresults2table(
-                pda4MJD.statparams, c2_param2columnmapping, destindex=index
-            )
+            prefix="c2_",
+            format4outvals="{:.2f}",
+            skipparams=["converged", "i"],
+            setcol2None=False,
+        )
+
+        # 3-sigma clipped average of the control fluxes of all epochs at once,
+        # with one row per epoch
+        c2_stats = sigmacut_rows(
+            uJy.T,
+            duJy.T,
+            valid=(np.bitwise_and(Mask, previous_flags) == 0).T,
+            Nsigma=3.0,
+            median_firstiteration=True,
+        )
+        for param, outcol in c2_param2columnmapping:
+            self.lcs[0].t[outcol] = c2_stats[param]
 
     def apply_controls_cut(self, cut: Cut, previous_flags: int):
         self.calculate_control_stats(previous_flags)
@@ -938,12 +1308,12 @@ class Supernova:
         )
 
         # flag SN measurements
-        self.lcs[0].flag_by_control_stats(cut)
+        transaction = self.lcs[0].flag_by_control_stats(cut)
 
         # copy over SN's control cut flags to control light curve 'Mask' columns
-        flags_arr = np.full(
-            self.lcs[0].t["Mask"].shape,
-            (
+        flags_to_copy = np.bitwise_and(
+            self.lcs[0].flags.get_values(),
+            np.uint32(
                 cut.flag
                 | cut.params["questionable_flag"]
                 | cut.params["x2_flag"]
@@ -952,42 +1322,37 @@ class Supernova:
                 | cut.params["Ngood_flag"]
             ),
         )
-        flags_to_copy = np.bitwise_and(self.lcs[0].t["Mask"], flags_arr)
-        for control_index in self.get_control_indices():
-            self.lcs[control_index].copy_flags(flags_to_copy)
+        stack = self.get_stack()
+        if not stack is None and len(flags_to_copy) > 0:
+            stack.copy_flags(
+                flags_to_copy,
+                rows=[
+                    stack.get_row(control_index)
+                    for control_index in self.get_control_indices()
+                ],
+            )
+        else:
+            for control_index in self.get_control_indices():
+                self.lcs[control_index].copy_flags(flags_to_copy)
 
         # self.drop_extra_columns()
 
-        len_ix = len(self.lcs[0].getindices())
-        x2_percent_cut = (
-            100
-            * len(self.lcs[0].ix_masked("Mask", maskval=cut.params["x2_flag"]))
-            / len_ix
-        )
-        stn_percent_cut = (
-            100
-            * len(self.lcs[0].ix_masked("Mask", maskval=cut.params["stn_flag"]))
-            / len_ix
-        )
-        Nclip_percent_cut = (
-            100
-            * len(self.lcs[0].ix_masked("Mask", maskval=cut.params["Nclip_flag"]))
-            / len_ix
-        )
-        Ngood_percent_cut = (
-            100
-            * len(self.lcs[0].ix_masked("Mask", maskval=cut.params["Ngood_flag"]))
-            / len_ix
-        )
-        questionable_percent_cut = (
-            100
-            * len(
-                self.lcs[0].ix_masked("Mask", maskval=cut.params["questionable_flag"])
-            )
-            / len_ix
-        )
-        percent_cut = (
-            100 * len(self.lcs[0].ix_masked("Mask", maskval=cut.flag)) / len_ix
+        (
+            x2_percent_cut,
+            stn_percent_cut,
+            Nclip_percent_cut,
+            Ngood_percent_cut,
+            questionable_percent_cut,
+            percent_cut,
+        ) = transaction.get_percents(
+            [
+                cut.params["x2_flag"],
+                cut.params["stn_flag"],
+                cut.params["Nclip_flag"],
+                cut.params["Ngood_flag"],
+                cut.params["questionable_flag"],
+                cut.flag,
+            ]
         )
         return (
             x2_percent_cut,
@@ -1007,13 +1372,11 @@ class Supernova:
         for control_index in self.get_all_indices():
             avg_sn.set_avg_lc(
                 self.lcs[control_index].average(
-                    cut,
-                    previous_flags,
-                    mjdbinsize=mjdbinsize,
-                    flux2mag_sigmalimit=flux2mag_sigmalimit,
+                    cut, previous_flags, mjdbinsize=mjdbinsize, add_mags=False
                 ),
                 control_index=control_index,
             )
+        avg_sn.flux2mag(upperlim_Nsigma=flux2mag_sigmalimit)
 
         all_flags = (
             previous_flags
@@ -1021,11 +1384,7 @@ class Supernova:
             | cut.params["ixclip_flag"]
             | cut.params["smallnum_flag"]
         )
-        percent_cut = (
-            100
-            * len(avg_sn.avg_lcs[0].ix_masked("Mask", maskval=all_flags))
-            / len(avg_sn.avg_lcs[0].t)
-        )
+        (percent_cut,) = avg_sn.avg_lcs[0].flags.get_percents([all_flags])
         return avg_sn, percent_cut
 
     def drop_extra_columns(self):
@@ -1037,34 +1396,110 @@ class Supernova:
         files = [f for f in directory_path.iterdir() if f.is_file()]
         return len(files)
 
+    def get_lc_filename(self, input_dir, control_index=0, cleaned=False):
+        return get_filename(
+            input_dir, self.tnsname, self.filt, control_index, cleaned=cleaned
+        )
+
     def load(self, input_dir, control_index=0, cleaned=False):
         self.lcs[control_index] = LightCurve(
             control_index=control_index, filt=self.filt
         )
         self.lcs[control_index].load_lc(input_dir, self.tnsname, cleaned=cleaned)
 
-    def load_all(self, input_dir, num_controls=0, cleaned=False):
+    def load_concurrently(
+        self, lcs: Dict, load, get_filename, num_controls=0, max_workers=None
+    ):
+        """
+        Load the SN light curve and the first num_controls control light curves that can be loaded,
+        reading the files in a thread pool. The control directory is listed once; control indices without
+        a file, or whose file cannot be loaded, are skipped in order, and the reason is printed for each of them.
+        Unlike loading the control indices one by one, a RuntimeError is raised if fewer than num_controls
+        control light curves can be loaded.
+
+        :param lcs: Dictionary of light curves that load() adds to; it is sorted by control index afterwards.
+        :param load: Function load(control_index) that loads a light curve into lcs.
+        :param get_filename: Function get_filename(control_index) that returns the file name of a light curve.
+        :param num_controls: Number of control light curves to load.
+        :param max_workers: Maximum number of threads (ThreadPoolExecutor default if None).
+
+        :return: List of the control indices of the loaded control light curves.
+        """
+        candidates = []
+        if num_controls > 0:
+            control_dir = os.path.dirname(get_filename(1))
+            try:
+                filenames = set(os.listdir(control_dir))
+            except OSError:
+                filenames = set()
+            for filename in filenames:
+                match = re.search(r"_i(\d+)\.", filename)
+                if match and filename == os.path.basename(
+                    get_filename(int(match.group(1)))
+                ):
+                    candidates.append(int(match.group(1)))
+            candidates.sort()
+
+        loaded = []
+        tried = []
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            sn_future = executor.submit(load, 0)
+
+            # load only as many as still needed, and more if some of them fail
+            while len(loaded) < num_controls and len(tried) < len(candidates):
+                batch = candidates[len(tried) : len(tried) + num_controls - len(loaded)]
+                futures = [
+                    executor.submit(load, control_index) for control_index in batch
+                ]
+                for control_index, future in zip(batch, futures):
+                    tried.append(control_index)
+                    try:
+                        future.result()
+                        loaded.append(control_index)
+                    except Exception as e:
+                        errors[control_index] = e
+                        lcs.pop(control_index, None)
+
+            sn_future.result()
+
+        # report the skipped control indices in order, like loading them one by one
+        for control_index in range(1, max(tried, default=0) + 1):
+            if not control_index in loaded:
+                reason = errors.get(control_index, "no such file")
+                print(
+                    f"Could not load control light curve {control_index} ({reason}); skipping..."
+                )
+        if len(loaded) < num_controls:
+            raise RuntimeError(
+                f"ERROR: Could only load {len(loaded)} of {num_controls} control light curves from {os.path.dirname(get_filename(1))}."
+            )
+
+        sorted_lcs = sorted(lcs.items())
+        lcs.clear()
+        lcs.update(sorted_lcs)
+        return loaded
+
+    def load_all(self, input_dir, num_controls=0, cleaned=False, max_workers=None):
         self.lcs = {}
+        self.stack = None
         self.num_controls = 0
 
         print(f"\nLoading SN light curve and {num_controls} control light curves...")
 
-        # load SN light curve
-        self.load(input_dir, cleaned=cleaned)
-
-        if num_controls > 0:
-            # keep iterating over control indices until we successfully load num_controls light curves
-            control_index = 1
-            while self.num_controls < num_controls:
-                try:
-                    self.load(input_dir, control_index=control_index, cleaned=cleaned)
-                    self.num_controls += 1
-                except:
-                    print(
-                        f"Could not load control light curve {control_index}; skipping..."
-                    )
-                    del self.lcs[control_index]
-                control_index += 1
+        # load SN light curve and control light curves concurrently
+        loaded = self.load_concurrently(
+            self.lcs,
+            lambda control_index: self.load(
+                input_dir, control_index=control_index, cleaned=cleaned
+            ),
+            lambda control_index: self.get_lc_filename(
+                input_dir, control_index=control_index, cleaned=cleaned
+            ),
+            num_controls=num_controls,
+            max_workers=max_workers,
+        )
+        self.num_controls = len(loaded)
 
         print(
             f"Successfully loaded SN light curve and {self.num_controls} control light curves (control indices: {self.get_control_indices()})"
@@ -1120,6 +1555,38 @@ class AveragedSupernova(Supernova):
     def set_avg_lcs(self, lcs):
         self.avg_lcs = deepcopy(lcs)
 
+    def flux2mag(self, zpt=23.9, upperlim_Nsigma=3.0):
+        """
+        Add the magnitude columns "m" and "dm" to all averaged light curves, converting their fluxes in one call.
+
+        :param zpt: Zero point of the magnitudes.
+        :param upperlim_Nsigma: Calculate upper limits for S/N below this value.
+        """
+        indices = self.get_all_indices()
+        lens = [len(self.avg_lcs[control_index].t) for control_index in indices]
+        flux = np.concatenate(
+            [
+                self.avg_lcs[control_index].t["uJy"].to_numpy()
+                for control_index in indices
+            ]
+        )
+        dflux = np.concatenate(
+            [
+                self.avg_lcs[control_index].t["duJy"].to_numpy()
+                for control_index in indices
+            ]
+        )
+        mag, dmag = flux2mag_arrays(
+            flux, dflux, zpt=zpt, upperlim_Nsigma=upperlim_Nsigma
+        )
+        splits = np.cumsum(lens)[:-1]
+        for control_index, m, dm in zip(
+            indices, np.split(mag, splits), np.split(dmag, splits)
+        ):
+            if len(m) > 0:
+                self.avg_lcs[control_index].t["m"] = m
+                self.avg_lcs[control_index].t["dm"] = dm
+
     def get_avg(self, control_index: int = 0):
         try:
             return self.avg_lcs[control_index].t
@@ -1128,13 +1595,18 @@ class AveragedSupernova(Supernova):
                 f"Cannot get averaged control light curve {control_index}. Num controls set to {self.num_controls} and {len(self.avg_lcs)} lcs in dictionary."
             )
 
+    def get_lc_filename(self, input_dir, control_index=0, cleaned=False):
+        return get_filename(
+            input_dir, self.tnsname, self.filt, control_index, self.mjdbinsize
+        )
+
     def load(self, input_dir, control_index=0):
         self.avg_lcs[control_index] = AveragedLightCurve(
             control_index=control_index, filt=self.filt, mjdbinsize=self.mjdbinsize
         )
         self.avg_lcs[control_index].load_lc(input_dir, self.tnsname)
 
-    def load_all(self, input_dir, num_controls=0):
+    def load_all(self, input_dir, num_controls=0, max_workers=None):
         self.avg_lcs = {}
         self.num_controls = 0
 
@@ -1142,22 +1614,17 @@ class AveragedSupernova(Supernova):
             f"\nLoading averaged SN light curve and {num_controls} averaged control light curves..."
         )
 
-        # load averaged SN light curve
-        self.load(input_dir)
-
-        if num_controls > 0:
-            # keep iterating over control indices until we successfully load num_controls averaged light curves
-            control_index = 1
-            while self.num_controls < num_controls:
-                try:
-                    self.load(input_dir, control_index=control_index)
-                    self.num_controls += 1
-                except:
-                    print(
-                        f"Could not load control light curve {control_index}; skipping..."
-                    )
-                    del self.avg_lcs[control_index]
-                control_index += 1
+        # load averaged SN light curve and averaged control light curves concurrently
+        loaded = self.load_concurrently(
+            self.avg_lcs,
+            lambda control_index: self.load(input_dir, control_index=control_index),
+            lambda control_index: self.get_lc_filename(
+                input_dir, control_index=control_index
+            ),
+            num_controls=num_controls,
+            max_workers=max_workers,
+        )
+        self.num_controls = len(loaded)
 
         print(
             f"Successfully loaded averaged SN light curve and {self.num_controls} averaged control light curves"
@@ -1192,6 +1659,222 @@ class AveragedSupernova(Supernova):
         return f"Averaged SN {self.tnsname} at {self.coords}: MJD0 = {self.mjd0}, {self.num_controls} control light curves"
 
 
+class FlagColumn:
+    def __init__(self, lc: pdastrostatsclass, colname: str = "Mask"):
+        """
+        Bit flag column of a light curve, stored as uint32.
+
+        :param lc: Light curve with the flag column.
+        :param colname: Name of the flag column.
+        """
+        self.lc = lc
+        self.colname = colname
+
+    def convert(self):
+        """
+        Convert the column to uint32 if it is not already.
+        """
+        if self.lc.t[self.colname].dtype != np.uint32:
+            self.lc.t[self.colname] = (
+                self.lc.t[self.colname].to_numpy().astype(np.int64).astype(np.uint32)
+            )
+
+    def get_values(self, indices=None):
+        """
+        Get the flags as a uint32 array. For all rows, this is the array of the column itself,
+        which may be read-only, so it must not be modified; use set_values() to write new flags.
+
+        :param indices: Indices of the rows to get (all rows if None).
+        """
+        self.convert()
+        values = self.lc.t[self.colname].to_numpy()
+        positions = self.lc.getpositions(indices)
+        if not positions is None:
+            values = values[positions]
+        return values
+
+    def set_values(self, values):
+        """
+        Replace the flags of all rows.
+
+        :param values: uint32 array with the new flags of all rows.
+        """
+        self.lc.t[self.colname] = values
+        self.lc.modified()
+
+    def any(self, flags: int, indices=None):
+        """
+        Get a boolean array that is True for rows with any of the flags set.
+
+        :param flags: Flags to check for.
+        :param indices: Indices of the rows to check (all rows if None).
+        """
+        return np.bitwise_and(self.get_values(indices), np.uint32(flags)) != 0
+
+    def none(self, flags: int, indices=None):
+        """
+        Get a boolean array that is True for rows with none of the flags set.
+
+        :param flags: Flags to check for.
+        :param indices: Indices of the rows to check (all rows if None).
+        """
+        return np.bitwise_and(self.get_values(indices), np.uint32(flags)) == 0
+
+    def set(self, flags, indices=None):
+        """
+        Set flags in the column.
+
+        :param flags: Flags to set, either one value or one value per row of indices.
+        :param indices: Indices of the rows to flag (all rows if None).
+        """
+        values = self.get_values().copy()
+        flags = np.asarray(flags).astype(np.uint32)
+        positions = self.lc.getpositions(indices)
+        if positions is None:
+            values |= flags
+        else:
+            values[positions] |= flags
+        self.set_values(values)
+
+    def clear(self, flags: int, indices=None):
+        """
+        Clear flags in the column.
+
+        :param flags: Flags to clear.
+        :param indices: Indices of the rows to clear (all rows if None).
+        """
+        values = self.get_values().copy()
+        keep = ~np.uint32(flags)
+        positions = self.lc.getpositions(indices)
+        if positions is None:
+            values &= keep
+        else:
+            values[positions] &= keep
+        self.set_values(values)
+
+    def get_bit_counts(self, indices=None):
+        """
+        Count the rows with each bit set, in a single pass over the column.
+
+        :param indices: Indices of the rows to count (all rows if None).
+
+        :return: Array with the number of rows with bit i (flag 2**i) set at index i.
+        """
+        values = self.get_values(indices).astype("<u4")
+        bits = np.unpackbits(
+            values.view(np.uint8).reshape(-1, 4), axis=1, bitorder="little"
+        )
+        return bits.sum(axis=0)
+
+    def get_percents(self, flags_list: List[int], indices=None):
+        """
+        Get the percentage of rows flagged with each of the given flags.
+        Single bit flags are looked up in one popcount summary of all bits.
+
+        :param flags_list: List of flags; rows are counted if any bit of a flag is set.
+        :param indices: Indices of the rows to count (all rows if None).
+        """
+        num_rows = len(self.get_values(indices))
+        bit_counts = self.get_bit_counts(indices)
+        percents = []
+        for flags in flags_list:
+            if flags > 0 and flags & (flags - 1) == 0:
+                count = bit_counts[int(flags).bit_length() - 1]
+            else:
+                count = np.count_nonzero(self.any(flags, indices=indices))
+            percents.append(100 * count / num_rows)
+        return percents
+
+    def transaction(self):
+        """
+        Start collecting flag updates that are written to the column at once (see FlagTransaction).
+        """
+        return FlagTransaction(self)
+
+
+class FlagTransaction:
+    def __init__(self, flags: FlagColumn):
+        """
+        Flag updates of a flag column, collected in memory and written to the column by commit()
+        with one bitwise operation per flag. Used as a context manager, the updates are committed
+        at the end of the with block:
+
+            with lc.flags.transaction() as transaction:
+                transaction.update(flag, indices)
+
+        :param flags: Flag column to update.
+        """
+        self.flags = flags
+        # flag -> [remove_old, boolean array of the rows to flag]
+        self.updates = {}
+        self.counts = {}
+        self.num_rows = 0
+
+    def get_flagged(self, indices=None, flagged=None):
+        if not flagged is None:
+            return np.array(flagged, dtype=bool)
+        positions = self.flags.lc.getpositions(indices)
+        if positions is None:
+            return np.full(len(self.flags.lc.t), True)
+        rows = np.full(len(self.flags.lc.t), False)
+        rows[positions] = True
+        return rows
+
+    def update(self, flag, indices=None, flagged=None, remove_old=True):
+        """
+        Add a flag update.
+
+        :param flag: Flag to set.
+        :param indices: Indices of the rows to flag (all rows if None and flagged is None).
+        :param flagged: Boolean array that is True for the rows to flag, instead of indices.
+        :param remove_old: Remove any old flags of the same value first, including earlier updates of this transaction.
+        """
+        rows = self.get_flagged(indices=indices, flagged=flagged)
+        flag = int(flag)
+        if remove_old or not flag in self.updates:
+            self.updates[flag] = [remove_old, rows]
+        else:
+            self.updates[flag][1] |= rows
+
+    def commit(self):
+        """
+        Write the collected updates to the flag column.
+
+        :return: Dictionary with the number of rows flagged with each updated flag.
+        """
+        values = self.flags.get_values()
+        if len(self.updates) > 0:
+            values = values.copy()
+            for flag, (remove_old, rows) in self.updates.items():
+                if remove_old:
+                    values &= ~np.uint32(flag)
+                values[rows] |= np.uint32(flag)
+            self.flags.set_values(values)
+
+        self.counts = {
+            flag: np.count_nonzero(np.bitwise_and(values, np.uint32(flag)))
+            for flag in self.updates
+        }
+        self.num_rows = len(values)
+        self.updates = {}
+        return self.counts
+
+    def get_percents(self, flags_list: List[int]):
+        """
+        Get the percentage of rows flagged with each of the given flags, which must have been updated in the last commit.
+
+        :param flags_list: List of flags.
+        """
+        return [100 * self.counts[int(flags)] / self.num_rows for flags in flags_list]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+
+
 # contains either o-band or c-band measurements only
 class LightCurve(pdastrostatsclass):
     def __init__(self, control_index=0, filt="o", **kwargs):
@@ -1200,6 +1883,10 @@ class LightCurve(pdastrostatsclass):
         self.filt = filt
         self.dflux_colname = "duJy"
 
+    @property
+    def flags(self):
+        return FlagColumn(self, "Mask")
+
     def set_df(self, t: pd.DataFrame):
         self.t = deepcopy(t)
 
@@ -1210,26 +1897,29 @@ class LightCurve(pdastrostatsclass):
         return self.ix_inrange(colnames="MJD", lowlim=mjd0)
 
     def get_good_indices(self, flag: int):
-        return self.ix_unmasked("Mask", maskval=flag)
+        return self.t.index.values[self.flags.none(flag)]
 
     def get_bad_indices(self, flag: int):
-        return self.ix_masked("Mask", maskval=flag)
+        return self.t.index.values[self.flags.any(flag)]
 
     def remove_invalid_rows(self, verbose=False):
-        dflux_zero_ix = self.ix_equal(colnames=["duJy"], val=0)
-        flux_nan_ix = self.ix_is_null(colnames=["uJy"])
-        if len(AorB(dflux_zero_ix, flux_nan_ix)) > 0:
+        dflux_zero_ix = self.indexset(predicate=equal(["duJy"], 0))
+        flux_nan_ix = self.indexset(predicate=isnull(["uJy"]))
+        invalid_ix = AorB(dflux_zero_ix, flux_nan_ix)
+        if len(invalid_ix) > 0:
             if verbose:
                 print(
                     f"Deleting {len(dflux_zero_ix) + len(flux_nan_ix)} rows with duJy=0 or uJy=NaN..."
                 )
-            self.t.drop(AorB(dflux_zero_ix, flux_nan_ix), inplace=True)
+            self.t.drop(invalid_ix.get_indices(), inplace=True)
+            self.modified()
 
     def calculate_fdf_column(self, verbose=False):
         # replace infs with NaNs
         if verbose:
             print("Replacing infs with NaNs...")
         self.t.replace([np.inf, -np.inf], np.nan, inplace=True)
+        self.modified()
 
         # calculate flux/dflux
         if verbose:
@@ -1242,251 +1932,269 @@ class LightCurve(pdastrostatsclass):
         return np.nanmedian(self.t.loc[indices, "duJy"])
 
     def get_stdev_flux(self, indices=None):
-        self.calcaverage_sigmacutloop(
-            "uJy", indices=indices, Nsigma=3.0, median_firstiteration=True
+        if indices is None:
+            indices = self.getindices()
+        stats = sigmacut_stats(
+            self.t.loc[indices, "uJy"], Nsigma=3.0, median_firstiteration=True
         )
-        return self.statparams["stdev"]
+        return stats.stdev
 
     def add_noise_to_dflux(self, sigma_extra):
         self.t["duJy_new"] = np.sqrt(self.t["duJy"] * self.t["duJy"] + sigma_extra**2)
+        # the column may already exist, and pandas can then write the values in place
+        self.modified()
         self.dflux_colname = "duJy_new"
         self.calculate_fdf_column()
 
     def flag_by_control_stats(self, cut: Cut):
-        # flag SN measurements according to given bounds
-        flag_x2_ix = self.ix_inrange(
-            colnames=["c2_X2norm"], lowlim=cut.params["x2_max"], exclude_lowlim=True
-        )
-        flag_stn_ix = self.ix_inrange(
-            colnames=["c2_abs_stn"], lowlim=cut.params["stn_max"], exclude_lowlim=True
-        )
-        flag_nclip_ix = self.ix_inrange(
-            colnames=["c2_Nclip"], lowlim=cut.params["Nclip_max"], exclude_lowlim=True
-        )
-        flag_ngood_ix = self.ix_inrange(
-            colnames=["c2_Ngood"], uplim=cut.params["Ngood_min"], exclude_uplim=True
-        )
-        self.update_mask_column(cut.params["x2_flag"], flag_x2_ix)
-        self.update_mask_column(cut.params["stn_flag"], flag_stn_ix)
-        self.update_mask_column(cut.params["Nclip_flag"], flag_nclip_ix)
-        self.update_mask_column(cut.params["Ngood_flag"], flag_ngood_ix)
+        """
+        Flag the SN measurements according to the given bounds of the control light curve statistics.
 
-        # update mask column with control light curve cut on any measurements flagged according to given bounds
-        zero_Nclip_ix = self.ix_equal("c2_Nclip", 0)
-        unmasked_ix = self.ix_unmasked(
-            "Mask",
-            maskval=cut.params["x2_flag"]
-            | cut.params["stn_flag"]
-            | cut.params["Nclip_flag"]
-            | cut.params["Ngood_flag"],
-        )
-        self.update_mask_column(
-            cut.params["questionable_flag"], AnotB(unmasked_ix, zero_Nclip_ix)
-        )
-        self.update_mask_column(cut.flag, AnotB(self.getindices(), unmasked_ix))
+        :return: Committed FlagTransaction with the counts of all flags of the cut.
+        """
+        flag_x2 = inrange(
+            "c2_X2norm", lowlim=cut.params["x2_max"], exclude_lowlim=True
+        ).evaluate(self)
+        flag_stn = inrange(
+            "c2_abs_stn", lowlim=cut.params["stn_max"], exclude_lowlim=True
+        ).evaluate(self)
+        flag_nclip = inrange(
+            "c2_Nclip", lowlim=cut.params["Nclip_max"], exclude_lowlim=True
+        ).evaluate(self)
+        flag_ngood = inrange(
+            "c2_Ngood", uplim=cut.params["Ngood_min"], exclude_uplim=True
+        ).evaluate(self)
+        # measurements flagged according to any of the given bounds
+        out_of_bounds = flag_x2 | flag_stn | flag_nclip | flag_ngood
+
+        with self.flags.transaction() as transaction:
+            transaction.update(cut.params["x2_flag"], flagged=flag_x2)
+            transaction.update(cut.params["stn_flag"], flagged=flag_stn)
+            transaction.update(cut.params["Nclip_flag"], flagged=flag_nclip)
+            transaction.update(cut.params["Ngood_flag"], flagged=flag_ngood)
+
+            # control light curve cut on any measurements out of bounds,
+            # questionable if not out of bounds but with clipped control measurements
+            transaction.update(
+                cut.params["questionable_flag"],
+                flagged=~out_of_bounds & ~equal("c2_Nclip", 0).evaluate(self),
+            )
+            transaction.update(cut.flag, flagged=out_of_bounds)
+        return transaction
+
+    def sort_by_mjd(self):
+        """
+        Sort the table by MJD and reset the index to 0..N-1.
+        The sort order is cached, so a table that is already sorted is not sorted again.
+        """
+        positions = self.getsortpositions("MJD")
+        if not np.array_equal(positions, np.arange(len(positions))):
+            self.t = self.t.iloc[positions]
+        index = self.t.index
+        if not (
+            isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1
+        ):
+            self.t.reset_index(drop=True, inplace=True)
+
+    def align_to_mjds(self, mjd, tolerance=0.0):
+        """
+        Reindex the light curve onto a sorted MJD grid in one step.
+        Epochs of the grid without a matching epoch become rows with NaN values and Mask 0,
+        and epochs that are not on the grid are dropped.
+        The MJD column is overwritten with the grid, so with tolerance > 0 a matched row takes the MJD of
+        the grid epoch it was matched to, and its own MJD is lost.
+
+        :param mjd: Sorted MJDs of the grid (usually the SN light curve's).
+        :param tolerance: Maximum MJD difference for two epochs to count as the same epoch; 0 requires an exact match.
+        """
+        self.sort_by_mjd()
+        positions = match_mjds(mjd, self.t["MJD"].to_numpy(), tolerance=tolerance)
+
+        # the table has a 0..N-1 index after sorting, so positions are labels,
+        # and -1 gives a row of NaNs
+        self.t = self.t.reindex(positions)
+        self.t.reset_index(drop=True, inplace=True)
+        self.t["MJD"] = np.asarray(mjd)
+
+        missing = positions < 0
+        if "Mask" in self.t.columns and missing.any():
+            self.t.loc[missing, "Mask"] = 0
+            self.modified()
+            self.flags.convert()
 
     def copy_flags(self, flags_to_copy):
-        self.t["Mask"] = self.t["Mask"].astype(np.int32)
         if len(self.t) < 1:
             return
-        elif len(self.t) == 1:
-            self.t.loc[0, "Mask"] = int(self.t.loc[0, "Mask"]) | flags_to_copy
-        else:
-            self.t["Mask"] = np.bitwise_or(self.t["Mask"], flags_to_copy)
+        self.flags.set(flags_to_copy)
 
     def average(
-        self, cut: Cut, previous_flags, mjdbinsize=1.0, flux2mag_sigmalimit=3.0
+        self,
+        cut: Cut,
+        previous_flags,
+        mjdbinsize=1.0,
+        flux2mag_sigmalimit=3.0,
+        add_mags=True,
     ):
-        avg_lc = AveragedLightCurve(
-            self.control_index,
-            filt=self.filt,
-            mjdbinsize=mjdbinsize,
-            columns=[
-                "MJD",
-                "MJDbin",
-                "uJy",
-                "duJy",
-                "stdev",
-                "x2",
-                "Nclip",
-                "Ngood",
-                "Nexcluded",
-                "Mask",
-            ],
-            hexcols=["Mask"],
-        )
+        """
+        Average the light curve in MJD bins.
+
+        :param add_mags: Add the magnitude columns "m" and "dm". If False, they can be added later for all averaged light curves at once with AveragedSupernova.flux2mag().
+        """
         if self.control_index == 0:
             print(f"Now averaging SN light curve...")
         else:
             print(f"Now averaging control light curve {self.control_index}...")
 
+        mjds = self.t["MJD"].to_numpy(dtype=np.float64)
+        good = self.flags.none(previous_flags)
+
+        # lower limits of the MJD bins, added up one bin at a time,
+        # followed by the upper limit of the last bin
         mjd = int(np.amin(self.t["MJD"]))
         mjd_max = int(np.amax(self.t["MJD"])) + 1
+        steps = np.full(int((mjd_max - mjd) / mjdbinsize) + 2, mjdbinsize)
+        lims = np.cumsum(np.concatenate(([mjd], steps)))
+        num_bins = np.count_nonzero(lims <= mjd_max)
+        lims = lims[: num_bins + 1]
+
+        # assign each measurement to the bin with lims[bin] <= MJD < lims[bin+1]
+        bin_ix = np.searchsorted(lims, mjds, side="right") - 1
+        (ix,) = np.where((bin_ix >= 0) & (bin_ix < num_bins))
+        # sort by bin, keeping the order of the measurements within each bin
+        ix = ix[np.argsort(bin_ix[ix], kind="stable")]
+        bins = bin_ix[ix]
+        counts = np.bincount(bins, minlength=num_bins)
+        good_counts = np.bincount(bins[good[ix]], minlength=num_bins)
+
+        # one row per bin with measurements, with the table positions of its measurements
+        (occupied,) = np.where(counts > 0)
+        segment_rows = np.cumsum(counts > 0)[bins] - 1
+        segment_ix = np.full((len(occupied), max(counts.max(), 1)), -1)
+        segment_ix[
+            segment_rows, np.arange(len(ix)) - (np.cumsum(counts) - counts)[bins]
+        ] = ix
+        in_segment = segment_ix >= 0
+        mjd_segments = np.where(in_segment, mjds[segment_ix], np.nan)
+        flux_segments = np.where(
+            in_segment, self.t["uJy"].to_numpy(dtype=np.float64)[segment_ix], np.nan
+        )
+        dflux_segments = np.where(
+            in_segment,
+            self.t[self.dflux_colname].to_numpy(dtype=np.float64)[segment_ix],
+            np.nan,
+        )
 
-        while mjd <= mjd_max:
-            range_ix = self.ix_inrange(
-                colnames=["MJD"], lowlim=mjd, uplim=mjd + mjdbinsize, exclude_uplim=True
-            )
-            range_good_ix = self.ix_unmasked(
-                "Mask", maskval=previous_flags, indices=range_ix
-            )
-
-            # add new row to averaged light curve
-            new_row = {
-                "MJDbin": mjd + 0.5 * mjdbinsize,
-                "Nclip": 0,
-                "Ngood": 0,
-                "Nexcluded": len(range_ix) - len(range_good_ix),
-                "Mask": 0,
-            }
-            avglc_index = avg_lc.newrow(new_row)
-
-            # if no measurements present, flag or skip over day
-            if len(range_ix) < 1:
-                avg_lc.update_mask_column(cut.flag, [avglc_index], remove_old=False)
-                mjd += mjdbinsize
-                continue
-
-            # if no good measurements, average values anyway and flag
-            if len(range_good_ix) < 1:
-                # average flux
-                self.calcaverage_sigmacutloop(
-                    "uJy",
-                    noisecol=self.dflux_colname,
-                    indices=range_ix,
-                    Nsigma=3.0,
-                    median_firstiteration=True,
-                )
-                fluxstatparams = deepcopy(self.statparams)
-
-                # get average mjd
-                self.calcaverage_sigmacutloop(
-                    "MJD", indices=range_ix, Nsigma=0, median_firstiteration=False
-                )
-                avg_mjd = self.statparams["mean"]
-
-                # add row and flag
-                row = {
-                    "MJD": avg_mjd,
-                    "uJy": (
-                        fluxstatparams["mean"]
-                        if not fluxstatparams["mean"] is None
-                        else np.nan
-                    ),
-                    "duJy": (
-                        fluxstatparams["mean_err"]
-                        if not fluxstatparams["mean_err"] is None
-                        else np.nan
-                    ),
-                    "stdev": (
-                        fluxstatparams["stdev"]
-                        if not fluxstatparams["stdev"] is None
-                        else np.nan
-                    ),
-                    "x2": (
-                        fluxstatparams["X2norm"]
-                        if not fluxstatparams["X2norm"] is None
-                        else np.nan
-                    ),
-                    "Nclip": (
-                        fluxstatparams["Nclip"]
-                        if not fluxstatparams["Nclip"] is None
-                        else np.nan
-                    ),
-                    "Ngood": (
-                        fluxstatparams["Ngood"]
-                        if not fluxstatparams["Ngood"] is None
-                        else np.nan
-                    ),
-                    "Mask": 0,
-                }
-                avg_lc.add2row(avglc_index, row)
-                self.update_mask_column(cut.flag, range_ix, remove_old=False)
-                avg_lc.update_mask_column(cut.flag, [avglc_index], remove_old=False)
-
-                mjd += mjdbinsize
-                continue
-
-            # average good measurements
-            self.calcaverage_sigmacutloop(
-                "uJy",
-                noisecol=self.dflux_colname,
-                indices=range_good_ix,
-                Nsigma=3.0,
-                median_firstiteration=True,
-            )
-            fluxstatparams = deepcopy(self.statparams)
-
-            if fluxstatparams["mean"] is None or len(fluxstatparams["ix_good"]) < 1:
-                self.update_mask_column(cut.flag, range_ix, remove_old=False)
-                avg_lc.update_mask_column(cut.flag, [avglc_index], remove_old=False)
-                mjd += mjdbinsize
-                continue
+        # if no good measurements in a bin, average all of them anyway and flag
+        nogood = good_counts[occupied] < 1
+        fluxstats = sigmacut_rows(
+            flux_segments,
+            dflux_segments,
+            valid=in_segment & (good[segment_ix] | nogood[:, np.newaxis]),
+            Nsigma=3.0,
+            median_firstiteration=True,
+        )
+        Ngood = fluxstats["Ngood"]
+        averaged = ~nogood & (Ngood > 0)
+
+        # average mjd: mean of all measurements if no good measurements,
+        # otherwise weighted mean of the good measurements
+        # TODO: SHOULD NOISECOL HERE BE DUJY OR NONE?
+        avg_mjds = np.full(len(occupied), np.nan)
+        (rows,) = np.where(nogood & (counts[occupied] > 1))
+        avg_mjds[rows] = (
+            masked_rowsums(mjd_segments[rows], in_segment[rows])
+            / counts[occupied][rows]
+        )
+        (rows,) = np.where(nogood & (counts[occupied] == 1))
+        avg_mjds[rows] = mjd_segments[rows, 0] * 1.0
+        (rows,) = np.where(averaged & (Ngood > 1))
+        ix_good = fluxstats["ix_good"][rows]
+        c1 = masked_rowsums(
+            1.0 * mjd_segments[rows] / np.square(dflux_segments[rows]), ix_good
+        )
+        c2 = masked_rowsums(1.0 / np.square(dflux_segments[rows]), ix_good)
+        avg_mjds[rows] = c1 / c2
+        (rows,) = np.where(averaged & (Ngood == 1))
+        avg_mjds[rows] = (
+            mjd_segments[rows, np.argmax(fluxstats["ix_good"][rows], axis=1)] * 1.0
+        )
 
-            # get average mjd
-            # TODO: SHOULD NOISECOL HERE BE DUJY OR NONE?
-            self.calcaverage_sigmacutloop(
-                "MJD",
-                noisecol=self.dflux_colname,
-                indices=fluxstatparams["ix_good"],
-                Nsigma=0,
-                median_firstiteration=False,
+        # flag bins with a small number of good measurements,
+        # otherwise check sigmacut bounds and flag
+        smallnum = averaged & (good_counts[occupied] < 3)
+        is_bad = (
+            averaged
+            & ~smallnum
+            & (
+                (Ngood < cut.params["Ngood_min"])
+                | (fluxstats["Nclip"] > cut.params["Nclip_max"])
+                | (fluxstats["X2norm"] > cut.params["x2_max"])
             )
-            avg_mjd = self.statparams["mean"]
-
-            # add row to averaged light curve
-            row = {
-                "MJD": avg_mjd,
-                "uJy": fluxstatparams["mean"],
-                "duJy": fluxstatparams["mean_err"],
-                "stdev": fluxstatparams["stdev"],
-                "x2": fluxstatparams["X2norm"],
-                "Nclip": fluxstatparams["Nclip"],
-                "Ngood": fluxstatparams["Ngood"],
-                "Mask": 0,
-            }
-            avg_lc.add2row(avglc_index, row)
-
-            # flag clipped measurements in lc
-            if len(fluxstatparams["ix_clip"]) > 0:
-                self.update_mask_column(
-                    cut.params["ixclip_flag"],
-                    fluxstatparams["ix_clip"],
-                    remove_old=False,
-                )
-
-            # if small number within this bin, flag measurements
-            if len(range_good_ix) < 3:
-                self.update_mask_column(
-                    cut.params["smallnum_flag"], range_ix, remove_old=False
-                )
-                avg_lc.update_mask_column(
-                    cut.params["smallnum_flag"], [avglc_index], remove_old=False
-                )
-            # else check sigmacut bounds and flag
-            else:
-                is_bad = False
-                if fluxstatparams["Ngood"] < cut.params["Ngood_min"]:
-                    is_bad = True
-                if fluxstatparams["Nclip"] > cut.params["Nclip_max"]:
-                    is_bad = True
-                if (
-                    not (fluxstatparams["X2norm"] is None)
-                    and fluxstatparams["X2norm"] > cut.params["x2_max"]
-                ):
-                    is_bad = True
-                if is_bad:
-                    self.update_mask_column(cut.flag, range_ix, remove_old=False)
-                    avg_lc.update_mask_column(cut.flag, [avglc_index], remove_old=False)
+        )
+        segment_flags = np.where(~averaged | is_bad, cut.flag, 0) | np.where(
+            smallnum, cut.params["smallnum_flag"], 0
+        )
 
-            mjd += mjdbinsize
+        # flags of the light curve: bin flags for all measurements in the bin,
+        # and clipped measurements of averaged bins
+        lc_flags = np.zeros(len(self.t), dtype=int)
+        lc_flags[ix] = segment_flags[segment_rows]
+        lc_flags[
+            segment_ix[fluxstats["ix_clip"] & averaged[:, np.newaxis]]
+        ] |= cut.params["ixclip_flag"]
+        if lc_flags.any():
+            self.flags.set(lc_flags)
+
+        # empty bins are flagged
+        avg_flags = np.full(num_bins, cut.flag, dtype=np.uint32)
+        avg_flags[occupied] = segment_flags
+
+        # statistics are only filled in for averaged bins and bins without good measurements;
+        # stdev and x2 are None if only one measurement was averaged.
+        # MJD and statistics are object columns, the same as when the table was built row by row
+        (rows,) = np.where(averaged | nogood)
+        single = averaged[rows] & (Ngood[rows] == 1)
+
+        def object_column(values, none_mask=None):
+            column = np.full(num_bins, np.nan, dtype=object)
+            values = list(values[rows])
+            if not none_mask is None:
+                for i in np.where(none_mask)[0]:
+                    values[i] = None
+            column[occupied[rows]] = values
+            return column
+
+        def int_column(values):
+            column = np.zeros(num_bins, dtype=int)
+            column[occupied[rows]] = values[rows]
+            return column
 
-        avg_lc.flux2mag(
-            "uJy", "duJy", "m", "dm", zpt=23.9, upperlim_Nsigma=flux2mag_sigmalimit
+        avg_lc = AveragedLightCurve(
+            self.control_index,
+            filt=self.filt,
+            mjdbinsize=mjdbinsize,
+            data={
+                "MJD": object_column(avg_mjds),
+                "MJDbin": lims[:num_bins] + 0.5 * mjdbinsize,
+                "uJy": object_column(fluxstats["mean"]),
+                "duJy": object_column(fluxstats["mean_err"]),
+                "stdev": object_column(fluxstats["stdev"], none_mask=single),
+                "x2": object_column(fluxstats["X2norm"], none_mask=single),
+                "Nclip": int_column(fluxstats["Nclip"]),
+                "Ngood": int_column(Ngood),
+                "Nexcluded": counts - good_counts,
+                "Mask": avg_flags,
+            },
+            hexcols=["Mask"],
         )
 
+        if add_mags:
+            avg_lc.flux2mag(
+                "uJy", "duJy", "m", "dm", zpt=23.9, upperlim_Nsigma=flux2mag_sigmalimit
+            )
+
         # TODO: not sure if needed
-        for col in ["Nclip", "Ngood", "Nexcluded", "Mask"]:
+        for col in ["Nclip", "Ngood", "Nexcluded"]:
             avg_lc.t[col] = avg_lc.t[col].astype(np.int32)
 
         return avg_lc
@@ -1494,14 +2202,13 @@ class LightCurve(pdastrostatsclass):
     def apply_cut(self, column_name, flag, min_value=None, max_value=None):
         all_ix = self.getindices()
         if not min_value is None or not max_value is None:
-            kept_ix = self.ix_inrange(
-                colnames=[column_name], lowlim=min_value, uplim=max_value
+            cut_ix = self.where(
+                ~inrange(column_name, lowlim=min_value, uplim=max_value)
             )
         else:
             raise RuntimeError(
                 f"ERROR: Cannot apply cut without min value ({min_value}) or max value ({max_value})."
             )
-        cut_ix = AnotB(all_ix, kept_ix)
 
         self.update_mask_column(flag, cut_ix)
 
@@ -1509,24 +2216,14 @@ class LightCurve(pdastrostatsclass):
         return percent_cut
 
     def update_mask_column(self, flag, indices, remove_old=True):
-        if remove_old:
-            # remove any old flags of the same value
-            self.t["Mask"] = np.bitwise_and(self.t["Mask"].astype(int), ~flag)
-
-        if len(indices) > 1:
-            flag_arr = np.full(self.t.loc[indices, "Mask"].shape, flag)
-            self.t.loc[indices, "Mask"] = np.bitwise_or(
-                self.t.loc[indices, "Mask"].astype(int), flag_arr
-            )
-        elif len(indices) == 1:
-            self.t.loc[indices, "Mask"] = int(self.t.loc[indices[0], "Mask"]) | flag
+        with self.flags.transaction() as transaction:
+            transaction.update(flag, indices=indices, remove_old=remove_old)
 
     def drop_extra_columns(self, verbose=False):
         dropcols = []
         for col in [
             "Noffsetlc",
             "uJy/duJy",
-            "__tmp_SN",
             "SNR",
             "SNRsum",
             "SNRsumnorm",
@@ -1571,9 +2268,24 @@ class LightCurve(pdastrostatsclass):
         )
         self.load_lc_by_filename(filename)
 
-    def load_lc_by_filename(self, filename):
-        self.load_spacesep(filename, delim_whitespace=True, hexcols=["Mask"])
-        self.check_column_names(required_column_names=REQUIRED_COLUMN_NAMES)
+    def load_lc_by_filename(
+        self,
+        filename,
+        dtype=LC_COLUMN_DTYPES,
+        required_column_names=REQUIRED_COLUMN_NAMES,
+    ):
+        try:
+            self.t = read_lc_file(filename, dtype=dtype)
+        except Exception as e:
+            print(f"ERROR: could not read {filename}!")
+            raise RuntimeError(str(e))
+        self.filename = filename
+        # keep writing Mask in hexadecimal
+        if not "Mask" in self.hexcols:
+            self.hexcols.append("Mask")
+        if "Mask" in self.t.columns:
+            self.flags.convert()
+        self.check_column_names(required_column_names=required_column_names)
 
     def save_lc(self, output_dir, tnsname, indices=None, overwrite=False, cleaned=True):
         filename = get_filename(
@@ -1595,9 +2307,15 @@ class AveragedLightCurve(LightCurve):
         LightCurve.__init__(self, control_index, filt, **kwargs)
         self.mjdbinsize = mjdbinsize
 
-    def load_lc_by_filename(self, filename):
-        self.load_spacesep(filename, delim_whitespace=True, hexcols=["Mask"])
-        self.check_column_names(required_column_names=REQUIRED_AVG_COLUMN_NAMES)
+    def load_lc_by_filename(
+        self,
+        filename,
+        dtype=AVG_LC_COLUMN_DTYPES,
+        required_column_names=REQUIRED_AVG_COLUMN_NAMES,
+    ):
+        LightCurve.load_lc_by_filename(
+            self, filename, dtype=dtype, required_column_names=required_column_names
+        )
 
     def load_lc(self, input_dir, tnsname):
         filename = get_filename(
@@ -1702,13 +2420,14 @@ class FullLightCurve:
         lc.t = lc.t.sort_values(by=["MJD"], ignore_index=True)
 
         # remove rows with duJy=0 or uJy=NaN
-        dflux_zero_ix = lc.ix_equal(colnames=["duJy"], val=0)
-        flux_nan_ix = lc.ix_is_null(colnames=["uJy"])
-        if len(AorB(dflux_zero_ix, flux_nan_ix)) > 0:
+        dflux_zero_ix = lc.indexset(predicate=equal(["duJy"], 0))
+        flux_nan_ix = lc.indexset(predicate=isnull(["uJy"]))
+        invalid_ix = AorB(dflux_zero_ix, flux_nan_ix)
+        if len(invalid_ix) > 0:
             print(
                 f"Deleting {len(dflux_zero_ix) + len(flux_nan_ix)} rows with duJy=0 or uJy=NaN..."
             )
-            lc.t = lc.t.drop(AorB(dflux_zero_ix, flux_nan_ix))
+            lc.t = lc.t.drop(invalid_ix.get_indices())
 
         for filt in ATLAS_FILTERS:
             filename = get_filename(
@@ -1749,6 +2468,21 @@ class Simulation(ABC):
         """
         pass
 
+    def get_sim_fluxes(self, mjds, peak_appmag, params: List[Dict]):
+        """
+        Compute the simulated flux of several simulations with different parameters at once.
+
+        :param mjds: List or array of MJDs.
+        :param peak_appmag: Desired peak apparent magnitude of the simulations.
+        :param params: List of dictionaries with the keyword arguments of get_sim_flux() for each simulation.
+
+        :return: A (number of simulations x number of MJDs) array of flux values.
+        """
+        sim_fluxes = np.zeros((len(params), len(mjds)))
+        for i in range(len(params)):
+            sim_fluxes[i, :] = self.get_sim_flux(mjds, peak_appmag, **params[i])
+        return sim_fluxes
+
     def __str__(self):
         return f'Simulation with model name "{self.model_name}": peak appmag = {self.peak_appmag:0.2f}'
 
@@ -1760,11 +2494,37 @@ class SimDetecSupernova(AveragedSupernova):
         )
         self.avg_lcs: Dict[int, SimDetecLightCurve] = {}
 
+        # rolling SNR sums calculated in advance, with control indices and then sigma_kerns as the keys
+        self.rolling_sums: Dict[int, Dict[float, np.ndarray]] = {}
+        self.rolling_sums_flag = None
+
+    def precompute_rolling_sums(self, sigma_kerns: List, flag=0x800000):
+        """
+        Calculate the rolling SNR sums of all kernel sizes for each light curve in one call,
+        so that apply_rolling_sums() only has to add them to the light curves.
+
+        :param sigma_kerns: List of kernel sizes of the rolling sums.
+        :param flag: The flag value by which to filter out any flagged bins.
+        """
+        self.rolling_sums = {}
+        self.rolling_sums_flag = flag
+        for control_index in self.get_all_indices():
+            self.rolling_sums[control_index] = self.avg_lcs[
+                control_index
+            ].get_rolling_sums(sigma_kerns, flag=flag)
+
     def apply_rolling_sums(self, sigma_kern: float, flag=0x800000):
         for control_index in self.get_all_indices():
-            self.avg_lcs[control_index].apply_rolling_sum(sigma_kern, flag=flag)
+            SNRsum = None
+            if flag == self.rolling_sums_flag and control_index in self.rolling_sums:
+                SNRsum = self.rolling_sums[control_index].get(sigma_kern)
+            self.avg_lcs[control_index].apply_rolling_sum(
+                sigma_kern, flag=flag, SNRsum=SNRsum
+            )
 
     def remove_rolling_sums(self):
+        self.rolling_sums = {}
+        self.rolling_sums_flag = None
         for control_index in self.get_all_indices():
             self.avg_lcs[control_index].remove_rolling_sum()
 
@@ -1773,28 +2533,34 @@ class SimDetecSupernova(AveragedSupernova):
             self.avg_lcs[control_index].remove_simulations()
 
     def load(self, input_dir, control_index=0):
+        self.rolling_sums.pop(control_index, None)
         self.avg_lcs[control_index] = SimDetecLightCurve(
             control_index=control_index, filt=self.filt, mjdbinsize=self.mjdbinsize
         )
+        self.avg_lcs[control_index].load_lc_by_filename(
+            self.get_lc_filename(input_dir, control_index=control_index)
+        )
+
+    def get_lc_filename(self, input_dir, control_index=0, cleaned=False):
         if control_index == 0:
-            filename = f"{input_dir}/{self.tnsname}.{self.filt}.{self.mjdbinsize:0.2f}days.lc.txt"
-        else:
-            filename = f"{input_dir}/controls/{self.tnsname}_i{control_index:03d}.{self.filt}.{self.mjdbinsize:0.2f}days.lc.txt"
-        self.avg_lcs[control_index].load_lc_by_filename(filename)
+            return f"{input_dir}/{self.tnsname}.{self.filt}.{self.mjdbinsize:0.2f}days.lc.txt"
+        return f"{input_dir}/controls/{self.tnsname}_i{control_index:03d}.{self.filt}.{self.mjdbinsize:0.2f}days.lc.txt"
 
 
 class SimDetecLightCurve(AveragedLightCurve):
     def __init__(self, control_index=0, filt="o", mjd0=None, mjdbinsize=1.0, **kwargs):
         AveragedLightCurve.__init__(self, control_index, filt, mjdbinsize, **kwargs)
         self.cur_sigma_kern = None
+        self.cur_flag = None
         self.pre_mjd0_ix = self.ix_inrange("MJD", uplim=mjd0)
         self.valid_seasons_ix = None
 
     # remove rolling sum columns
     def remove_rolling_sum(self):
         self.cur_sigma_kern = None
+        self.cur_flag = None
         dropcols = []
-        for col in ["__tmp_SN", "SNR", "SNRsum", "SNRsumnorm"]:
+        for col in ["SNR", "SNRsum", "SNRsumnorm"]:
             if col in self.t.columns:
                 dropcols.append(col)
         if len(dropcols) > 0:
@@ -1803,60 +2569,79 @@ class SimDetecLightCurve(AveragedLightCurve):
     # remove simulation columns
     def remove_simulations(self):
         dropcols = []
-        for col in ["__tmp_SN", "uJysim", "SNRsim", "simLC", "SNRsimsum"]:
+        for col in ["uJysim", "SNRsim", "simLC", "SNRsimsum"]:
             if col in self.t.columns:
                 dropcols.append(col)
         if len(dropcols) > 0:
             self.t.drop(columns=dropcols, inplace=True)
 
-    # apply a rolling sum to the light curve and add SNR, SNRsum, and SNRsumnorm columns
-    def apply_rolling_sum(self, sigma_kern, indices=None, flag=0x800000, verbose=False):
+    # get the Gaussian kernel of the rolling sum from the kernel bank
+    def get_kernel(self, sigma_kern) -> GaussianKernel:
+        return KERNEL_BANK.get_kernel(sigma_kern, mjdbinsize=self.mjdbinsize)
+
+    # get the SNR of the given indices, with 0 for flagged bins
+    def get_SNR(self, indices=None, flag=0x800000):
         if indices is None:
             indices = self.getindices()
         if len(indices) < 1:
             raise RuntimeError(
                 "ERROR: not enough measurements to apply simulated gaussian"
             )
-        good_ix = AandB(indices, self.ix_unmasked("Mask", flag))
+        good_ix = AandB(
+            self.indexset(indices), self.indexset(predicate=unmasked("Mask", flag))
+        ).get_indices()
+
+        SNR = np.zeros(len(indices))
+        SNR[pd.Index(indices).get_indexer(good_ix)] = (
+            self.t.loc[good_ix, "uJy"] / self.t.loc[good_ix, "duJy"]
+        ).to_numpy()
+        return SNR
+
+    def get_rolling_sums(self, sigma_kerns: List, indices=None, flag=0x800000):
+        """
+        Get the rolling SNR sums for several kernel sizes in one call, without modifying the light curve.
+
+        :param sigma_kerns: List of kernel sizes of the rolling sums.
+        :param indices: Indices of the light curve to apply the rolling sums to.
+        :param flag: The flag value by which to filter out any flagged bins.
+
+        :return: Dictionary with sigma_kerns as the keys and the rolling SNR sums as the values.
+        """
+        SNR = self.get_SNR(indices=indices, flag=flag)
+        return KERNEL_BANK.rolling_sums(SNR, sigma_kerns, mjdbinsize=self.mjdbinsize)
+
+    # apply a rolling sum to the light curve and add SNR, SNRsum, and SNRsumnorm columns
+    def apply_rolling_sum(
+        self, sigma_kern, indices=None, flag=0x800000, verbose=False, SNRsum=None
+    ):
+        """
+        Apply a rolling sum to the light curve and add "SNR", "SNRsum", and "SNRsumnorm" columns.
+
+        :param sigma_kern: Kernel size of the rolling sum.
+        :param indices: Indices of the light curve to apply the rolling sum to.
+        :param flag: The flag value by which to filter out any flagged bins.
+        :param SNRsum: Rolling SNR sum already calculated with get_rolling_sums() for the same indices and flag.
+        """
+        if indices is None:
+            indices = self.getindices()
+        SNR = self.get_SNR(indices=indices, flag=flag)
 
         self.remove_rolling_sum()
         self.cur_sigma_kern = sigma_kern
-        self.t.loc[indices, "SNR"] = 0.0
-        self.t.loc[good_ix, "SNR"] = (
-            self.t.loc[good_ix, "uJy"] / self.t.loc[good_ix, "duJy"]
-        )
+        self.cur_flag = flag
+        self.t.loc[indices, "SNR"] = SNR
 
-        new_gaussian_sigma = round(sigma_kern / self.mjdbinsize)
-        windowsize = int(6 * new_gaussian_sigma)
-        halfwindowsize = int(windowsize * 0.5) + 1
+        kernel = self.get_kernel(sigma_kern)
         if verbose:
-            print(
-                f"Sigma: {sigma_kern:0.2f} days; MJD bin size: {self.mjdbinsize:0.2f} days; sigma: {new_gaussian_sigma:0.2f} bins; window size: {windowsize} bins"
-            )
+            print(kernel)
 
         # calculate the rolling SNR sum
-        l = len(self.t.loc[indices])
-        dataindices = np.array(range(l) + np.full(l, halfwindowsize))
-        temp = pd.Series(np.zeros(l + 2 * halfwindowsize), name="SNR", dtype=np.float64)
-        temp[dataindices] = self.t.loc[indices, "SNR"]
-        SNRsum = temp.rolling(windowsize, center=True, win_type="gaussian").sum(
-            std=new_gaussian_sigma
-        )
-        self.t.loc[indices, "SNRsum"] = list(SNRsum[dataindices])
+        if SNRsum is None:
+            SNRsum = kernel.rolling_sum(SNR)
+        self.t.loc[indices, "SNRsum"] = SNRsum
 
         # normalize it
-        norm_temp = pd.Series(
-            np.zeros(l + 2 * halfwindowsize), name="norm", dtype=np.float64
-        )
-        norm_temp[np.array(range(l) + np.full(l, halfwindowsize))] = np.ones(l)
-        norm_temp_sum = norm_temp.rolling(
-            windowsize, center=True, win_type="gaussian"
-        ).sum(std=new_gaussian_sigma)
-        self.t.loc[indices, "SNRsumnorm"] = list(
-            SNRsum.loc[dataindices]
-            / norm_temp_sum.loc[dataindices]
-            * max(norm_temp_sum.loc[dataindices])
-        )
+        self.t.loc[indices, "SNRsumnorm"] = SNRsum * kernel.get_edge_norm(len(SNR))
 
     # add simulated flux to the light curve and add SNRsim and SNRsimsum columns
     def add_sim_flux(
@@ -1867,6 +2652,7 @@ class SimDetecLightCurve(AveragedLightCurve):
         cur_sigma_kern=None,
         verbose=False,
         remove_old=True,
+        incremental=False,
     ):
         """
         Add simulated flux to the light curve ("uJysim" column) and add "SNRsim" and "SNRsimsum" columns.
@@ -1875,6 +2661,7 @@ class SimDetecLightCurve(AveragedLightCurve):
         :param good_ix: Unmasked/unflagged indices of the light curve.
         :param cur_sigma_kern: The current kernel size of the rolling sum.
         :param remove_old: Remove any old simulations before adding the simulated flux.
+        :param incremental: Only convolve the simulated SNR within the bins it touches and add it to the existing "SNRsum" (or "SNRsimsum" if remove_old=False) column. Requires the rolling sum to have been applied with the same sigma_kern and good_ix.
         """
         if cur_sigma_kern is None:
             cur_sigma_kern = self.cur_sigma_kern
@@ -1888,6 +2675,14 @@ class SimDetecLightCurve(AveragedLightCurve):
             lc.t.loc[good_ix, "uJysim"] = lc.t.loc[good_ix, "uJy"]
         lc.t.loc[good_ix, "uJysim"] += sim_flux
 
+        # the baseline rolling sum to add the simulated SNR to
+        base_colname = "SNRsimsum" if "SNRsimsum" in lc.t.columns else "SNRsum"
+        incremental = (
+            incremental
+            and cur_sigma_kern == self.cur_sigma_kern
+            and base_colname in lc.t.columns
+        )
+
         # make sure all bad rows have SNRsim = 0.0 so they have no impact on the rolling SNRsum
         lc.t["SNRsim"] = 0.0
         # include only simulated flux in the SNR
@@ -1895,28 +2690,70 @@ class SimDetecLightCurve(AveragedLightCurve):
             lc.t.loc[good_ix, "uJysim"] / lc.t.loc[good_ix, "duJy"]
         )
 
-        new_gaussian_sigma = round(cur_sigma_kern / self.mjdbinsize)
-        windowsize = int(6 * new_gaussian_sigma)
-        halfwindowsize = int(windowsize * 0.5) + 1
+        kernel = self.get_kernel(cur_sigma_kern)
         if verbose:
-            print(
-                f"Sigma: {cur_sigma_kern:0.2f} days; MJD bin size: {self.mjdbinsize:0.2f} days; new sigma: {new_gaussian_sigma:0.2f} bins; window size: {windowsize} bins"
+            print(kernel)
+
+        if incremental:
+            # the rolling sum is linear, so only convolve the simulated SNR
+            # within the bins it touches and add it to the baseline rolling sum
+            sim_SNR = np.zeros(len(lc.t))
+            sim_SNR[lc.t.index.get_indexer(good_ix)] = (
+                np.asarray(sim_flux, dtype=np.float64)
+                / lc.t.loc[good_ix, "duJy"].to_numpy()
             )
+            start, local_sum = kernel.local_rolling_sum(sim_SNR)
+            SNRsimsum = lc.t[base_colname].to_numpy(dtype=np.float64, copy=True)
+            SNRsimsum[start : start + len(local_sum)] += local_sum
+            lc.t["SNRsimsum"] = SNRsimsum
+            return lc
 
         # calculate the rolling SNR sum for SNR with simulated flux
-        l = len(self.t)
-        dataindices = np.array(range(l) + np.full(l, halfwindowsize))
-        temp = pd.Series(
-            np.zeros(l + 2 * halfwindowsize), name="SNRsim", dtype=np.float64
-        )
-        temp[dataindices] = lc.t["SNRsim"]
-        SNRsimsum = temp.rolling(windowsize, center=True, win_type="gaussian").sum(
-            std=new_gaussian_sigma
-        )
-        lc.t["SNRsimsum"] = list(SNRsimsum.loc[dataindices])
+        lc.t["SNRsimsum"] = kernel.rolling_sum(lc.t["SNRsim"].to_numpy())
 
         return lc
 
+    def get_sim_rolling_sums(self, good_ix, sim_fluxes, cur_sigma_kern=None):
+        """
+        Get the rolling sums of the SNR of a batch of simulated fluxes alone, without the light curve's own flux.
+
+        :param good_ix: Unmasked/unflagged indices of the light curve; must match the ones used for the current rolling sum.
+        :param sim_fluxes: (number of simulations x len(good_ix)) array of simulated flux at the good_ix bins.
+        :param cur_sigma_kern: The current kernel size of the rolling sum.
+
+        :return: (number of simulations x number of bins) array with the rolling SNR sum of each simulation.
+        """
+        if cur_sigma_kern is None:
+            cur_sigma_kern = self.cur_sigma_kern
+        if cur_sigma_kern is None or cur_sigma_kern != self.cur_sigma_kern:
+            raise RuntimeError(
+                "ERROR: Rolling sum must be applied with the same sigma kern before adding a batch of simulations."
+            )
+
+        sim_SNR = np.zeros((len(sim_fluxes), len(self.t)))
+        sim_SNR[:, self.t.index.get_indexer(good_ix)] = (
+            sim_fluxes / self.t.loc[good_ix, "duJy"].to_numpy()
+        )
+
+        # convolve every simulation at once
+        return self.get_kernel(cur_sigma_kern).rolling_sum(sim_SNR)
+
+    def get_sim_SNRsums(self, good_ix, sim_fluxes, cur_sigma_kern=None):
+        """
+        Add a batch of simulated fluxes to the light curve at once, without modifying it.
+        Since the rolling sum is linear, this is the baseline "SNRsum" column plus the rolling sum of each simulation.
+
+        :param good_ix: Unmasked/unflagged indices of the light curve; must match the ones used for the current rolling sum.
+        :param sim_fluxes: (number of simulations x len(good_ix)) array of simulated flux at the good_ix bins.
+        :param cur_sigma_kern: The current kernel size of the rolling sum.
+
+        :return: (number of simulations x number of bins) array with the SNRsimsum of each simulation.
+        """
+        sim_sums = self.get_sim_rolling_sums(
+            good_ix, sim_fluxes, cur_sigma_kern=cur_sigma_kern
+        )
+        return self.t["SNRsum"].to_numpy()[np.newaxis, :] + sim_sums
+
     # add any simulation to the light curve, specifying parameters using keyword arguments
     def add_simulation(
         self,
@@ -1926,33 +2763,107 @@ class SimDetecLightCurve(AveragedLightCurve):
         flag=0x800000,
         verbose=False,
         remove_old=True,
+        incremental=False,
         **kwargs,
     ):
         """
         Add any Simulation object to the light curve, specifying parameters using keyword arguments.
+        The light curve itself is not modified.
 
         :param sim: The Simulation to add.
         :param peak_appmag: The desired peak apparent magnitude of the Simulation to add.
         :param cur_sigma_kern: The current sigma of the rolling sum.
         :param flag: The flag value by which to filter out any flagged bins.
         :param remove_old: Remove any old simulations before adding the simulated flux.
+        :param incremental: Only recalculate the rolling sum within the bins the simulation touches (see add_sim_flux()).
+
+        :return: SimInjection that shares the light curve's columns if remove_old=True; otherwise a copy of the light curve with the simulation columns.
         """
         if verbose:
             print(f"Adding simulation: {sim}")
 
-        lc = deepcopy(self)
-        good_ix = AandB(lc.getindices(), lc.ix_unmasked("Mask", flag))
-        sim_flux = sim.get_sim_flux(lc.t.loc[good_ix, "MJD"], peak_appmag, **kwargs)
+        if not remove_old:
+            # stack the simulation onto a full copy of the light curve
+            lc = deepcopy(self)
+            good_ix = AandB(
+                lc.indexset(), lc.indexset(predicate=unmasked("Mask", flag))
+            ).get_indices()
+            sim_flux = sim.get_sim_flux(lc.t.loc[good_ix, "MJD"], peak_appmag, **kwargs)
+            return self.add_sim_flux(
+                lc,
+                good_ix,
+                sim_flux,
+                cur_sigma_kern=cur_sigma_kern,
+                verbose=verbose,
+                remove_old=remove_old,
+                incremental=incremental and flag == self.cur_flag,
+            )
 
-        return self.add_sim_flux(
-            lc,
+        good_ix = AandB(
+            self.indexset(), self.indexset(predicate=unmasked("Mask", flag))
+        ).get_indices()
+        sim_flux = sim.get_sim_flux(self.t.loc[good_ix, "MJD"], peak_appmag, **kwargs)
+        return self.inject_sim_flux(
             good_ix,
             sim_flux,
             cur_sigma_kern=cur_sigma_kern,
             verbose=verbose,
-            remove_old=remove_old,
+            incremental=incremental and flag == self.cur_flag,
         )
 
+    def inject_sim_flux(
+        self, good_ix, sim_flux, cur_sigma_kern=None, verbose=False, incremental=False
+    ):
+        """
+        Inject simulated flux into the light curve without copying or modifying it.
+
+        :param good_ix: Unmasked/unflagged indices of the light curve.
+        :param sim_flux: Simulated flux at the good_ix bins.
+        :param cur_sigma_kern: The current kernel size of the rolling sum.
+        :param incremental: Only convolve the simulated SNR within the bins it touches and add it to the "SNRsum" column (see add_sim_flux()).
+
+        :return: SimInjection with the "uJysim", "SNRsim", and "SNRsimsum" columns.
+        """
+        if cur_sigma_kern is None:
+            cur_sigma_kern = self.cur_sigma_kern
+        if cur_sigma_kern is None:
+            raise RuntimeError(
+                "ERROR: No current sigma kern passed as argument or stored during previously applied rolling sum."
+            )
+        incremental = (
+            incremental
+            and cur_sigma_kern == self.cur_sigma_kern
+            and "SNRsum" in self.t.columns
+        )
+
+        kernel = self.get_kernel(cur_sigma_kern)
+        if verbose:
+            print(kernel)
+
+        good_pos = self.t.index.get_indexer(good_ix)
+        sim_flux = np.asarray(sim_flux, dtype=np.float64)
+        duJy = self.t["duJy"].to_numpy(dtype=np.float64)[good_pos]
+
+        uJysim = np.full(len(self.t), np.nan)
+        uJysim[good_pos] = self.t["uJy"].to_numpy(dtype=np.float64)[good_pos] + sim_flux
+
+        # make sure all bad rows have SNRsim = 0.0 so they have no impact on the rolling SNRsum
+        SNRsim = np.zeros(len(self.t))
+        SNRsim[good_pos] = uJysim[good_pos] / duJy
+
+        if incremental:
+            # the rolling sum is linear, so only convolve the simulated SNR
+            # within the bins it touches and add it to the baseline rolling sum
+            sim_SNR = np.zeros(len(self.t))
+            sim_SNR[good_pos] = sim_flux / duJy
+            start, local_sum = kernel.local_rolling_sum(sim_SNR)
+            SNRsimsum = self.t["SNRsum"].to_numpy(dtype=np.float64, copy=True)
+            SNRsimsum[start : start + len(local_sum)] += local_sum
+        else:
+            SNRsimsum = kernel.rolling_sum(SNRsim)
+
+        return SimInjection(self, uJysim=uJysim, SNRsim=SNRsim, SNRsimsum=SNRsimsum)
+
     # get max FOM (for simulated FOM, column='SNRsimsum'; else column='SNRsumnorm')
     # of measurements within the given indices
     def get_max_fom(self, indices=None, column="SNRsimsum"):
@@ -1963,3 +2874,120 @@ class SimDetecLightCurve(AveragedLightCurve):
         max_fom_mjd = self.t.loc[max_fom_idx, "MJDbin"]
         max_fom = self.t.loc[max_fom_idx, column]
         return max_fom_mjd, max_fom
+
+    # get max FOMs and their MJDs for a batch of simulations (rows of SNRsimsums)
+    # within the bins that are True in mask
+    def get_max_foms(self, SNRsimsums, mask=None):
+        if mask is None:
+            mask = np.full(SNRsimsums.shape, True)
+        foms = np.where(mask & ~np.isnan(SNRsimsums), SNRsimsums, -np.inf)
+        max_fom_pos = np.argmax(foms, axis=1)
+
+        max_fom_mjds = self.t["MJDbin"].to_numpy()[max_fom_pos]
+        max_foms = foms[np.arange(len(foms)), max_fom_pos]
+
+        # no bins to search
+        empty_ix = np.isneginf(max_foms)
+        max_fom_mjds = np.where(empty_ix, np.nan, max_fom_mjds)
+        max_foms[empty_ix] = np.nan
+        return max_fom_mjds, max_foms
+
+
+class SimInjection:
+    # columns added by an injected simulation
+    SIM_COLNAMES = ["uJysim", "SNRsim", "SNRsimsum"]
+
+    def __init__(
+        self,
+        lc: SimDetecLightCurve,
+        uJysim: np.ndarray,
+        SNRsim: np.ndarray,
+        SNRsimsum: np.ndarray,
+    ):
+        """
+        Result of injecting a Simulation into a SimDetecLightCurve.
+        Shares the columns of the light curve, which must not be modified while the injection is in use,
+        and only allocates the simulation columns.
+        Any attribute not defined here is looked up on the light curve.
+
+        :param lc: The light curve the Simulation was injected into.
+        :param uJysim: Flux with the simulated flux added.
+        :param SNRsim: SNR of uJysim, with 0 for flagged bins.
+        :param SNRsimsum: Rolling sum of SNRsim.
+        """
+        self.lc = lc
+        self.sim_columns: Dict[str, np.ndarray] = {
+            "uJysim": uJysim,
+            "SNRsim": SNRsim,
+            "SNRsimsum": SNRsimsum,
+        }
+        self._t = None
+
+    def __getattr__(self, name):
+        if name == "lc":
+            raise AttributeError(name)
+        return getattr(self.lc, name)
+
+    @property
+    def t(self) -> pd.DataFrame:
+        """
+        Light curve table with the simulation columns, only built when first requested.
+        """
+        if self._t is None:
+            self._t = self.lc.t.copy(deep=False)
+            for colname, values in self.sim_columns.items():
+                self._t[colname] = values
+        return self._t
+
+    def get_column(self, colname) -> np.ndarray:
+        if colname in self.sim_columns:
+            return self.sim_columns[colname]
+        return self.lc.t[colname].to_numpy()
+
+    # get a shallow copy of the light curve that has the simulation columns in its table
+    def get_lc(self) -> SimDetecLightCurve:
+        lc = copy(self.lc)
+        lc.t = self.t
+        return lc
+
+    def ix_inrange(
+        self,
+        colnames=None,
+        lowlim=None,
+        uplim=None,
+        indices=None,
+        exclude_lowlim=False,
+        exclude_uplim=False,
+    ):
+        # only build the table if any simulation columns are needed
+        lc = self.lc
+        if colnames is None or (
+            isinstance(colnames, str) and colnames.lower() == "all"
+        ):
+            lc = self.get_lc()
+        elif len(AandB(lc.getcolnames(colnames), self.SIM_COLNAMES)) > 0:
+            lc = self.get_lc()
+        return lc.ix_inrange(
+            colnames=colnames,
+            lowlim=lowlim,
+            uplim=uplim,
+            indices=indices,
+            exclude_lowlim=exclude_lowlim,
+            exclude_uplim=exclude_uplim,
+        )
+
+    # get max FOM (for simulated FOM, column='SNRsimsum'; else column='SNRsumnorm')
+    # of measurements within the given indices
+    def get_max_fom(self, indices=None, column="SNRsimsum"):
+        if indices is None:
+            indices = self.lc.getindices()
+        pos = self.lc.t.index.get_indexer(indices)
+        values = self.get_column(column)[pos]
+        if len(values) < 1 or np.isnan(values).all():
+            # nothing to maximize; fall back to pandas
+            return self.get_lc().get_max_fom(indices=indices, column=column)
+
+        max_fom_pos = pos[np.nanargmax(values)]
+        max_fom_mjd = self.lc.t["MJDbin"].to_numpy()[max_fom_pos]
+        max_fom = self.get_column(column)[max_fom_pos]
+        return max_fom_mjd, max_fom
@@ -4,13 +4,14 @@ wrapper around pandas with convenience functions to ease handling of tables
 A. Rest
 '''
 import sys,os,re,types,copy,io
+from collections import namedtuple
+from abc import ABC,abstractmethod
 import numpy as np
 from astropy.time import Time
 import astropy.io.fits as fits
 import pandas as pd
 from pandas.core.dtypes.common import is_object_dtype,is_float_dtype,is_string_dtype,is_integer_dtype
 
-from astropy.nddata import bitmask
 from astropy import units as u
 from astropy.coordinates import SkyCoord
 
@@ -100,6 +101,640 @@ def unique(A):
             unique.append(a)
     return unique
 
+def masked_rowsums(values,mask):
+    """
+    sum of values[i,mask[i]] for each row i of the 2D array values.
+    Rows with the same number of masked values are summed together as a compact 2D array,
+    so that each sum is added up exactly like np.sum() of the values of that row.
+    """
+    counts = mask.sum(axis=1)
+    sums = np.zeros(len(values))
+    for n in np.unique(counts):
+        if n==0: continue
+        (rows,) = np.where(counts==n)
+        sums[rows] = values[rows][mask[rows]].reshape(len(rows),n).sum(axis=1)
+    return(sums)
+
+def masked_rowmedians(values,mask):
+    """ median of values[i,mask[i]] for each row i of the 2D array values. NaN for rows without masked values """
+    counts = mask.sum(axis=1)
+    medians = np.full(len(values),np.nan)
+    for n in np.unique(counts):
+        if n==0: continue
+        (rows,) = np.where(counts==n)
+        medians[rows] = np.median(values[rows][mask[rows]].reshape(len(rows),n),axis=1)
+    return(medians)
+
+# c4 for n<=6. http://en.wikipedia.org/wiki/Unbiased_estimation_of_standard_deviation
+C4_SMALLN = [0.0, 0.0, 0.7978845608028654, 0.8862269254527579, 0.9213177319235613, 0.9399856029866251, 0.9515328619481445]
+
+def c4(n):
+    #http://en.wikipedia.org/wiki/Unbiased_estimation_of_standard_deviation
+    # n can be a number or an array
+    if np.ndim(n)==0:
+        if n<=6:
+            return(C4_SMALLN[n])
+        else:
+            return(1.0 - 1.0/(4.0*n) - 7.0/(32.0*n*n) - 19.0/(128.0*n*n*n))
+    n = np.asarray(n)
+    nf = n.astype(np.float64)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        c4 = 1.0 - 1.0/(4.0*nf) - 7.0/(32.0*nf*nf) - 19.0/(128.0*nf*nf*nf)
+    small = n<=6
+    c4[small] = np.array(C4_SMALLN)[n[small]]
+    return(c4)
+
+class StatResult(namedtuple('StatResult',['mean','mean_err','stdev','stdev_err','X2norm','ix_good','ix_clip',
+                                          'Ngood','Nclip','Nchanged','Nmask','Nnan','converged','i'])):
+    """
+    immutable result of sigmacut_stats(), with the same keys as pdastrostatsclass.statparams.
+    ix_good and ix_clip are the positions in the data array.
+    """
+    __slots__ = ()
+
+def sigmacut_rowstats(x,dx,good,Ngood,medianflag=False,sigmacutFlag=False):
+    """
+    mean, mean_err, stdev, stdev_err, and X2norm of the values x[i,good[i]] of each row i of the 2D array x, 
+    calculated from all of these values, as in pdastrostatsclass.calcaverage_sigmacut() (sigmacutFlag=True) 
+    or calcaverage_errorcut() (sigmacutFlag=False). dx are the uncertainties (can be None if sigmacutFlag). 
+    Ngood: number of good values of each row.
+    Values that are None in statparams are NaN.
+    """
+    Nrows = len(x)
+    mean = np.full(Nrows,np.nan)
+    mean_err = np.full(Nrows,np.nan)
+    stdev = np.full(Nrows,np.nan)
+    X2norm = np.full(Nrows,np.nan)
+
+    def nansums(values,mask):
+        # like pandas, NaNs (e.g. from 0/0) are skipped in the sums
+        return(masked_rowsums(np.where(np.isnan(values),0.0,values),mask))
+
+    # like pandas, no warnings for divisions by zero
+    with np.errstate(divide='ignore',invalid='ignore'):
+        (multi,) = np.where(Ngood>1)
+        if len(multi)>0:
+            N = Ngood[multi]
+            xm = x[multi]
+            dxm = None if dx is None else dx[multi]
+            good_m = good[multi]
+            if medianflag:
+                mean[multi] = masked_rowmedians(xm,good_m)
+                stdev[multi] = np.sqrt(1.0/(N-1.0)*masked_rowsums(np.square(xm-mean[multi,np.newaxis]),good_m))/c4(N)
+                if sigmacutFlag:
+                    mean_err[multi] = stdev[multi]/np.sqrt(N-1)
+                else:
+                    mean_err[multi] = masked_rowmedians(dxm,good_m)/np.sqrt(N-1)
+            else:
+                # same as pandas mean() and std()
+                avg = masked_rowsums(xm,good_m)/N
+                stdev[multi] = np.sqrt(masked_rowsums(np.square(avg[:,np.newaxis]-xm),good_m)/(N-1.0))
+                if sigmacutFlag:
+                    mean[multi] = avg
+                    mean_err[multi] = stdev[multi]/np.sqrt(N-1)
+                else:
+                    c1 = nansums(1.0*xm/np.square(dxm),good_m)
+                    c2 = nansums(1.0/np.square(dxm),good_m)
+                    mean[multi] = c1/c2
+                    mean_err[multi] = np.sqrt(1.0/c2)
+            if dxm is None:
+                X2norm[multi] = 1.0/(N-1.0)*nansums(np.square((xm-mean[multi,np.newaxis])/stdev[multi,np.newaxis]),good_m)
+            else:
+                X2norm[multi] = 1.0/(N-1.0)*nansums(np.square((xm-mean[multi,np.newaxis])/dxm),good_m)
+
+        (single,) = np.where(Ngood==1)
+        if len(single)>0:
+            ix = np.argmax(good[single],axis=1)
+            mean[single] = x[single,ix]*1.0
+            if not(dx is None):
+                mean_err[single] = dx[single,ix]*1.0
+
+        stdev_err = 1.0*stdev/np.sqrt(2.0*Ngood)
+    return(mean,mean_err,stdev,stdev_err,X2norm)
+
+class SigmacutRunningSums:
+    """
+    running sums of the good values of each row of sigmacut_rows() relative to a shift c of the row 
+    (the mean of the first iteration): sum(1/dx^2) and sum((x-c)/dx^2) with noise, sum(x-c) and sum((x-c)^2) 
+    without noise. They are updated with the values that are clipped or restored only. The totals of 
+    the absolute values of all terms added or subtracted bound their rounding errors.
+    """
+    def __init__(self,x,dx,c,good):
+        self.c = c
+        # infinite values or uncertainties of 0 give sums that are not finite, which must not be used
+        with np.errstate(divide='ignore',invalid='ignore',over='ignore'):
+            u = x-c[:,np.newaxis]
+            if dx is None:
+                self.terms = {'u':u,'u2':np.square(u)}
+                self.absterms = {'u':np.absolute(u),'u2':self.terms['u2']}
+                self.dxmax = None
+            else:
+                w = 1.0/np.square(dx)
+                self.terms = {'w':w,'wu':w*u}
+                self.absterms = {'w':w,'wu':np.absolute(self.terms['wu'])}
+                self.dxmax = dx.max(axis=1)
+            self.S = {k:np.where(good,v,0.0).sum(axis=1) for k,v in self.terms.items()}
+            self.T = {k:np.where(good,v,0.0).sum(axis=1) for k,v in self.absterms.items()}
+        self.Nterms = good.sum(axis=1)
+        self.xmax = np.absolute(x).max(axis=1)
+        # tolerance of the N-sigma cut of each row, set by stats()
+        self.tol = np.full(len(x),np.nan)
+
+    def update(self,rows,added,removed):
+        """ add the values added[i] and subtract the values removed[i] of the row rows[i] """
+        (r,col) = np.nonzero(added|removed)
+        if len(r)==0: return
+        sign = np.where(added[r,col],1.0,-1.0)
+        for k in self.terms:
+            self.S[k][rows] += np.bincount(r,weights=sign*self.terms[k][rows[r],col],minlength=len(rows))
+            self.T[k][rows] += np.bincount(r,weights=self.absterms[k][rows[r],col],minlength=len(rows))
+        self.Nterms[rows] += np.bincount(r,minlength=len(rows))
+
+    def stats(self,rows,N,Nsigma):
+        """
+        mean and stdev (NaN with noise) of the rows with N>1 good values. 
+        Also sets the tolerance of their N-sigma cut: values that are further than that from their limit 
+        are on the same side of it as with the mean and stdev of sigmacut_rowstats().
+        """
+        # generous bound of the relative rounding error of sums of up to Nterms terms, in any order
+        g = 8.0*np.finfo(np.float64).eps*(self.Nterms[rows]+2.0)
+        c = self.c[rows]
+        with np.errstate(divide='ignore',invalid='ignore'):
+            if self.dxmax is None:
+                (S1,S2,T1,T2) = (self.S['u'][rows],self.S['u2'][rows],self.T['u'][rows],self.T['u2'][rows])
+                mean_rel = S1/N
+                mean = c+mean_rel
+                stdev = np.sqrt(np.maximum(S2-S1*mean_rel,0.0)/(N-1.0))
+                err_mean = g*(2.0*T1/N+np.absolute(c)+np.absolute(mean))
+                err_var = (2.0*g*(T2+np.absolute(mean_rel)*T1)+2.0*N*np.square(err_mean))/(N-1.0)
+                # |sqrt(a)-sqrt(b)| <= |a-b|/sqrt(a) and <= sqrt(|a-b|)
+                err_stdev = np.minimum(np.where(stdev>0.0,err_var/stdev,np.inf),np.sqrt(err_var))
+                limitmax = Nsigma*stdev
+            else:
+                (W,WU,TW,TWU) = (self.S['w'][rows],self.S['wu'][rows],self.T['w'][rows],self.T['wu'][rows])
+                mean_rel = WU/W
+                mean = c+mean_rel
+                stdev = np.full(len(rows),np.nan)
+                err_mean = g*((TWU+(np.absolute(c)+np.absolute(mean_rel))*TW)/W+np.absolute(mean))
+                err_stdev = 0.0
+                limitmax = Nsigma*self.dxmax[rows]
+            self.tol[rows] = 2.0*(err_mean+Nsigma*err_stdev+g*(self.xmax[rows]+np.absolute(mean)+limitmax))
+        return(mean,stdev)
+
+def sigmacut_rows(data,noise=None,valid=None,sigmacutFlag=False,
+                  Nsigma=3.0,Nitmax=10,median_firstiteration=True):
+    """
+    Same as pdastrostatsclass.calcaverage_sigmacutloop() with removeNaNs=True, but for each row of the 2D arrays 
+    data and noise at once, without changing any object. 
+    Each row iterates until it converges or stops, independently of the other rows.
+    The first iteration sums up the good values with sigmacut_rowstats(). The later iterations update the 
+    running sums of SigmacutRunningSums with the values whose status changes only, and cut with their mean 
+    and stdev. These round differently than the sums of sigmacut_rowstats(), so a row with a value within 
+    the rounding error of its N-sigma limit is cut with the statistics of sigmacut_rowstats() instead, 
+    and the statistics returned are those of sigmacut_rowstats(). The results are therefore identical to statparams.
+
+    data, noise: 2D arrays of the values and their uncertainties. If noise is None, sigmacutFlag is set to True.
+    valid: boolean array with the same shape as data, False for masked values. Default: all values valid.
+
+    Returns a dictionary with the keys of pdastrostatsclass.statparams, each an array with one entry per row.
+    mean and mean_err are NaN if Ngood==0 (mean_err also if Ngood==1 without noise), and stdev, stdev_err 
+    and X2norm are NaN if Ngood<=1 (None in statparams). ix_good and ix_clip are boolean arrays with the 
+    same shape as data.
+    """
+    if noise is None:
+        sigmacutFlag = True
+
+    data = np.asarray(data,dtype=np.float64)
+    if valid is None:
+        valid = np.full(data.shape,True)
+    else:
+        valid = np.asarray(valid,dtype=bool)
+    notnull = ~np.isnan(data)
+    if not(noise is None):
+        noise = np.asarray(noise,dtype=np.float64)
+        notnull &= ~np.isnan(noise)
+    indices = valid & notnull
+    # placeholders for the values not used, so that they do not cause warnings
+    x = np.where(indices,data,0.0)
+    dx = None if noise is None else np.where(indices,noise,1.0)
+    # rows with infinite values or uncertainties of 0 are summed up with sigmacut_rowstats() in every iteration
+    finite = np.isfinite(x).all(axis=1)
+    if not(sigmacutFlag):
+        finite &= (np.isfinite(dx) & (dx!=0.0)).all(axis=1)
+
+    Nrows = len(data)
+    stats = {}
+    for k in ['mean','mean_err','stdev','stdev_err','X2norm']:
+        stats[k] = np.full(Nrows,np.nan)
+    for k in ['Ngood','Nclip','Nchanged','i']:
+        stats[k] = np.zeros(Nrows,dtype=int)
+    stats['Nmask'] = (~valid).sum(axis=1)
+    stats['Nnan'] = (valid & ~notnull).sum(axis=1)
+    stats['converged'] = np.full(Nrows,False)
+    stats['ix_good'] = indices.copy()
+
+    # True if the statistics of a row are from sigmacut_rowstats(), False if only mean and stdev are from the running sums
+    exact = np.full(Nrows,True)
+    def rowstats(rows,good,Ngood,medianflag=False):
+        values = sigmacut_rowstats(x[rows],None if dx is None else dx[rows],good,Ngood,
+                                   medianflag=medianflag,sigmacutFlag=sigmacutFlag)
+        for k,v in zip(['mean','mean_err','stdev','stdev_err','X2norm'],values):
+            stats[k][rows] = v
+        exact[rows] = True
+
+    def cut(rows):
+        # N-sigma cut around the mean of the previous iteration, and the distance of each value from its limit
+        if sigmacutFlag:
+            limit = Nsigma*stats['stdev'][rows,np.newaxis]
+        else:
+            limit = Nsigma*dx[rows]
+        dist = np.absolute(x[rows]-stats['mean'][rows,np.newaxis])
+        return(indices[rows] & (dist<=limit),dist-limit)
+
+    sums = None
+    active = np.full(Nrows,True)
+    i = 0
+    while ((i<Nitmax) or (Nitmax==0)) and active.any():
+        (rows,) = np.where(active)
+        # median only in first iteration and if wanted
+        medianflag = median_firstiteration and (i==0) and (Nsigma!=None)
+
+        prev_good = stats['ix_good'][rows]
+        if i>0:
+            (ix_good,margin) = cut(rows)
+            # rows cut with the running sums that have a value too close to its limit to be sure on which side it is
+            with np.errstate(invalid='ignore'):
+                close = indices[rows] & ~(np.absolute(margin)>sums.tol[rows,np.newaxis])
+            (redo,) = np.where(~exact[rows] & close.any(axis=1))
+            if len(redo)>0:
+                rowstats(rows[redo],prev_good[redo],stats['Ngood'][rows[redo]])
+                ix_good[redo] = cut(rows[redo])[0]
+            stats['Nchanged'][rows] = (ix_good!=prev_good).sum(axis=1)
+            stats['ix_good'][rows] = ix_good
+        else:
+            ix_good = prev_good
+
+        Ngood = ix_good.sum(axis=1)
+        stats['Ngood'][rows] = Ngood
+        stats['Nclip'][rows] = indices[rows].sum(axis=1) - Ngood
+
+        if i==0:
+            rowstats(rows,ix_good,Ngood,medianflag=medianflag)
+            if not(Nsigma is None or Nsigma == 0.0):
+                # relative to the mean of the first iteration, the sums do not lose precision
+                sums = SigmacutRunningSums(x,None if sigmacutFlag else dx,
+                                           np.where(np.isnan(stats['mean']),0.0,stats['mean']),ix_good)
+        else:
+            summed = finite[rows] & (Ngood>1)
+            sums.update(rows[summed],ix_good[summed] & ~prev_good[summed],prev_good[summed] & ~ix_good[summed])
+            (ix,) = np.where(summed)
+            (stats['mean'][rows[ix]],stats['stdev'][rows[ix]]) = sums.stats(rows[ix],Ngood[ix],Nsigma)
+            exact[rows[ix]] = False
+            # the other rows, and the rows with a stdev that may be 0, which stops them
+            direct = ~summed
+            if sigmacutFlag:
+                direct[ix[~(Nsigma*stats['stdev'][rows[ix]]>sums.tol[rows[ix]])]] = True
+            if direct.any():
+                rowstats(rows[direct],ix_good[direct],Ngood[direct])
+        stats['i'][rows] = i
+
+        # Not converged if no stdev or mean
+        stop = (Ngood<=1) | (sigmacutFlag & (stats['stdev'][rows]==0.0))
+        # Only do a sigma cut if wanted
+        if Nsigma is None or Nsigma == 0.0:
+            stats['converged'][rows[~stop]] = True
+            stop[:] = True
+        # No changes anymore? If yes converged!!!
+        elif (i>0) and (not medianflag):
+            converged = ~stop & (stats['Nchanged'][rows]==0)
+            stats['converged'][rows[converged]] = True
+            stop |= converged
+        active[rows[stop]] = False
+        i += 1
+        stats['i'][rows[~stop]] = i
+
+    # the statistics of the final good values
+    (rows,) = np.where(~exact)
+    if len(rows)>0:
+        rowstats(rows,stats['ix_good'][rows],stats['Ngood'][rows])
+
+    stats['ix_clip'] = indices & ~stats['ix_good']
+    return(stats)
+
+def sigmacut_stats(data,noise=None,mask=None,sigmacutFlag=False,
+                   Nsigma=3.0,Nitmax=10,median_firstiteration=True):
+    """
+    Same as pdastrostatsclass.calcaverage_sigmacutloop() with removeNaNs=True, but on arrays, 
+    without changing any object: the one-row case of sigmacut_rows(). It is therefore safe to call from several threads.
+    
+    data, noise: arrays of the values and their uncertainties. If noise is None, sigmacutFlag is set to True.
+    mask: boolean array, True for the values to skip (e.g., flagged). Default: no values skipped.
+    
+    Returns a StatResult. ix_good and ix_clip are the positions of the good and clipped values in data.
+    """
+    valid = None if mask is None else ~np.asarray(mask,dtype=bool)[np.newaxis]
+    stats = sigmacut_rows(np.asarray(data,dtype=np.float64)[np.newaxis],
+                          None if noise is None else np.asarray(noise,dtype=np.float64)[np.newaxis],
+                          valid=valid,sigmacutFlag=sigmacutFlag,Nsigma=Nsigma,Nitmax=Nitmax,
+                          median_firstiteration=median_firstiteration)
+    Ngood = int(stats['Ngood'][0])
+    # None instead of NaN, as in statparams
+    Nmin = {'mean':1,'mean_err':1 if not(noise is None) else 2,'stdev':2,'stdev_err':2,'X2norm':2}
+    values = {k:(stats[k][0] if Ngood>=Nmin[k] else None) for k in Nmin}
+    (ix_good,) = np.where(stats['ix_good'][0])
+    (ix_clip,) = np.where(stats['ix_clip'][0])
+    return(StatResult(ix_good=ix_good,ix_clip=ix_clip,
+                      Ngood=Ngood,Nclip=int(stats['Nclip'][0]),Nchanged=int(stats['Nchanged'][0]),
+                      Nmask=int(stats['Nmask'][0]),Nnan=int(stats['Nnan'][0]),
+                      converged=bool(stats['converged'][0]),i=int(stats['i'][0]),**values))
+
+def flux2mag_arrays(flux,dflux,zpt=None,upperlim_Nsigma=None):
+    """
+    magnitudes and their uncertainties for the arrays flux and dflux, calculated in one pass.
+    If upperlim_Nsigma is not None, upper limits are calculated for S/N<upperlim_Nsigma, 
+    and their uncertainties are NaN:
+    if the flux is positive, upper limit = flux + upperlim_Nsigma * dflux,
+    if the flux is negative, upper limit = upperlim_Nsigma * dflux.
+    Magnitudes are NaN if S/N is NaN.
+    Returns the arrays mag and dmag.
+    """
+    flux = np.asarray(flux,dtype=np.float64)
+    dflux = np.asarray(dflux,dtype=np.float64)
+    with np.errstate(divide='ignore',invalid='ignore'):
+        if upperlim_Nsigma is None:
+            mag = -2.5*np.log10(flux)
+            dmag = 2.5 / np.log(10.0) * dflux / flux
+        else:
+            SN = flux/dflux
+            ix_mag = SN>=upperlim_Nsigma
+            ix_ul_negative = SN<=0.0
+            # NaN for invalid S/N
+            magflux = np.where(ix_mag,flux,np.where(ix_ul_negative,upperlim_Nsigma*dflux,flux + upperlim_Nsigma*dflux))
+            magflux[np.isnan(SN)] = np.nan
+            mag = -2.5*np.log10(magflux)
+            dmag = np.where(ix_mag,2.5 / np.log(10.0) * dflux / flux,np.nan)
+    if not(zpt is None):
+        mag += zpt
+    return(mag,dmag)
+
+def hex2int(values):
+    """
+    convert the array of hexadecimal strings values (e.g. '0x800000') to integers, vectorized over the characters.
+    Falls back to int(value,16) for each value if they are not all of the form 0x<hexdigits>.
+    """
+    values = np.asarray(values)
+    try:
+        chars = values.astype('S')
+    except (UnicodeEncodeError,ValueError,TypeError):
+        chars = None
+    if not(chars is None) and len(chars)>0 and 2<chars.dtype.itemsize<=17:
+        chars = chars.view(np.uint8).reshape(len(chars),chars.dtype.itemsize)
+        # value of each hex digit, 16 for invalid characters. The strings are padded with 0 bytes at the end
+        lookup = np.full(256,16,dtype=np.uint8)
+        lookup[[ord(c) for c in '0123456789']] = np.arange(10)
+        lookup[[ord(c) for c in 'abcdef']] = np.arange(10,16)
+        lookup[[ord(c) for c in 'ABCDEF']] = np.arange(10,16)
+        lookup[0] = 0
+        digits = lookup[chars[:,2:]]
+        padding = chars[:,2:]==0
+        ndigits = digits.shape[1]-padding.sum(axis=1)
+        # valid: starts with 0x, at least one digit, only hex digits followed by padding
+        valid = (chars[:,0]==ord('0')) & ((chars[:,1]==ord('x')) | (chars[:,1]==ord('X'))) & (ndigits>0)
+        valid &= (digits<16).all(axis=1) & ~(padding[:,:-1] & ~padding[:,1:]).any(axis=1)
+        if valid.all():
+            # weight 16**(ndigits-1-position) for each digit, 0 for the padding
+            exponents = ndigits[:,np.newaxis]-1-np.arange(digits.shape[1])
+            weights = np.where(exponents>=0,np.left_shift(np.int64(1),4*np.maximum(exponents,0)),0)
+            return((digits*weights).sum(axis=1))
+    return(np.array([int(value,16) for value in values],dtype=np.int64))
+
+def compare(values,op,val):
+    """ elementwise comparison op ('eq','ne','lt','le','gt','ge') of the array values with val. NaN and None compare as False, except for 'ne' """
+    if values.dtype.kind in 'iufb' and isinstance(val,(int,float,np.number)):
+        with np.errstate(invalid='ignore'):
+            return(getattr(np,{'eq':'equal','ne':'not_equal','lt':'less','le':'less_equal','gt':'greater','ge':'greater_equal'}[op])(values,val))
+    return(getattr(pd.Series(values,copy=False),op)(val).to_numpy(dtype=bool))
+
+class pdpredicate(ABC):
+    """
+    condition on the columns of a pdastroclass table, evaluated with pdastroclass.where().
+    Conditions can be combined with & (and), | (or), and ~ (not), e.g.
+    inrange('chi/N',uplim=10) & unmasked('Mask',maskval=0x3) & notnull('uJy')
+    """
+    @abstractmethod
+    def evaluate(self,pda,positions=None):
+        """ boolean array for the table rows at the positions (all rows if None) """
+
+    def __and__(self,other):
+        return(pdpredicate_combined(np.logical_and,self,other))
+
+    def __or__(self,other):
+        return(pdpredicate_combined(np.logical_or,self,other))
+
+    def __invert__(self):
+        return(pdpredicate_not(self))
+
+class pdpredicate_combined(pdpredicate):
+    def __init__(self,ufunc,A,B):
+        self.ufunc = ufunc
+        self.A = A
+        self.B = B
+
+    def evaluate(self,pda,positions=None):
+        return(self.ufunc(self.A.evaluate(pda,positions),self.B.evaluate(pda,positions)))
+
+class pdpredicate_not(pdpredicate):
+    def __init__(self,A):
+        self.A = A
+
+    def evaluate(self,pda,positions=None):
+        return(~self.A.evaluate(pda,positions))
+
+class pdpredicate_columns(pdpredicate):
+    """ condition that has to be fulfilled by all columns colnames (all columns if None) """
+    def __init__(self,colnames=None):
+        self.colnames = colnames
+
+    @abstractmethod
+    def evaluate_column(self,values):
+        """ boolean array for the column values """
+
+    def evaluate(self,pda,positions=None):
+        keep = None
+        for colname in pda.getcolnames(self.colnames):
+            keep_col = self.evaluate_column(pda.getcolvalues(colname,positions))
+            keep = keep_col if keep is None else (keep & keep_col)
+        if keep is None:
+            keep = np.full(pda.getnrows(positions),True)
+        return(keep)
+
+class inrange(pdpredicate_columns):
+    def __init__(self,colnames=None,lowlim=None,uplim=None,exclude_lowlim=False,exclude_uplim=False):
+        pdpredicate_columns.__init__(self,colnames)
+        self.lowlim = lowlim
+        self.uplim = uplim
+        self.exclude_lowlim = exclude_lowlim
+        self.exclude_uplim = exclude_uplim
+
+    def evaluate_column(self,values):
+        keep = np.full(len(values),True)
+        if not(self.lowlim is None):
+            keep &= compare(values,'gt' if self.exclude_lowlim else 'ge',self.lowlim)
+        if not(self.uplim is None):
+            keep &= compare(values,'lt' if self.exclude_uplim else 'le',self.uplim)
+        return(keep)
+
+class outrange(pdpredicate_columns):
+    def __init__(self,colnames=None,lowlim=None,uplim=None,exclude_lowlim=False,exclude_uplim=False):
+        pdpredicate_columns.__init__(self,colnames)
+        self.lowlim = lowlim
+        self.uplim = uplim
+        self.exclude_lowlim = exclude_lowlim
+        self.exclude_uplim = exclude_uplim
+
+    def evaluate_column(self,values):
+        keep = np.full(len(values),False)
+        if not(self.lowlim is None):
+            keep |= compare(values,'lt' if self.exclude_lowlim else 'le',self.lowlim)
+        if not(self.uplim is None):
+            keep |= compare(values,'gt' if self.exclude_uplim else 'ge',self.uplim)
+        return(keep)
+
+class equal(pdpredicate_columns):
+    """ use isnull() if val is None """
+    def __init__(self,colnames,val):
+        pdpredicate_columns.__init__(self,colnames)
+        self.val = val
+
+    def evaluate_column(self,values):
+        if self.val is None:
+            return(pd.isnull(values))
+        return(compare(values,'eq',self.val))
+
+class not_equal(pdpredicate_columns):
+    """ use notnull() if val is None """
+    def __init__(self,colnames,val):
+        pdpredicate_columns.__init__(self,colnames)
+        self.val = val
+
+    def evaluate_column(self,values):
+        if self.val is None:
+            return(pd.notnull(values))
+        return(compare(values,'ne',self.val))
+
+class notnull(pdpredicate_columns):
+    def evaluate_column(self,values):
+        return(pd.notnull(values))
+
+class isnull(pdpredicate_columns):
+    def evaluate_column(self,values):
+        return(pd.isnull(values))
+
+class unmasked(pdpredicate_columns):
+    """ no bit of maskval set in maskcol (maskcol equal to 0 if maskval is None) """
+    def __init__(self,maskcol,maskval=None):
+        pdpredicate_columns.__init__(self,maskcol)
+        self.maskval = maskval
+
+    def evaluate_column(self,values):
+        if self.maskval is None:
+            return(compare(values,'eq',0))
+        return(np.bitwise_and(values if values.dtype.kind in 'iu' else values.astype('int'),self.maskval)==0)
+
+class masked(pdpredicate_columns):
+    """ any bit of maskval set in maskcol (maskcol not equal to 0 if maskval is None) """
+    def __init__(self,maskcol,maskval=None):
+        pdpredicate_columns.__init__(self,maskcol)
+        self.maskval = maskval
+
+    def evaluate_column(self,values):
+        if self.maskval is None:
+            return(compare(values,'ne',0))
+        return(np.bitwise_and(values if values.dtype.kind in 'iu' else values.astype('int'),self.maskval)!=0)
+
+class matchregex(pdpredicate_columns):
+    def __init__(self,col,regex):
+        pdpredicate_columns.__init__(self,col)
+        self.regex = regex
+
+    def evaluate_column(self,values):
+        return((pd.Series(values,copy=False).str.contains(self.regex)==True).to_numpy())
+
+def popcount(words):
+    """ number of bits set in the array words """
+    if hasattr(np,'bitwise_count'):
+        return(int(np.bitwise_count(words).sum()))
+    return(int(np.unpackbits(words.view(np.uint8)).sum()))
+
+class IndexSet:
+    """
+    set of indices of a table, stored as a bit vector over the rows of the table packed into 64-bit words.
+    & (intersection), | (union), - (difference) and ^ (symmetric difference) work word by word without sorting,
+    and len() is a popcount. The sorted array of indices is only made when needed, e.g. by np.asarray() or get_indices().
+    IndexSets are usually made with pdastroclass.indexset().
+    """
+    def __init__(self,index,mask=None):
+        """
+        index: index of the table (e.g., pdastroclass.t.index)
+        mask: boolean array over the rows of the table, True for the rows in the set (default: empty set)
+        """
+        self.index = index
+        if mask is None:
+            mask = np.full(len(index),False)
+        padded = np.zeros(8*((len(index)+63)//64),dtype=np.uint8)
+        packed = np.packbits(mask,bitorder='little')
+        padded[:len(packed)] = packed
+        self.words = padded.view('<u8')
+        self.indices = None
+
+    def new(self,words):
+        indexset = IndexSet.__new__(IndexSet)
+        indexset.index = self.index
+        indexset.words = words
+        indexset.indices = None
+        return(indexset)
+
+    def check(self,other):
+        if not isinstance(other,IndexSet) or len(other.index)!=len(self.index):
+            raise RuntimeError('IndexSets must be of the same table!')
+
+    def __and__(self,other):
+        self.check(other)
+        return(self.new(self.words & other.words))
+
+    def __or__(self,other):
+        self.check(other)
+        return(self.new(self.words | other.words))
+
+    def __sub__(self,other):
+        self.check(other)
+        return(self.new(self.words & ~other.words))
+
+    def __xor__(self,other):
+        self.check(other)
+        return(self.new(self.words ^ other.words))
+
+    def __len__(self):
+        return(popcount(self.words))
+
+    def get_mask(self):
+        """ boolean array over the rows of the table """
+        return(np.unpackbits(self.words.view(np.uint8),count=len(self.index),bitorder='little').astype(bool))
+
+    def get_indices(self):
+        """ sorted array of the indices in the set """
+        if self.indices is None:
+            self.indices = self.index.values[self.get_mask()]
+            if not self.index.is_monotonic_increasing:
+                self.indices = np.sort(self.indices)
+        return(self.indices)
+
+    def __array__(self,dtype=None,copy=None):
+        return(np.asarray(self.get_indices(),dtype=dtype))
+
+    def __iter__(self):
+        return(iter(self.get_indices()))
+
 def radec2coord(ra, dec):
     unit = [u.deg, u.deg]
     if ':' in str(ra):
@@ -115,7 +750,77 @@ def radec2coord(ra, dec):
 
 
 
-class pdastroclass:
+class pdrowbuffer:
+    """
+    Table whose rows can be appended cheaply: appendrow() collects the new rows column by column,
+    and the DataFrame self.t is only concatenated with them once, the next time self.t is accessed.
+    This avoids the quadratic cost of a pd.concat for each new row.
+    """
+    # pending rows: dictionary of column name -> list of values, and number of pending rows
+    newcols = None
+    Nnewrows = 0
+    # increased every time rows are added or self.t is replaced
+    version = 0
+    # dtypes of the columns of the appended rows (column name -> dtype), so that they do not depend on
+    # the rows of a flush. None: all dtypes are inferred
+    coldtypes = None
+
+    @property
+    def t(self):
+        if self.Nnewrows>0:
+            self.flushrows()
+        return(self._t)
+
+    @t.setter
+    def t(self,t):
+        # a new table replaces the old one including its pending rows
+        self.newcols = None
+        self.Nnewrows = 0
+        self._t = t
+        self.version += 1
+
+    def appendrow(self,dicti):
+        """
+        Append the row dicti (dictionary of column name -> value) to the table. 
+        Returns the index the row has in self.t, which gets reindexed as for pd.concat(...,ignore_index=True)
+        """
+        if self.newcols is None:
+            self.newcols = {}
+        for col in dicti:
+            if not (col in self.newcols):
+                self.newcols[col] = [np.nan]*self.Nnewrows
+        for col in self.newcols:
+            self.newcols[col].append(dicti[col] if col in dicti else np.nan)
+        self.Nnewrows += 1
+        self.version += 1
+        t = self.__dict__.get('_t')
+        return((0 if t is None else len(t))+self.Nnewrows-1)
+
+    def __getstate__(self):
+        # copies and pickles get the table with the pending rows already added
+        if self.Nnewrows>0:
+            self.flushrows()
+        return(self.__dict__)
+
+    def flushrows(self):
+        """
+        Concatenate the pending rows to self.t. Columns listed in self.coldtypes get their declared dtype,
+        the dtypes of the other columns are inferred from the pending rows.
+        """
+        newrows = pd.DataFrame(self.newcols,index=range(self.Nnewrows))
+        if not(self.coldtypes is None):
+            newrows = newrows.astype({col:dtype for col,dtype in self.coldtypes.items() if col in newrows.columns})
+        t = self.__dict__.get('_t')
+        if t is None or len(t)==0:
+            # nothing to concatenate with (pd.concat warns about empty entries); keep the columns of the empty table first
+            if not(t is None):
+                newcols = [col for col in newrows.columns if not(col in t.columns)]
+                newrows = newrows.reindex(columns=list(t.columns)+newcols)
+            self.t = newrows
+        else:
+            self.t = pd.concat([t,newrows],axis=0,ignore_index=True)
+
+class pdastroclass(pdrowbuffer):
     def __init__(self,hexcols=[],hexcol_formatters={},**kwargs):
         self.t = pd.DataFrame(**kwargs)
    
@@ -150,6 +855,9 @@ class pdastroclass:
         # dictionary for the splines. arguments are the y columns of the spline
         self.spline={}
 
+        # values derived from the table, e.g. sort orders. See getcached()
+        self.caches={}
+
 
     def load_lines(self,lines,sep='\s+',**kwargs):
         #errorflag = self.load_spacesep(io.StringIO('\n'.join(lines)),sep=sep,**kwargs)
@@ -201,7 +909,9 @@ class pdastroclass:
 
         try:
             if verbose: print('Loading %s' % filename)
-            self.t = pd.read_table(filename,delim_whitespace=delim_whitespace,**kwargs)
+            # delim_whitespace is no longer supported by pandas; sep='\s+' is its replacement
+            if delim_whitespace and not('sep' in kwargs): kwargs['sep']=r'\s+'
+            self.t = pd.read_table(filename,**kwargs)
             self.filename = filename
         except Exception as e:
             print('ERROR: could not read %s!' % filename)
@@ -360,13 +1070,13 @@ class pdastroclass:
         # These columns are added to self.hexcols
         if auto_find_hexcols and len(self.t)>0:
             for col in self.t.columns:
-                if self.t[col].dtype == object and isinstance(self.t.at[0,col],str):
+                if is_string_dtype(self.t[col].dtype) and isinstance(self.t.at[0,col],str):
                     if not(hexpattern.search(self.t.at[0,col]) is None):
                         # add column to self.hexcols, so that it stays a hexcol when writing and saving 
                         if not(col in self.hexcols):
                             self.hexcols.append(col)
                         # convert it to int
-                        self.t[col] = self.t[col].apply(int, base=16)
+                        self.t[col] = hex2int(self.t[col].to_numpy())
         # Go through hexcols, and check if they need conversion.
         # These columns are also added to self.hexcols
         if not(hexcols is None):
@@ -378,9 +1088,9 @@ class pdastroclass:
                     # nothing to do (yet)!
                     continue
                 # if the column is still a string starting with '0x', convert it to int
-                if self.t[hexcol].dtype == object and isinstance(self.t.at[0,hexcol],str):
+                if is_string_dtype(self.t[hexcol].dtype) and isinstance(self.t.at[0,hexcol],str):
                     if not(hexpattern.search(self.t.at[0,hexcol]) is None):
-                         self.t[hexcol] = self.t[hexcol].apply(int, base=16)
+                         self.t[hexcol] = hex2int(self.t[hexcol].to_numpy())
 
         return(0)
     
@@ -424,186 +1134,172 @@ class pdastroclass:
                 colnames=[colnames]
         return(colnames)
             
+    def getpositions(self,indices=None):
+        """ integer positions of the indices in the table (None if indices is None, i.e., all rows) """
+        if indices is None:
+            return(None)
+        indices = np.asarray(self.getindices(indices))
+        if len(indices)==0:
+            return(np.array([],dtype=int))
+        index = self.t.index
+        if isinstance(index,pd.RangeIndex) and index.start==0 and index.step==1 and indices.dtype.kind in 'iu':
+            if indices.min()<0 or indices.max()>=len(index):
+                raise KeyError(f'{AnotB(indices,index.values)} not in index')
+            return(indices)
+        positions = index.get_indexer(indices)
+        if (positions<0).any():
+            raise KeyError(f'{indices[positions<0]} not in index')
+        return(positions)
+
+    def getnrows(self,positions=None):
+        if positions is None:
+            return(len(self.t))
+        return(len(positions))
+
+    def getcolvalues(self,colname,positions=None):
+        """ array of the values of column colname at the positions (all rows if None) """
+        values = self.t[colname].to_numpy()
+        if not(positions is None):
+            values = values[positions]
+        return(values)
+
+    def setcolvalues(self,colname,values,positions=None):
+        """ set the values of column colname at the positions (all rows if None). A new column is NaN for the other rows. """
+        if positions is None:
+            self.t[colname] = values
+            return
+        if not(colname in self.t.columns):
+            self.t[colname] = np.nan
+        self.t.iloc[positions,self.t.columns.get_loc(colname)] = values
+
+    def where(self,predicate,indices=None,return_mask=False):
+        """
+        Evaluate predicate (a pdpredicate, e.g. inrange('chi/N',uplim=10) & unmasked('Mask',maskval=0x3))
+        for the indices (all if None) in one pass over the column arrays.
+        Returns the indices that fulfill it, keeping their order, or the boolean mask for the indices if return_mask.
+        """
+        positions = self.getpositions(indices)
+        if self.getnrows(positions)==0:
+            # nothing to evaluate, the columns do not even need to exist
+            keep = np.full(0,True)
+        else:
+            keep = predicate.evaluate(self,positions)
+        if return_mask:
+            return(keep)
+        if indices is None:
+            return(self.t.index.values[keep])
+        return(np.asarray(self.getindices(indices))[keep])
+
+    def indexset(self,indices=None,predicate=None):
+        """
+        IndexSet of the indices (all if None) that fulfill the predicate (all of them if predicate is None)
+        """
+        positions = self.getpositions(indices)
+        if positions is None:
+            mask = np.full(len(self.t),True) if predicate is None else self.where(predicate,return_mask=True)
+        else:
+            mask = np.full(len(self.t),False)
+            mask[positions] = True if predicate is None else self.where(predicate,indices=indices,return_mask=True)
+        return(IndexSet(self.t.index,mask))
+
     def ix_remove_null(self,colnames=None,indices=None):
         print('ix_remove_null deprecated, replace with ix_not_null')
         return(self.ix_not_null(colnames=colnames,indices=indices))
     
     def ix_not_null(self,colnames=None,indices=None):
-        # get the indices based on input.
-        indices=self.getindices(indices)
-        
-        # get the column names over which to iterate
-        colnames=self.getcolnames(colnames)
-        
-        for colname in colnames:
-            (notnull,) = np.where(pd.notnull(self.t.loc[indices,colname]))
-            indices = indices[notnull]
-        return(indices)
+        return(self.where(notnull(colnames),indices=indices))
 
     def ix_is_null(self,colnames=None,indices=None):
-        # get the indices based on input.
-        indices=self.getindices(indices)
-        
-        # get the column names over which to iterate
-        colnames=self.getcolnames(colnames)
-        
-        for colname in colnames:
-            #print('XXX',indices)
-            (null,) = np.where(pd.isnull(self.t.loc[indices,colname]))
-            indices = indices[null]
-            #print('YYY',null)
-        return(indices)
+        return(self.where(isnull(colnames),indices=indices))
 
     def ix_equal(self,colnames,val,indices=None):
-        # get the indices based on input.
-        
         # use isnull() if val is None
-        if val is None:
-            indices = self.ix_is_null(colnames,indices=indices)
-            return(indices)
-
-        indices=self.getindices(indices)        
-        
-        # get the column names over which to iterate
-        colnames=self.getcolnames(colnames)
-        for colname in colnames:
-            (keep,) = np.where(self.t.loc[indices,colname].eq(val))
-            indices = indices[keep]
-            
-        return(indices)
+        return(self.where(equal(colnames,val),indices=indices))
         
     def ix_not_equal(self,colnames,val,indices=None):
-        # get the indices based on input.
-        
         # use notnull() if val is None
-        if val is None:
-            indices = self.ix_not_null(colnames,indices=indices)
-            return(indices)
-
-        indices=self.getindices(indices)        
-        
-        # get the column names over which to iterate
-        colnames=self.getcolnames(colnames)
-        for colname in colnames:
-            (keep,) = np.where(self.t.loc[indices,colname].ne(val))
-            indices = indices[keep]
-            
-        return(indices)
-        
+        return(self.where(not_equal(colnames,val),indices=indices))
 
     def ix_inrange(self,colnames=None,lowlim=None,uplim=None,indices=None,
                    exclude_lowlim=False,exclude_uplim=False):
-
-        # get the indices based on input.
-        indices=self.getindices(indices)
-        
-        # get the column names over which to iterate
-        colnames=self.getcolnames(colnames)
-        #print(colnames)
-        for colname in colnames:
-            if not(lowlim is None):
-                if exclude_lowlim:
-                    (keep,) = np.where(self.t.loc[indices,colname].gt(lowlim))
-                else:
-                    (keep,) = np.where(self.t.loc[indices,colname].ge(lowlim))
-                indices = indices[keep]
-                #print('lowlim cut:',keep)
-
-            if not(uplim is None):
-                if exclude_uplim:
-                    (keep,) = np.where(self.t.loc[indices,colname].lt(uplim))
-                else:
-                    (keep,) = np.where(self.t.loc[indices,colname].le(uplim))
-                indices = indices[keep]
-                #print('uplim cut:',keep)
-        return(indices)
+        return(self.where(inrange(colnames,lowlim=lowlim,uplim=uplim,
+                                  exclude_lowlim=exclude_lowlim,exclude_uplim=exclude_uplim),indices=indices))
     
     def ix_outrange(self,colnames=None,lowlim=None,uplim=None,indices=None,
                     exclude_lowlim=False,exclude_uplim=False):
-
-        # get the indices based on input.
-        indices=self.getindices(indices)        
-        
-        # get the column names over which to iterate
-        colnames=self.getcolnames(colnames)
-        
-        #print('BBB',indices)
-        for colname in colnames:
-            if not(lowlim is None):
-                if exclude_lowlim:
-                    (keeplow,) = np.where(self.t.loc[indices,colname].lt(lowlim))
-                else:
-                    (keeplow,) = np.where(self.t.loc[indices,colname].le(lowlim))
-                #print('lowlim cut:',keeplow)
-            else:
-                keeplow=[]
-
-            if not(uplim is None):
-                if exclude_uplim:
-                    (keepup,) = np.where(self.t.loc[indices,colname].gt(uplim))
-                else:
-                    (keepup,) = np.where(self.t.loc[indices,colname].ge(uplim))
-                #print('uplim cut:',keepup)
-            else:
-                keepup=[]
-                
-            indices = indices[AorB(keeplow,keepup)]
-            
-        return(indices)
+        return(self.where(outrange(colnames,lowlim=lowlim,uplim=uplim,
+                                   exclude_lowlim=exclude_lowlim,exclude_uplim=exclude_uplim),indices=indices))
     
     def ix_unmasked(self,maskcol,maskval=None,indices=None):
-
-        # get the indices based on input.
-        indices=self.getindices(indices)  
-        
-        if maskval is None:
-            (keep,) = np.where(self.t.loc[indices,maskcol].eq(0))
-        else:
-            (keep,) = np.where(bitmask.bitfield_to_boolean_mask(self.t.loc[indices,maskcol].astype('int'),ignore_flags=~maskval,good_mask_value=True))
-        indices = indices[keep]
-        return(indices)           
+        return(self.where(unmasked(maskcol,maskval=maskval),indices=indices))
     
     def ix_masked(self,maskcol,maskval=None,indices=None):
-
-        # get the indices based on input.
-        indices=self.getindices(indices)  
-        
-        if maskval is None:
-            (keep,) = np.where(self.t.loc[indices,maskcol].ne(0))
-        else:
-            (keep,) = np.where(bitmask.bitfield_to_boolean_mask(self.t.loc[indices,maskcol].astype('int'),ignore_flags=~maskval))
-        indices = indices[keep]
-        return(indices)    
+        return(self.where(masked(maskcol,maskval=maskval),indices=indices))
     
     def ix_matchregex(self,col,regex,indices=None):
-        # get the indices based on input.
-        indices=self.getindices(indices)  
-        
-        (keep,) = np.where((self.t.loc[indices,col].str.contains(regex)==True))
-        #bla = self.t[col].str.contains(regex)==True
+        return(self.where(matchregex(col,regex),indices=indices))
 
-        indices = indices[keep]
-        return(indices)    
-
-    def ix_sort_by_cols(self,cols,indices=None,ascending=True):
+    def modified(self):
+        """
+        Call after changing values of self.t in place (e.g. self.t.loc[ix,col]=val), so that the cached 
+        values derived from the table (e.g. the sort order of columns) are calculated again.
+        """
+        self.version += 1
 
-        # get the indices based on input.
-        indices=self.getindices(indices)  
-        
-        # get the column names (makes sure that it is a list)
+    def getcached(self,key,cols,func):
+        """
+        Returns func(), which is calculated only once as long as the table does not change. 
+        The cached value is calculated again if self.t is replaced, rows are added, self.modified() is called, 
+        or one of the columns cols is assigned (e.g. self.t[col]=values).
+        Changes of values in place are not detected, call self.modified() after them.
+        """
+        t = self.t
+        # the arrays of the columns change if the columns are assigned. They are kept in the cache, 
+        # so that their memory cannot be reused by new columns
+        colvalues = [t[col].to_numpy() for col in cols]
+        stamp = (self.version,[values.__array_interface__['data'][0] for values in colvalues])
+        if key in self.caches:
+            (cachedstamp,cachedt,cachedindex,cachedvalues,value) = self.caches[key]
+            if cachedstamp==stamp and cachedt is t and cachedindex is t.index:
+                return(value)
+        value = func()
+        self.caches[key] = (stamp,t,t.index,colvalues,value)
+        return(value)
+
+    def getsortpositions(self,cols,ascending=True):
+        """
+        positions of the rows of self.t sorted by the columns cols, NaNs last. The sort is stable, i.e. 
+        rows with equal values stay in table order. The result is cached until the table changes (see getcached()).
+        """
         cols=self.getcolnames(cols)
+        def sortpositions():
+            t = self.t[cols].reset_index(drop=True)
+            return(t.sort_values(cols,ascending=ascending,kind='stable').index.values)
+        return(self.getcached(('sort',tuple(cols),ascending),cols,sortpositions))
 
-        ix_sorted = self.t.loc[indices].sort_values(cols,ascending=ascending).index.values
+    def ix_sort_by_cols(self,cols,indices=None,ascending=True):
+        """
+        indices (all if None) sorted by the columns cols. Indices with equal values are in table order.
+        """
+        positions = self.getsortpositions(cols,ascending=ascending)
+        if indices is None:
+            return(self.t.index.values[positions])
 
-        return(ix_sorted)
+        # sort the positions of the indices by their rank in the sorted table
+        rank = np.empty(len(positions),dtype=int)
+        rank[positions] = np.arange(len(positions))
+        indexpositions = self.getpositions(indices)
+        indexpositions = indexpositions[np.argsort(rank[indexpositions],kind='stable')]
+        return(self.t.index.values[indexpositions])
 
     def newrow(self,dicti=None):
         #self.t = self.t.append(dicti,ignore_index=True)
-        self.t = pd.concat([self.t,pd.DataFrame([dicti])],axis=0, ignore_index=True)
-        return(self.t.index.values[-1])
+        # the row is only added to self.t the next time self.t is accessed
+        return(self.appendrow({} if dicti is None else dicti))
         
     def add2row(self,index,dicti):
         self.t.loc[index,list(dicti.keys())]=list(dicti.values())
+        self.modified()
         return(index)
 
     def fitsheader2table(self,fitsfilecolname,indices=None,requiredfitskeys=None,optionalfitskey=None,
@@ -864,57 +1560,20 @@ class pdastroclass:
     
     def flux2mag(self,fluxcol,dfluxcol,magcol,dmagcol,indices=None,
                  zpt=None,zptcol=None, upperlim_Nsigma=None):
-
-        indices = self.getindices(indices)  
-        if len(indices)==0:
+        """
+        Calculate the magnitudes magcol and their uncertainties dmagcol from fluxcol and dfluxcol 
+        for the indices (all if None). See flux2mag_arrays() for the upper limits.
+        """
+        positions = self.getpositions(indices)
+        if self.getnrows(positions)==0:
             return(0)
-        
-        # delete all previous results
-        self.t.loc[indices,magcol]= np.nan
-        self.t.loc[indices,dmagcol]= np.nan
 
-        # if upperlim_Nsigma is not None, then upper limits are calculated. 
-        if upperlim_Nsigma is None:
-            indices_mag = indices
-            # no upper limits
-            indices_ul = indices_ul_negative = []
-        else:
-           # calculate the S/N
-            self.t.loc[indices,'__tmp_SN']=self.t.loc[indices,fluxcol]/self.t.loc[indices,dfluxcol]
-            # Get the indices with valid S/N
-            indices_validSN = self.ix_not_null('__tmp_SN',indices=indices)
- 
-            # get the indices for which the S/N>=upperlim_Nsigma
-            indices_mag = self.ix_inrange(['__tmp_SN'],upperlim_Nsigma,indices=indices_validSN)
-            # all the other indices can only be used for upper limits
-            indices_ul = AnotB(indices_validSN,indices_mag) 
-            # get the indices for which the S/N is negative
-            indices_ul_negative = self.ix_inrange(['__tmp_SN'],None,0.0,indices=indices_ul)
-            #self.t = self.t.drop(columns=['__tmp_SN'])
-            
-        # Calculate the mags and uncertainties
-        self.t.loc[indices_mag,magcol]= -2.5*np.log10(self.t.loc[indices_mag,fluxcol].astype(np.float64))
-        self.t.loc[indices_mag,dmagcol] = 2.5 / np.log(10.0) * self.t.loc[indices_mag,dfluxcol].astype(np.float64) / self.t.loc[indices_mag,fluxcol].astype(np.float64)
-        
-        # Are there upper limits to be calculated? 
-        if len(indices_ul)>0:
-            # just to be sure, set dmags to nan
-            self.t.loc[indices_ul,dmagcol] = np.nan
-            
-            indices_ul_positive = AnotB(indices_ul,indices_ul_negative) 
-            if len(indices_ul_positive)>0:
-                # If flux is positive: upper limit = flux + Nsigma * dflux
-                self.t.loc[indices_ul_positive,magcol] = -2.5*np.log10(self.t.loc[indices_ul_positive,fluxcol].astype(np.float64) + upperlim_Nsigma*self.t.loc[indices_ul_positive,dfluxcol].astype(np.float64))
-
-            if len(indices_ul_negative)>0:
-                # If flux is negative: upper limit = Nsigma * dflux
-                self.t.loc[indices_ul_negative,magcol] = -2.5*np.log10(upperlim_Nsigma*self.t.loc[indices_ul_negative,dfluxcol].astype(np.float64))
-        
-        if not(zpt is None):        
-            self.t.loc[indices,magcol]+=zpt
+        mag,dmag = flux2mag_arrays(self.getcolvalues(fluxcol,positions),self.getcolvalues(dfluxcol,positions),
+                                   zpt=zpt,upperlim_Nsigma=upperlim_Nsigma)
         if not(zptcol is None):        
-            self.t.loc[indices,magcol]+=self.t.loc[indices,zptcol]
-
+            mag += self.getcolvalues(zptcol,positions)
+        self.setcolvalues(magcol,mag,positions)
+        self.setcolvalues(dmagcol,dmag,positions)
 
     def initspline(self,xcol,ycol,indices=None,
                    kind='cubic',bounds_error=False,fill_value='extrapolate', 
@@ -947,15 +1606,7 @@ class pdastrostatsclass(pdastroclass):
         pdastroclass.__init__(self,**kwargs)
         self.reset()
         self.set_statstring_format()
-        self.c4_smalln = [0.0, 0.0, 0.7978845608028654, 0.8862269254527579, 0.9213177319235613, 0.9399856029866251, 0.9515328619481445]
 
-    def c4(self,n):
-        #http://en.wikipedia.org/wiki/Unbiased_estimation_of_standard_deviation
-        if n<=6:
-            return(self.c4_smalln[n])
-        else:
-            return(1.0 - 1.0/(4.0*n) - 7.0/(32.0*n*n) - 19.0/(128.0*n*n*n))
-        
     def reset(self):
         self.statparams = {}
         for k  in ['mean','mean_err','stdev','stdev_err','X2norm','ix_good','ix_clip']:
@@ -1010,7 +1661,7 @@ class pdastrostatsclass(pdastroclass):
             if medianflag:
                 mean = self.t.loc[ix_good,datacol].median()
                 if verbose>1: print('median: {:f}'.format(mean))
-                stdev =  np.sqrt(1.0/(Ngood-1.0)*np.sum(np.square(self.t.loc[ix_good,datacol] - mean)))/self.c4(Ngood)
+                stdev =  np.sqrt(1.0/(Ngood-1.0)*np.sum(np.square(self.t.loc[ix_good,datacol] - mean)))/c4(Ngood)
                 mean_err = self.t.loc[ix_good,noisecol].median()/np.sqrt(Ngood-1)
                 #mean_err = stdev/np.sqrt(Ngood-1)
                 
@@ -1136,7 +1787,7 @@ class pdastrostatsclass(pdastroclass):
                 median = self.t.loc[ix_good,datacol].median()
                 #mean = scipy.median(self.t.loc[ix_good,datacol])
                 if verbose>1: print('median: {:f}'.format(median))
-                stdev =  np.sqrt(1.0/(Ngood-1.0)*np.sum(np.square(self.t.loc[ix_good,datacol] - median)))/self.c4(Ngood)
+                stdev =  np.sqrt(1.0/(Ngood-1.0)*np.sum(np.square(self.t.loc[ix_good,datacol] - median)))/c4(Ngood)
                 mean = median
             else:
                 mean = self.t.loc[ix_good,datacol].mean()
@@ -1221,7 +1872,23 @@ class pdastrostatsclass(pdastroclass):
             if verbose>1: print('Keeping {:d} out of {:d}, skippin {:d} because of null values in columns {:s}'.format(len(indices),Ntot,Ntot-len(indices),",".join(colnames)))
         else:
             self.statparams['Nnan']= 0
-            
+
+        # fast path: get the float values into arrays once, and iterate on them with sigmacut_stats()
+        if percentile_cut_firstiteration is None and not verbose and len(indices)>0:
+            indices = np.asarray(indices)
+            positions = self.getpositions(indices)
+            x = self.getcolvalues(datacol,positions)
+            dx = None if noisecol is None else self.getcolvalues(noisecol,positions)
+            if all((values is None) or (values.dtype.kind=='f' and np.isfinite(values).all()) for values in [x,dx]):
+                result = sigmacut_stats(x,dx,sigmacutFlag=sigmacutFlag,Nsigma=Nsigma,Nitmax=Nitmax,
+                                        median_firstiteration=median_firstiteration)
+                # Nmask and Nnan are already set
+                for k in ['mean','mean_err','stdev','stdev_err','X2norm','Ngood','Nclip','Nchanged','converged','i']:
+                    self.statparams[k] = getattr(result,k)
+                self.statparams['ix_good']=indices[result.ix_good]
+                self.statparams['ix_clip']=AnotB(indices,self.statparams['ix_good'])
+                return(not self.statparams['converged'])
+
         while ((self.statparams['i']<Nitmax) or (Nitmax==0)) and (not self.statparams['converged']):
             # median only in first iteration and if wanted
             medianflag = median_firstiteration and (self.statparams['i']==0) and (Nsigma!=None)
@@ -1270,7 +1937,7 @@ class pdastrostatsclass(pdastroclass):
                 print('WARNING! no convergence!')
 
         return(not self.statparams['converged'])
-    
+
     """
     def colnames4params(self,columns=None,colmapping={},prefix='',suffix='',skipcols=[]):
         cols=[]
@@ -151,36 +151,32 @@ class Plot:
         ax1.axhline(linewidth=1, color="k")
 
         if plot_controls and sn.num_controls > 0:
-            # plot control light curves
-            label = f"{sn.num_controls} control light curves"
-            for control_index in sn.get_control_indices():
-                lc = sn.lcs[control_index]
-
-                plt.errorbar(
-                    lc.t["MJD"],
-                    lc.t["uJy"],
-                    yerr=lc.t[lc.dflux_colname],
-                    fmt="none",
-                    ecolor=CONTROL_FLUX_COLOR,
-                    elinewidth=1.5,
-                    capsize=1.2,
-                    c=CONTROL_FLUX_COLOR,
-                    alpha=0.5,
-                    zorder=0,
-                )
-                plt.scatter(
-                    lc.t["MJD"],
-                    lc.t["uJy"],
-                    s=marker_size,
-                    color=CONTROL_FLUX_COLOR,
-                    marker="o",
-                    alpha=0.5,
-                    zorder=0,
-                    label=label,
-                )
-
-                if not label is None:
-                    label = None
+            # plot all control light curves at once
+            mjd, uJy, duJy = sn.get_control_columns(
+                ["MJD", "uJy", sn.lcs[0].dflux_colname]
+            )
+            plt.errorbar(
+                mjd,
+                uJy,
+                yerr=duJy,
+                fmt="none",
+                ecolor=CONTROL_FLUX_COLOR,
+                elinewidth=1.5,
+                capsize=1.2,
+                c=CONTROL_FLUX_COLOR,
+                alpha=0.5,
+                zorder=0,
+            )
+            plt.scatter(
+                mjd,
+                uJy,
+                s=marker_size,
+                color=CONTROL_FLUX_COLOR,
+                marker="o",
+                alpha=0.5,
+                zorder=0,
+                label=f"{sn.num_controls} control light curves",
+            )
 
         sn_lc = sn.lcs[0]
         preMJD0_ix = sn_lc.get_preMJD0_indices(sn.mjd0)
@@ -400,37 +396,32 @@ class Plot:
         ax1.axhline(linewidth=1, color="k")
 
         if plot_controls and sn.num_controls > 0:
-            # plot control light curves
-            label = f"Cleaned control measurements"
-            for control_index in sn.get_control_indices():
-                lc = sn.lcs[control_index]
-                good_ix = lc.get_good_indices(flag)
-
-                plt.errorbar(
-                    lc.t.loc[good_ix, "MJD"],
-                    lc.t.loc[good_ix, "uJy"],
-                    yerr=lc.t.loc[good_ix, lc.dflux_colname],
-                    fmt="none",
-                    ecolor=CONTROL_FLUX_COLOR,
-                    elinewidth=1.5,
-                    capsize=1.2,
-                    c=CONTROL_FLUX_COLOR,
-                    alpha=0.5,
-                    zorder=0,
-                )
-                plt.scatter(
-                    lc.t.loc[good_ix, "MJD"],
-                    lc.t.loc[good_ix, "uJy"],
-                    s=marker_size,
-                    color=CONTROL_FLUX_COLOR,
-                    marker="o",
-                    alpha=0.5,
-                    zorder=0,
-                    label=label,
-                )
-
-                if not label is None:
-                    label = None
+            # plot the good measurements of all control light curves at once
+            mjd, uJy, duJy = sn.get_control_columns(
+                ["MJD", "uJy", sn.lcs[0].dflux_colname], flag=flag
+            )
+            plt.errorbar(
+                mjd,
+                uJy,
+                yerr=duJy,
+                fmt="none",
+                ecolor=CONTROL_FLUX_COLOR,
+                elinewidth=1.5,
+                capsize=1.2,
+                c=CONTROL_FLUX_COLOR,
+                alpha=0.5,
+                zorder=0,
+            )
+            plt.scatter(
+                mjd,
+                uJy,
+                s=marker_size,
+                color=CONTROL_FLUX_COLOR,
+                marker="o",
+                alpha=0.5,
+                zorder=0,
+                label="Cleaned control measurements",
+            )
 
         sn_lc = sn.lcs[0]
         good_ix = sn_lc.get_good_indices(flag)
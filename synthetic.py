@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+"""
+Synthetic light curves for the tests: Gaussian noise around a given flux, with optional outliers, NaNs, and flags.
+"""
+
+import numpy as np
+import pandas as pd
+
+from lightcurve import LightCurve, Supernova, AveragedSupernova
+
+
+def make_lc(
+    mjd,
+    seed=0,
+    control_index=0,
+    lc_class=LightCurve,
+    flux=0.0,
+    outliers=0,
+    nans=0,
+    flags=(0,),
+    **columns,
+):
+    """
+    Make a light curve with MJD, uJy, duJy, and Mask columns.
+
+    :param mjd: MJDs of the measurements.
+    :param seed: Seed of the random values.
+    :param control_index: Control index of the light curve.
+    :param lc_class: Class of the light curve.
+    :param flux: True flux of the measurements; a number or an array with one value per MJD.
+    :param outliers: Number of measurements with an extra flux of a few hundred uJy.
+    :param nans: Number of measurements with a uJy of NaN.
+    :param flags: Flags to pick the Mask of each measurement from.
+    :param columns: Extra columns of the light curve.
+    """
+    rng = np.random.default_rng(seed)
+    mjd = np.asarray(mjd, dtype=np.float64)
+    N = len(mjd)
+    duJy = rng.uniform(10.0, 40.0, N)
+    uJy = flux + rng.normal(0.0, 1.0, N) * duJy
+    uJy[rng.choice(N, outliers, replace=False)] += rng.normal(0.0, 300.0, outliers)
+    uJy[rng.choice(N, nans, replace=False)] = np.nan
+
+    lc = lc_class(control_index=control_index)
+    lc.t = pd.DataFrame(
+        {
+            "MJD": mjd,
+            "uJy": uJy,
+            "duJy": duJy,
+            "Mask": rng.choice(flags, N).astype(np.uint32),
+            **columns,
+        }
+    )
+    return lc
+
+
+def make_sn(
+    mjd, num_controls, seed=0, sn_class=Supernova, lc_class=LightCurve, **kwargs
+):
+    """
+    Make a supernova with an SN light curve and num_controls control light curves at the same MJDs.
+
+    :param mjd: MJDs of the measurements.
+    :param num_controls: Number of control light curves.
+    :param seed: Seed of the random values; each light curve gets its own stream.
+    :param sn_class: Class of the supernova.
+    :param lc_class: Class of the light curves.
+    :param kwargs: Keyword arguments of make_lc().
+    """
+    sn = sn_class(tnsname="2020abc")
+    lcs = sn.avg_lcs if isinstance(sn, AveragedSupernova) else sn.lcs
+    for control_index in range(num_controls + 1):
+        lcs[control_index] = make_lc(
+            mjd,
+            seed=(seed, control_index),
+            control_index=control_index,
+            lc_class=lc_class,
+            **kwargs,
+        )
+    sn.num_controls = num_controls
+    return sn
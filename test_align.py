@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+"""
+Align control light curves onto the MJDs of the SN light curve with match_mjds and LightCurve.align_to_mjds:
+exact matches, matches within a tolerance, repeated MJDs, and gaps, which must come back as NaN with Mask 0.
+Without a tolerance, Supernova.verify_mjds must give the same tables as the set-difference loop it replaced.
+"""
+
+import numpy as np
+import pytest
+
+from lightcurve import Supernova, match_mjds, AnotB
+from synthetic import make_lc
+
+
+def get_lc(mjd, control_index=0, seed=0):
+    return make_lc(mjd, seed=seed, control_index=control_index, flags=[0x1, 0x2, 0x10])
+
+
+def legacy_align(lc, sn_sorted_mjd):
+    """
+    the set-difference loop of Supernova.verify_mjds for one control light curve
+    """
+    lc.t = lc.t.sort_values(by=["MJD"], ignore_index=True)
+    control_sorted_mjd = lc.t["MJD"].to_numpy()
+    only_sn_mjd = AnotB(sn_sorted_mjd, control_sorted_mjd)
+    only_control_mjd = AnotB(control_sorted_mjd, sn_sorted_mjd)
+    for mjd in only_sn_mjd:
+        lc.newrow({"MJD": mjd, "Mask": 0})
+    ix_to_skip = []
+    for mjd in only_control_mjd:
+        ix_to_skip.extend(lc.ix_equal("MJD", mjd))
+    ix = AnotB(lc.getindices(), ix_to_skip)
+    lc.t = lc.t.loc[lc.ix_sort_by_cols("MJD", indices=ix)]
+    lc.t.reset_index(drop=True, inplace=True)
+    return lc.t
+
+
+def assert_tables_equal(t, expected):
+    assert list(t.columns) == list(expected.columns)
+    for col in expected.columns:
+        np.testing.assert_array_equal(
+            t[col].to_numpy(dtype=np.float64),
+            expected[col].to_numpy(dtype=np.float64),
+            err_msg=col,
+        )
+
+
+def test_match_exact():
+    target = [1.0, 2.0, 3.0, 5.0, 8.0]
+    mjd = [0.5, 2.0, 3.0, 4.0, 8.0, 9.0]
+    assert match_mjds(target, mjd).tolist() == [-1, 1, 2, -1, 4]
+    assert match_mjds(target, []).tolist() == [-1] * 5
+    assert match_mjds([], mjd).tolist() == []
+
+
+def test_match_tolerance():
+    target = [1.0, 2.0, 3.0, 5.0]
+    # 2.0 and 3.0 both have 2.45 as their nearest epoch; only the closer 2.0 gets it
+    mjd = [0.98, 2.45, 5.2]
+    assert match_mjds(target, mjd, tolerance=0.05).tolist() == [0, -1, -1, -1]
+    assert match_mjds(target, mjd, tolerance=0.6).tolist() == [0, 1, -1, 2]
+    assert match_mjds(target, mjd, tolerance=0.0).tolist() == [-1, -1, -1, -1]
+
+
+def test_match_duplicates():
+    # the k-th occurrence of an MJD matches the k-th occurrence in the other array
+    assert match_mjds([1.0, 2.0, 2.0, 3.0], [1.0, 2.0, 3.0]).tolist() == [0, 1, -1, 2]
+    assert match_mjds([1.0, 2.0, 3.0], [1.0, 2.0, 2.0, 3.0]).tolist() == [0, 1, 3]
+    assert match_mjds([2.0, 2.0], [2.0, 2.0, 2.0]).tolist() == [0, 1]
+
+
+def test_align_gaps():
+    sn_mjd = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+    lc = get_lc([5.0, 3.0, 1.0, 2.5, 6.0], control_index=1)
+    values = lc.t.set_index("MJD")
+
+    lc.align_to_mjds(sn_mjd)
+    np.testing.assert_array_equal(lc.t["MJD"], sn_mjd)
+    assert lc.t["Mask"].dtype == np.uint32
+    for i, mjd in enumerate(sn_mjd):
+        if mjd in values.index:
+            assert lc.t.loc[i, "uJy"] == values.loc[mjd, "uJy"]
+            assert lc.t.loc[i, "Mask"] == values.loc[mjd, "Mask"]
+        else:
+            assert np.isnan(lc.t.loc[i, "uJy"]) and np.isnan(lc.t.loc[i, "duJy"])
+            assert lc.t.loc[i, "Mask"] == 0
+
+
+def test_align_tolerance_overwrites_mjd():
+    sn_mjd = np.array([1.0, 2.0, 3.0])
+    lc = get_lc([1.01, 1.98, 3.5], control_index=1)
+    uJy = lc.t["uJy"].to_numpy().copy()
+
+    lc.align_to_mjds(sn_mjd, tolerance=0.05)
+    np.testing.assert_array_equal(lc.t["MJD"], sn_mjd)
+    np.testing.assert_array_equal(lc.t["uJy"].to_numpy()[:2], uJy[:2])
+    assert np.isnan(lc.t.loc[2, "uJy"])
+    assert lc.t.loc[2, "Mask"] == 0
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_verify_mjds(seed):
+    rng = np.random.default_rng(seed)
+    sn_mjd = 58000.0 + np.sort(rng.choice(np.arange(300) * 0.25, 150, replace=False))
+
+    sn = Supernova(tnsname="2020abc")
+    sn.lcs[0] = get_lc(rng.permutation(sn_mjd), seed=seed)
+    expected = {}
+    for control_index in range(1, 5):
+        # drop some SN epochs and add some others
+        mjd = np.concatenate(
+            (
+                rng.choice(sn_mjd, 130, replace=False),
+                58000.1 + rng.choice(np.arange(300) * 0.25, 10, replace=False),
+            )
+        )
+        sn.lcs[control_index] = get_lc(
+            mjd, control_index=control_index, seed=seed + control_index
+        )
+        expected[control_index] = legacy_align(
+            get_lc(mjd, control_index=control_index, seed=seed + control_index),
+            sn_mjd,
+        )
+    sn.num_controls = 4
+
+    sn.verify_mjds()
+    np.testing.assert_array_equal(sn.lcs[0].t["MJD"], sn_mjd)
+    for control_index in range(1, 5):
+        assert_tables_equal(sn.lcs[control_index].t, expected[control_index])
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+"""
+Compare LightCurve.average with the per-bin loop it replaced, which averaged each MJD bin
+with its own calcaverage_sigmacutloop calls and flagged the bins one by one.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lightcurve import Cut
+from synthetic import make_lc
+
+AVERAGE_CUT = Cut(
+    flag=0x800000,
+    params={
+        "x2_max": 4.0,
+        "Nclip_max": 1,
+        "Ngood_min": 2,
+        "ixclip_flag": 0x1000,
+        "smallnum_flag": 0x2000,
+    },
+)
+PREVIOUS_FLAGS = 0x1 | 0x2
+
+
+def get_lc(seed=0, num_nights=40):
+    rng = np.random.default_rng(seed)
+    # ~4 measurements per night, some nights empty or with a single measurement
+    nights = np.repeat(
+        np.arange(num_nights), rng.choice([0, 1, 3, 4, 4, 6], num_nights)
+    )
+    return make_lc(
+        58000.0 + nights + rng.uniform(0.05, 0.95, len(nights)),
+        seed=seed,
+        flux=50.0 * np.sin(nights / 7.0),
+        outliers=len(nights) // 15,
+        flags=[0, 0, 0, 0x1, 0x2, 0x10],
+    )
+
+
+def stat(statparams, key):
+    return np.nan if statparams[key] is None else statparams[key]
+
+
+def legacy_average(lc, cut, previous_flags, mjdbinsize=1.0):
+    """
+    the per-bin loop of LightCurve.average, returning the averaged rows and the new flags of lc
+    """
+    rows = []
+    mask = lc.t["Mask"].to_numpy().astype(np.uint32)
+
+    def flag(indices, flag):
+        mask[lc.getpositions(indices)] |= flag
+
+    mjd = int(np.amin(lc.t["MJD"]))
+    mjd_max = int(np.amax(lc.t["MJD"])) + 1
+    while mjd <= mjd_max:
+        range_ix = lc.ix_inrange(
+            colnames=["MJD"], lowlim=mjd, uplim=mjd + mjdbinsize, exclude_uplim=True
+        )
+        range_good_ix = lc.ix_unmasked("Mask", maskval=previous_flags, indices=range_ix)
+        row = {
+            "MJD": np.nan,
+            "MJDbin": mjd + 0.5 * mjdbinsize,
+            "uJy": np.nan,
+            "duJy": np.nan,
+            "stdev": np.nan,
+            "x2": np.nan,
+            "Nclip": 0,
+            "Ngood": 0,
+            "Nexcluded": len(range_ix) - len(range_good_ix),
+            "Mask": 0,
+        }
+        rows.append(row)
+        mjd += mjdbinsize
+
+        if len(range_ix) < 1:
+            row["Mask"] |= cut.flag
+            continue
+
+        if len(range_good_ix) < 1:
+            lc.calcaverage_sigmacutloop(
+                "uJy",
+                noisecol="duJy",
+                indices=range_ix,
+                Nsigma=3.0,
+                median_firstiteration=True,
+            )
+            fluxstatparams = dict(lc.statparams)
+            lc.calcaverage_sigmacutloop(
+                "MJD", indices=range_ix, Nsigma=0, median_firstiteration=False
+            )
+            row["MJD"] = lc.statparams["mean"]
+            for col, key in [
+                ("uJy", "mean"),
+                ("duJy", "mean_err"),
+                ("stdev", "stdev"),
+                ("x2", "X2norm"),
+                ("Nclip", "Nclip"),
+                ("Ngood", "Ngood"),
+            ]:
+                row[col] = stat(fluxstatparams, key)
+            flag(range_ix, cut.flag)
+            row["Mask"] |= cut.flag
+            continue
+
+        lc.calcaverage_sigmacutloop(
+            "uJy",
+            noisecol="duJy",
+            indices=range_good_ix,
+            Nsigma=3.0,
+            median_firstiteration=True,
+        )
+        fluxstatparams = dict(lc.statparams)
+        if fluxstatparams["mean"] is None or len(fluxstatparams["ix_good"]) < 1:
+            flag(range_ix, cut.flag)
+            row["Mask"] |= cut.flag
+            continue
+
+        lc.calcaverage_sigmacutloop(
+            "MJD",
+            noisecol="duJy",
+            indices=fluxstatparams["ix_good"],
+            Nsigma=0,
+            median_firstiteration=False,
+        )
+        row["MJD"] = lc.statparams["mean"]
+        for col, key in [
+            ("uJy", "mean"),
+            ("duJy", "mean_err"),
+            ("stdev", "stdev"),
+            ("x2", "X2norm"),
+            ("Nclip", "Nclip"),
+            ("Ngood", "Ngood"),
+        ]:
+            row[col] = stat(fluxstatparams, key)
+
+        if len(fluxstatparams["ix_clip"]) > 0:
+            flag(fluxstatparams["ix_clip"], cut.params["ixclip_flag"])
+        if len(range_good_ix) < 3:
+            flag(range_ix, cut.params["smallnum_flag"])
+            row["Mask"] |= cut.params["smallnum_flag"]
+        elif (
+            fluxstatparams["Ngood"] < cut.params["Ngood_min"]
+            or fluxstatparams["Nclip"] > cut.params["Nclip_max"]
+            or (
+                not fluxstatparams["X2norm"] is None
+                and fluxstatparams["X2norm"] > cut.params["x2_max"]
+            )
+        ):
+            flag(range_ix, cut.flag)
+            row["Mask"] |= cut.flag
+
+    return pd.DataFrame(rows), mask
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_average(seed):
+    lc = get_lc(seed)
+    expected, expected_mask = legacy_average(get_lc(seed), AVERAGE_CUT, PREVIOUS_FLAGS)
+
+    avg_lc = lc.average(AVERAGE_CUT, PREVIOUS_FLAGS)
+    assert len(avg_lc.t) == len(expected)
+    for col in expected.columns:
+        np.testing.assert_array_equal(
+            avg_lc.t[col].to_numpy().astype(np.float64),
+            expected[col].to_numpy().astype(np.float64),
+            err_msg=col,
+        )
+    np.testing.assert_array_equal(lc.t["Mask"].to_numpy(), expected_mask)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+"""
+Compare Supernova.calculate_control_stats with the per-epoch loop it replaced, which ran
+calcaverage_sigmacutloop on a table of the control fluxes of each epoch.
+"""
+
+import numpy as np
+import pytest
+
+from pdastro import pdastrostatsclass
+from synthetic import make_sn
+
+PREVIOUS_FLAGS = 0x1 | 0x2
+C2_PARAMS = [
+    "mean",
+    "mean_err",
+    "stdev",
+    "stdev_err",
+    "X2norm",
+    "Ngood",
+    "Nclip",
+    "Nmask",
+    "Nnan",
+]
+
+
+def get_sn(seed=0, num_controls=8, num_epochs=150):
+    rng = np.random.default_rng(seed)
+    return make_sn(
+        58000.0 + np.sort(rng.uniform(0.0, 200.0, num_epochs)),
+        num_controls,
+        seed=seed,
+        outliers=20,
+        nans=3,
+        flags=[0, 0, 0, 0, 0x1, 0x2, 0x10],
+    )
+
+
+def legacy_control_stats(sn, previous_flags):
+    """
+    statparams of the per-epoch loop of calculate_control_stats, one dictionary per epoch
+    """
+    indices = sn.get_control_indices()
+    uJy = np.array([sn.lcs[i].t["uJy"] for i in indices])
+    duJy = np.array([sn.lcs[i].t["duJy"] for i in indices])
+    Mask = np.array([sn.lcs[i].t["Mask"] for i in indices], dtype=np.int32)
+
+    statparams = []
+    for index in range(uJy.shape[-1]):
+        pda4MJD = pdastrostatsclass()
+        pda4MJD.t["uJy"] = uJy[0:, index]
+        pda4MJD.t["duJy"] = duJy[0:, index]
+        pda4MJD.t["Mask"] = np.bitwise_and(Mask[0:, index], previous_flags)
+        pda4MJD.calcaverage_sigmacutloop(
+            "uJy",
+            noisecol="duJy",
+            maskcol="Mask",
+            maskval=previous_flags,
+            verbose=1,
+            Nsigma=3.0,
+            median_firstiteration=True,
+        )
+        statparams.append(dict(pda4MJD.statparams))
+    return statparams
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_calculate_control_stats(seed):
+    sn = get_sn(seed)
+    expected = legacy_control_stats(sn, PREVIOUS_FLAGS)
+    sn.calculate_control_stats(PREVIOUS_FLAGS)
+    for param in C2_PARAMS:
+        np.testing.assert_array_equal(
+            sn.lcs[0].t[f"c2_{param}"].to_numpy().astype(np.float64),
+            np.array(
+                [np.nan if s[param] is None else s[param] for s in expected],
+                dtype=np.float64,
+            ),
+            err_msg=param,
+        )
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+"""
+Compare the batch and linear engines of SimDetecLoop with the serial engine,
+which injects the simulations one by one into the control light curves.
+With the same seed, all engines pick the same control light curves, and find the same max FOMs
+to within floating-point rounding.
+Each engine also writes the same SimDetecTables with one or several worker processes.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from generate_sim_table import GAUSSIAN_MODEL_NAME
+from generate_detec_table import (
+    AtlasSimDetecLoop,
+    SimDetecTable,
+    SimDetecTables,
+    AsymmetricGaussian,
+)
+from lightcurve import SimDetecSupernova, SimDetecLightCurve
+from synthetic import make_sn
+
+SIGMA_KERNS = [5, 40]
+PEAK_APPMAGS = [17.0, 19.0, 21.0]
+NUM_CONTROLS = 6
+ENTROPY = 12345
+
+
+def get_loop(seed=0, num_bins=400):
+    rng = np.random.default_rng(seed)
+    mjdbins = 58000.5 + np.arange(num_bins)
+
+    sn = make_sn(
+        mjdbins,
+        NUM_CONTROLS,
+        seed=seed,
+        sn_class=SimDetecSupernova,
+        lc_class=SimDetecLightCurve,
+        flags=[0] * 9 + [0x800000],
+        MJDbin=mjdbins,
+    )
+
+    params = pd.DataFrame(
+        {
+            "sigma_sim": rng.choice([2.0, 10.0, 30.0], 60),
+            "peak_mjd": rng.uniform(mjdbins[0], mjdbins[-1], 60),
+        }
+    )
+    sd = SimDetecTables(PEAK_APPMAGS, GAUSSIAN_MODEL_NAME, SIGMA_KERNS)
+    for sigma_kern in SIGMA_KERNS:
+        sd.d[sigma_kern] = {}
+        for peak_appmag in PEAK_APPMAGS:
+            table = SimDetecTable(sigma_kern, peak_appmag)
+            table.t = params.copy()
+            table.t["peak_appmag"] = peak_appmag
+            table.t["sigma_kern"] = sigma_kern
+            table.t["model_name"] = GAUSSIAN_MODEL_NAME
+            table.t["filename"] = np.nan
+            sd.d[sigma_kern][peak_appmag] = table
+
+    loop = AtlasSimDetecLoop(SIGMA_KERNS)
+    loop.peak_appmags = PEAK_APPMAGS
+    loop.peak_fluxes = None
+    loop.sn = sn
+    loop.sd = sd
+    return loop
+
+
+def run_engine(engine, detec_tables_dir):
+    loop = get_loop()
+    loop.sn.precompute_rolling_sums(SIGMA_KERNS)
+    results = {}
+    for sigma_kern in SIGMA_KERNS:
+        results[sigma_kern] = loop.run_tables(
+            sigma_kern,
+            PEAK_APPMAGS,
+            list(range(1, NUM_CONTROLS + 1)),
+            str(detec_tables_dir),
+            engine=engine,
+            entropy=ENTROPY,
+        )
+    return results
+
+
+@pytest.fixture(scope="module")
+def serial_results(tmp_path_factory):
+    return run_engine("serial", tmp_path_factory.mktemp("serial"))
+
+
+@pytest.mark.parametrize("engine", ["batch", "linear"])
+def test_engine_matches_serial(engine, serial_results, tmp_path):
+    results = run_engine(engine, tmp_path)
+    for sigma_kern in SIGMA_KERNS:
+        for peak_appmag in PEAK_APPMAGS:
+            expected = serial_results[sigma_kern][peak_appmag]
+            result = results[sigma_kern][peak_appmag]
+            np.testing.assert_array_equal(
+                result["control_index"], expected["control_index"]
+            )
+            np.testing.assert_allclose(
+                result["max_fom"], expected["max_fom"], rtol=1e-9, atol=1e-9
+            )
+            np.testing.assert_array_equal(
+                result["max_fom_mjd"], expected["max_fom_mjd"]
+            )
+
+
+def test_sim_flux_is_pure():
+    sim = AsymmetricGaussian()
+    mjds = 58000.0 + np.arange(100)
+    params = [
+        {"sigma_sim_plus": 5.0, "sigma_sim_minus": 2.0, "peak_mjd": 58030.0},
+        {"sigma_sim_plus": 20.0, "sigma_sim_minus": 8.0, "peak_mjd": 58060.5},
+    ]
+    state = dict(vars(sim))
+    fluxes = [sim.get_sim_flux(mjds, 19.0, **p) for p in params]
+    assert vars(sim) == state
+    np.testing.assert_array_equal(
+        sim.get_sim_fluxes(mjds, 19.0, params), np.array(fluxes)
+    )
+    np.testing.assert_array_equal(sim.get_sim_flux(mjds, 19.0, **params[0]), fluxes[0])
+
+
+@pytest.mark.parametrize("engine", ["serial", "linear"])
+def test_workers(engine, tmp_path):
+    tables = {}
+    for workers in [1, 2]:
+        loop = get_loop()
+        detec_tables_dir = tmp_path / f"workers{workers}"
+        loop.loop(
+            list(range(1, NUM_CONTROLS + 1)),
+            str(detec_tables_dir),
+            engine=engine,
+            workers=workers,
+            seed=ENTROPY,
+        )
+        tables[workers] = loop.sd
+    for sigma_kern in SIGMA_KERNS:
+        for peak_appmag in PEAK_APPMAGS:
+            pd.testing.assert_frame_equal(
+                tables[2].get_table(sigma_kern, peak_appmag).t,
+                tables[1].get_table(sigma_kern, peak_appmag).t,
+            )
+    for filename in os.listdir(tmp_path / "workers1"):
+        assert (tmp_path / "workers2" / filename).read_bytes() == (
+            tmp_path / "workers1" / filename
+        ).read_bytes()
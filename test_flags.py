@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+"""
+Check the flag writes of FlagColumn, FlagTransaction and ControlStack against the bitwise
+operations on the Mask column, with pandas copy-on-write enabled (the default of pandas 3),
+where the arrays returned by to_numpy() are read-only.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lightcurve import ControlStack
+from synthetic import make_lc
+
+
+@pytest.fixture(autouse=True)
+def copy_on_write():
+    if int(pd.__version__.split(".")[0]) < 3:
+        with pd.option_context("mode.copy_on_write", True):
+            yield
+    else:
+        yield
+
+
+def get_lc(N=50, seed=0, control_index=0):
+    lc = make_lc(
+        58000.0 + np.arange(N),
+        seed=seed,
+        control_index=control_index,
+        flags=[0, 0x1, 0x2, 0x3, 0x800000],
+    )
+    # the Mask column as pandas reads it without a dtype
+    lc.t["Mask"] = lc.t["Mask"].astype(np.int64)
+    return lc
+
+
+def test_set_and_clear():
+    lc = get_lc()
+    expected = lc.t["Mask"].to_numpy().astype(np.uint32)
+    indices = lc.getindices()[::3]
+
+    lc.flags.set(0x4, indices=indices)
+    expected[::3] |= 0x4
+    np.testing.assert_array_equal(lc.t["Mask"].to_numpy(), expected)
+
+    lc.flags.clear(0x1)
+    expected &= ~np.uint32(0x1)
+    np.testing.assert_array_equal(lc.t["Mask"].to_numpy(), expected)
+    assert lc.t["Mask"].dtype == np.uint32
+
+
+def test_transaction():
+    lc = get_lc()
+    expected = lc.t["Mask"].to_numpy().astype(np.uint32)
+    flagged = lc.t["uJy"].to_numpy() > 5.0
+
+    with lc.flags.transaction() as transaction:
+        transaction.update(0x2, flagged=flagged)
+        transaction.update(0x8, indices=lc.getindices()[:10], remove_old=False)
+    expected &= ~np.uint32(0x2)
+    expected[flagged] |= 0x2
+    expected[:10] |= 0x8
+    np.testing.assert_array_equal(lc.t["Mask"].to_numpy(), expected)
+    assert transaction.counts[0x2] == np.count_nonzero(flagged)
+
+
+def test_control_stack_flags():
+    lcs = {i: get_lc(seed=i, control_index=i) for i in range(4)}
+    expected = [lcs[i].t["Mask"].to_numpy().astype(np.uint32) for i in range(4)]
+    stack = ControlStack(lcs, list(range(4)))
+
+    flagged = stack.get("uJy") > 5.0
+    stack.update_flags(0x2, flagged)
+    for i in range(4):
+        expected[i] &= ~np.uint32(0x2)
+        expected[i][flagged[i]] |= 0x2
+        np.testing.assert_array_equal(lcs[i].t["Mask"].to_numpy(), expected[i])
+    np.testing.assert_array_equal(stack.get("Mask"), np.stack(expected))
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+
+"""
+Compare flux2mag_arrays and pdastroclass.flux2mag with the per-row flux2mag they replaced,
+which selected the magnitudes and the positive and negative upper limits with index sets
+and wrote each group into the table with .loc, including dflux=0, NaNs, and zero points.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pdastro import pdastroclass, flux2mag_arrays, AnotB
+from lightcurve import AveragedSupernova, AveragedLightCurve
+from synthetic import make_lc, make_sn
+
+
+def legacy_flux2mag(
+    table,
+    fluxcol,
+    dfluxcol,
+    magcol,
+    dmagcol,
+    indices=None,
+    zpt=None,
+    zptcol=None,
+    upperlim_Nsigma=None,
+):
+    """
+    the per-row pdastroclass.flux2mag
+    """
+    indices = table.getindices(indices)
+    if len(indices) == 0:
+        return 0
+
+    table.t.loc[indices, magcol] = np.nan
+    table.t.loc[indices, dmagcol] = np.nan
+
+    if upperlim_Nsigma is None:
+        indices_mag = indices
+        indices_ul = indices_ul_negative = []
+    else:
+        table.t.loc[indices, "__tmp_SN"] = (
+            table.t.loc[indices, fluxcol] / table.t.loc[indices, dfluxcol]
+        )
+        indices_validSN = table.ix_not_null("__tmp_SN", indices=indices)
+        indices_mag = table.ix_inrange(
+            ["__tmp_SN"], upperlim_Nsigma, indices=indices_validSN
+        )
+        indices_ul = AnotB(indices_validSN, indices_mag)
+        indices_ul_negative = table.ix_inrange(
+            ["__tmp_SN"], None, 0.0, indices=indices_ul
+        )
+
+    flux = table.t.loc[indices_mag, fluxcol].astype(np.float64)
+    dflux = table.t.loc[indices_mag, dfluxcol].astype(np.float64)
+    table.t.loc[indices_mag, magcol] = -2.5 * np.log10(flux)
+    table.t.loc[indices_mag, dmagcol] = 2.5 / np.log(10.0) * dflux / flux
+
+    if len(indices_ul) > 0:
+        table.t.loc[indices_ul, dmagcol] = np.nan
+        indices_ul_positive = AnotB(indices_ul, indices_ul_negative)
+        if len(indices_ul_positive) > 0:
+            table.t.loc[indices_ul_positive, magcol] = -2.5 * np.log10(
+                table.t.loc[indices_ul_positive, fluxcol].astype(np.float64)
+                + upperlim_Nsigma
+                * table.t.loc[indices_ul_positive, dfluxcol].astype(np.float64)
+            )
+        if len(indices_ul_negative) > 0:
+            table.t.loc[indices_ul_negative, magcol] = -2.5 * np.log10(
+                upperlim_Nsigma
+                * table.t.loc[indices_ul_negative, dfluxcol].astype(np.float64)
+            )
+
+    if not zpt is None:
+        table.t.loc[indices, magcol] += zpt
+    if not zptcol is None:
+        table.t.loc[indices, magcol] += table.t.loc[indices, zptcol]
+
+
+def get_table(seed=0, N=200):
+    rng = np.random.default_rng(seed)
+    lc = make_lc(
+        58000.0 + np.arange(N),
+        seed=seed,
+        flux=rng.choice([0.0, 30.0, 300.0], N),
+        nans=5,
+        ZP=rng.uniform(21.0, 22.0, N),
+    )
+    # zero and NaN uncertainties, zero flux, and measurements exactly at the limit
+    lc.t.loc[:4, "duJy"] = 0.0
+    lc.t.loc[:4, "uJy"] = [10.0, -10.0, 0.0, np.nan, 1e-3]
+    lc.t.loc[5:6, "duJy"] = np.nan
+    lc.t.loc[7:9, "uJy"] = [30.0, 45.0, 60.0]
+    lc.t.loc[7:9, "duJy"] = [10.0, 15.0, 20.0]
+    lc.t.index = np.arange(N) * 2
+    return lc
+
+
+def copy_table(lc):
+    table = pdastroclass()
+    table.t = lc.t.copy()
+    return table
+
+
+def assert_mags_equal(t, expected):
+    np.testing.assert_array_equal(t["m"].to_numpy(), expected["m"].to_numpy())
+    np.testing.assert_array_equal(t["dm"].to_numpy(), expected["dm"].to_numpy())
+
+
+@pytest.mark.parametrize("upperlim_Nsigma", [None, 3.0])
+@pytest.mark.parametrize("zpt", [None, 23.9])
+def test_flux2mag_arrays(upperlim_Nsigma, zpt):
+    lc = get_table()
+    expected = copy_table(lc)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        legacy_flux2mag(
+            expected, "uJy", "duJy", "m", "dm", zpt=zpt, upperlim_Nsigma=upperlim_Nsigma
+        )
+    mag, dmag = flux2mag_arrays(
+        lc.t["uJy"], lc.t["duJy"], zpt=zpt, upperlim_Nsigma=upperlim_Nsigma
+    )
+    assert_mags_equal(pd.DataFrame({"m": mag, "dm": dmag}), expected.t)
+
+    if not upperlim_Nsigma is None:
+        # dflux=0: infinite S/N is a magnitude, NaN S/N is neither a magnitude nor an upper limit
+        assert np.isfinite(mag[0]) and dmag[0] == 0.0
+        assert mag[1] == np.inf and np.isnan(dmag[1])
+        assert np.isnan(mag[2]) and np.isnan(mag[3])
+        # upper limits at S/N exactly at the limit are magnitudes
+        assert np.isfinite(dmag[7:10]).all()
+
+
+@pytest.mark.parametrize("upperlim_Nsigma", [None, 3.0])
+def test_flux2mag(upperlim_Nsigma):
+    lc = get_table(seed=1)
+    lc.t["m"] = 99.0
+    lc.t["dm"] = 99.0
+    expected = copy_table(lc)
+    indices = lc.getindices()[::3]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        legacy_flux2mag(
+            expected,
+            "uJy",
+            "duJy",
+            "m",
+            "dm",
+            indices=indices,
+            zpt=0.1,
+            zptcol="ZP",
+            upperlim_Nsigma=upperlim_Nsigma,
+        )
+    lc.flux2mag(
+        "uJy",
+        "duJy",
+        "m",
+        "dm",
+        indices=indices,
+        zpt=0.1,
+        zptcol="ZP",
+        upperlim_Nsigma=upperlim_Nsigma,
+    )
+    assert_mags_equal(lc.t, expected.t)
+
+
+def test_averaged_supernova_flux2mag():
+    sn = make_sn(
+        58000.5 + np.arange(60),
+        4,
+        sn_class=AveragedSupernova,
+        lc_class=AveragedLightCurve,
+        flux=20.0,
+        nans=3,
+    )
+    expected = {}
+    for control_index, lc in sn.avg_lcs.items():
+        expected[control_index] = copy_table(lc)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            legacy_flux2mag(
+                expected[control_index],
+                "uJy",
+                "duJy",
+                "m",
+                "dm",
+                zpt=23.9,
+                upperlim_Nsigma=3.0,
+            )
+
+    sn.flux2mag()
+    for control_index, lc in sn.avg_lcs.items():
+        assert_mags_equal(lc.t, expected[control_index].t)
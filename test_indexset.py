@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+"""
+Compare the IndexSet algebra with the sort-based numpy set operations that AandB, AnotB, AorB
+and not_AandB use for index arrays.
+"""
+
+import numpy as np
+import pytest
+
+from pdastro import inrange, notnull
+from lightcurve import AandB, AnotB, AorB, not_AandB
+from synthetic import make_lc
+
+
+def get_table(N=200, seed=0, shuffle=False):
+    rng = np.random.default_rng(seed)
+    table = make_lc(
+        58000.0 + np.arange(N),
+        seed=seed,
+        nans=10,
+        **{"chi/N": rng.uniform(0.0, 20.0, N)},
+    )
+    table.t.index = np.arange(N) * 3
+    if shuffle:
+        table.t = table.t.iloc[rng.permutation(N)]
+    return table
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+@pytest.mark.parametrize("setop", [AandB, AnotB, AorB, not_AandB])
+def test_indexset_algebra(setop, shuffle):
+    table = get_table(shuffle=shuffle)
+    A = table.indexset(predicate=inrange("chi/N", uplim=10))
+    B = table.indexset(indices=table.t.index.values[:150], predicate=notnull("uJy"))
+    expected = setop(
+        table.ix_inrange("chi/N", uplim=10),
+        table.ix_not_null("uJy", indices=table.t.index.values[:150]),
+    )
+    result = setop(A, B)
+    assert len(result) == len(expected)
+    np.testing.assert_array_equal(result.get_indices(), expected)
+
+
+def test_indexset_of_other_table():
+    with pytest.raises(RuntimeError):
+        AandB(get_table().indexset(), get_table(N=100).indexset())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+"""
+Compare the rolling sums of the kernel bank with pandas' gaussian rolling sum,
+which SimDetecLightCurve.apply_rolling_sum used before the kernel bank.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from kernel_bank import GaussianKernelBank
+
+SIGMA_KERNS = [5, 40, 80, 150, 200]
+
+
+def pandas_rolling_sum(SNR, sigma_kern, mjdbinsize=1.0):
+    sigma = round(sigma_kern / mjdbinsize)
+    windowsize = int(6 * sigma)
+    halfwindowsize = int(windowsize * 0.5) + 1
+
+    l = len(SNR)
+    dataindices = np.array(range(l) + np.full(l, halfwindowsize))
+    temp = pd.Series(np.zeros(l + 2 * halfwindowsize), dtype=np.float64)
+    temp[dataindices] = SNR
+    SNRsum = temp.rolling(windowsize, center=True, win_type="gaussian").sum(std=sigma)
+    return SNRsum[dataindices].to_numpy()
+
+
+def get_SNR(l=1500, seed=0):
+    SNR = np.random.default_rng(seed).normal(size=l)
+    # an unmasked bin with duJy=0, and one with uJy=NaN
+    SNR[700] = np.inf
+    SNR[1100] = np.nan
+    return SNR
+
+
+def assert_same_sums(sums, expected):
+    np.testing.assert_array_equal(np.isnan(sums), np.isnan(expected))
+    finite = ~np.isnan(expected)
+    np.testing.assert_allclose(sums[finite], expected[finite], rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("sigma_kern", SIGMA_KERNS)
+def test_rolling_sum_with_inf(sigma_kern):
+    SNR = get_SNR()
+    kernel = GaussianKernelBank().get_kernel(sigma_kern)
+    assert_same_sums(kernel.rolling_sum(SNR), pandas_rolling_sum(SNR, sigma_kern))
+
+
+def test_rolling_sums_with_inf():
+    SNR = get_SNR()
+    sums = GaussianKernelBank().rolling_sums(SNR, SIGMA_KERNS)
+    for sigma_kern in SIGMA_KERNS:
+        assert_same_sums(sums[sigma_kern], pandas_rolling_sum(SNR, sigma_kern))
+
+
+@pytest.mark.parametrize("sigma_kern", SIGMA_KERNS)
+def test_local_rolling_sum_with_inf(sigma_kern):
+    sim_SNR = np.zeros(1500)
+    sim_SNR[650:760] = np.random.default_rng(1).normal(size=110)
+    sim_SNR[700] = -np.inf
+
+    kernel = GaussianKernelBank().get_kernel(sigma_kern)
+    start, local_sum = kernel.local_rolling_sum(sim_SNR)
+    expected = pandas_rolling_sum(sim_SNR, sigma_kern)
+    assert_same_sums(local_sum, expected[start : start + len(local_sum)])
+    # outside of the local sum, the rolling sum is 0
+    assert np.all(expected[:start] == 0.0)
+    assert np.all(expected[start + len(local_sum) :] == 0.0)
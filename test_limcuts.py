@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+"""
+Compare the contamination and loss of LimCutsTable.calculate_rows with the counts of the
+row-by-row ix_inrange queries it replaced, including NaN chi/N and NaN uJy/duJy.
+Check that the view of the control light curves that feeds it only reads the control rows.
+"""
+
+import numpy as np
+import pytest
+
+from pdastro import AandB, AnotB
+from lightcurve import LimCutsTable
+from synthetic import make_lc, make_sn
+
+STN_BOUND = 3
+X2_MAX_VALUES = [-1, 0, 1, 2.5, 3, 5, 10, 20, 50, np.inf]
+
+
+def get_lc(seed=0, N=1000):
+    rng = np.random.default_rng(seed)
+    lc = make_lc(
+        58000.0 + np.arange(N),
+        seed=seed,
+        outliers=N // 5,
+        nans=20,
+        **{"chi/N": np.round(rng.exponential(5.0, N), 1)},
+    )
+    lc.t["uJy/duJy"] = lc.t["uJy"] / lc.t["duJy"]
+    lc.t.loc[rng.choice(N, 20, replace=False), "chi/N"] = np.nan
+    # measurements exactly at the bounds
+    lc.t.loc[:4, "uJy/duJy"] = [STN_BOUND, -STN_BOUND, 0.0, STN_BOUND, -STN_BOUND]
+    lc.t.loc[:4, "chi/N"] = [5, 10, 3, 2.5, 0]
+    lc.t.index = np.arange(N) * 2
+    return lc
+
+
+def legacy_row(lc, indices, x2_max):
+    """
+    contamination and loss of one chi-square cut with index set algebra
+    """
+    good_ix = lc.ix_inrange(
+        colnames=["uJy/duJy"], lowlim=-STN_BOUND, uplim=STN_BOUND, indices=indices
+    )
+    bad_ix = AnotB(indices, good_ix)
+    kept_ix = lc.ix_inrange(colnames=["chi/N"], uplim=x2_max, indices=indices)
+    cut_ix = AnotB(indices, kept_ix)
+    N = len(indices)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "PSF Chi-Square Cut": x2_max,
+            "N": N,
+            "Ngood": len(good_ix),
+            "Nbad": len(bad_ix),
+            "Nkept": len(kept_ix),
+            "Ncut": len(cut_ix),
+            "Ngood,kept": len(AandB(good_ix, kept_ix)),
+            "Ngood,cut": len(AandB(good_ix, cut_ix)),
+            "Nbad,kept": len(AandB(bad_ix, kept_ix)),
+            "Nbad,cut": len(AandB(bad_ix, cut_ix)),
+            "Pgood,kept": 100 * len(AandB(good_ix, kept_ix)) / N,
+            "Pgood,cut": 100 * len(AandB(good_ix, cut_ix)) / N,
+            "Pbad,kept": 100 * len(AandB(bad_ix, kept_ix)) / N,
+            "Pbad,cut": 100 * len(AandB(bad_ix, cut_ix)) / N,
+            "Ngood,kept/Ngood": 100
+            * len(AandB(good_ix, kept_ix))
+            / np.float64(len(good_ix)),
+            "Ploss": 100 * len(AandB(good_ix, cut_ix)) / np.float64(len(good_ix)),
+            "Pcontamination": 100
+            * len(AandB(bad_ix, kept_ix))
+            / np.float64(len(kept_ix)),
+        }
+
+
+@pytest.mark.parametrize("subset", [False, True])
+@pytest.mark.parametrize("seed", range(3))
+def test_calculate_rows(seed, subset):
+    lc = get_lc(seed)
+    indices = lc.getindices()[::3] if subset else lc.getindices()
+    data = LimCutsTable(
+        lc, STN_BOUND, indices=indices if subset else None
+    ).calculate_rows(X2_MAX_VALUES)
+    for i, x2_max in enumerate(X2_MAX_VALUES):
+        expected = legacy_row(lc, indices, x2_max)
+        for key, value in expected.items():
+            np.testing.assert_array_equal(
+                data[key][i], value, err_msg=f"{key} for cut {x2_max}"
+            )
+
+
+def test_controls_view():
+    sn = make_sn(58000.0 + np.arange(50), 3)
+    for lc in sn.lcs.values():
+        lc.t["uJy/duJy"] = lc.t["uJy"] / lc.t["duJy"]
+    controls = np.concatenate([sn.lcs[i].t["uJy/duJy"].to_numpy() for i in range(1, 4)])
+
+    view = sn.get_controls_view()
+    np.testing.assert_array_equal(view.get("uJy/duJy"), controls)
+    # the SN light curve is not stacked for the view
+    assert not "uJy/duJy" in sn.stack.columns
+    assert not view.get("uJy/duJy").flags.writeable
+
+    # once the stack has the column, the view uses it without a copy
+    stacked = sn.stack.get("uJy/duJy")
+    values = view.get("uJy/duJy")
+    np.testing.assert_array_equal(values, controls)
+    assert np.shares_memory(values, stacked)
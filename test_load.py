@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+"""
+Load a small ATLAS light curve with read_lc_file: the declared dtypes, the decoded hexadecimal Mask,
+the integer uJy/duJy, and a byte-identical round trip when the loaded light curve is saved again.
+Load an SN and its control light curves with Supernova.load_all from a directory with missing and corrupt control files.
+"""
+
+import numpy as np
+import pytest
+
+from lightcurve import (
+    LightCurve,
+    AveragedLightCurve,
+    Supernova,
+    LC_COLUMN_DTYPES,
+    get_filename,
+)
+
+ATLAS_LC = """\
+###MJD m dm uJy duJy F err chi/N RA Dec x y maj min phi apfit mag5sig Sky Obs Mask
+58000.123456 17.500 0.020 3631 67 o 0 1.23 150.00000 -20.00000 5000.00 5000.00 2.50 2.30 -45.0 -0.400 19.50 19.20 01a58000o0001o 0x0
+58001.234567 -17.600 0.030 -120 70 c 0 0.98 150.00000 -20.00000 5001.00 4999.00 2.60 2.20 -44.0 -0.410 19.40 19.10 02a58001o0002c 0x200
+58002.345678 None None 45 71 o 0 12.50 150.00000 -20.00000 5002.00 4998.00 2.55 2.25 -43.0 -0.420 19.30 19.00 01a58002o0003o 0x800003
+"""
+
+AVG_LC = """\
+MJD MJDbin uJy duJy stdev x2 Nclip Ngood Nexcluded Mask
+58000.5 58000.5 12.5 3.2 4.1 1.2 0 4 0 0x0000
+NaN 58001.5 NaN NaN NaN NaN 0 0 0 0x800000
+"""
+
+
+def load(tmp_path, text, lc_class=LightCurve, name="lc.txt"):
+    filename = tmp_path / name
+    filename.write_text(text)
+    lc = lc_class()
+    lc.load_lc_by_filename(str(filename))
+    return lc
+
+
+def test_load_atlas_lc(tmp_path):
+    lc = load(tmp_path, ATLAS_LC)
+    assert lc.t.columns[0] == "MJD"
+    for col in lc.t.columns.intersection(list(LC_COLUMN_DTYPES)):
+        dtype = LC_COLUMN_DTYPES[col]
+        if dtype is str:
+            assert lc.t[col].dtype.kind in "OT", col
+        else:
+            assert lc.t[col].dtype == dtype, col
+    assert lc.t["uJy"].dtype == np.int64
+    assert lc.t["duJy"].dtype == np.int64
+    assert lc.t["Mask"].dtype == np.uint32
+    assert lc.t["Mask"].tolist() == [0, 0x200, 0x800003]
+    assert lc.t["uJy"].tolist() == [3631, -120, 45]
+    assert np.isnan(lc.t.loc[2, "m"])
+    assert lc.t["F"].tolist() == ["o", "c", "o"]
+
+    lc.flags.set(0x1, indices=[0])
+    assert lc.t["Mask"].tolist() == [0x1, 0x200, 0x800003]
+
+
+def test_round_trip(tmp_path):
+    lc = load(tmp_path, ATLAS_LC)
+    lc.save_lc_by_filename(str(tmp_path / "saved.txt"))
+    saved = (tmp_path / "saved.txt").read_text()
+
+    reloaded = LightCurve()
+    reloaded.load_lc_by_filename(str(tmp_path / "saved.txt"))
+    assert reloaded.t.dtypes.to_dict() == lc.t.dtypes.to_dict()
+    assert reloaded.t.equals(lc.t)
+    reloaded.save_lc_by_filename(str(tmp_path / "resaved.txt"))
+    assert (tmp_path / "resaved.txt").read_text() == saved
+
+
+def test_load_averaged_lc(tmp_path):
+    lc = load(tmp_path, AVG_LC, lc_class=AveragedLightCurve)
+    assert lc.t["Mask"].dtype == np.uint32
+    assert lc.t["Mask"].tolist() == [0, 0x800000]
+    assert lc.t["uJy"].dtype == np.float64
+
+    lc.save_lc_by_filename(str(tmp_path / "saved.txt"))
+    reloaded = load(
+        tmp_path, (tmp_path / "saved.txt").read_text(), AveragedLightCurve, "copy.txt"
+    )
+    assert reloaded.t.equals(lc.t)
+    reloaded.save_lc_by_filename(str(tmp_path / "resaved.txt"))
+    assert (tmp_path / "resaved.txt").read_text() == (
+        tmp_path / "saved.txt"
+    ).read_text()
+
+
+def write_controls(tmp_path, control_texts):
+    for control_index, text in control_texts.items():
+        filename = (
+            tmp_path / get_filename("", "2020abc", control_index=control_index)[1:]
+        )
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        filename.write_text(text)
+
+
+@pytest.fixture
+def controls_dir(tmp_path):
+    # control 2 is missing, 3 has no uJy column, and 5 has an invalid Mask
+    write_controls(
+        tmp_path,
+        {
+            0: ATLAS_LC,
+            1: ATLAS_LC,
+            3: ATLAS_LC.replace(" uJy ", " flux "),
+            4: ATLAS_LC,
+            5: ATLAS_LC.replace("0x200", "0xZZZ"),
+            6: ATLAS_LC,
+            7: ATLAS_LC,
+        },
+    )
+    return tmp_path
+
+
+def test_load_all(controls_dir, capsys):
+    sn = Supernova(tnsname="2020abc")
+    sn.load_all(str(controls_dir), num_controls=3, max_workers=2)
+    assert list(sn.lcs.keys()) == [0, 1, 4, 6]
+    assert sn.num_controls == 3
+    assert sn.lcs[6].control_index == 6
+    skipped = [
+        line for line in capsys.readouterr().out.splitlines() if "skipping" in line
+    ]
+    assert len(skipped) == 3
+    assert skipped[0].startswith("Could not load control light curve 2 (no such file)")
+    assert skipped[1].startswith("Could not load control light curve 3 (")
+    assert "uJy" in skipped[1]
+    assert skipped[2].startswith("Could not load control light curve 5 (")
+    assert "0xZZZ" in skipped[2]
+
+
+def test_load_all_too_few(controls_dir):
+    sn = Supernova(tnsname="2020abc")
+    with pytest.raises(RuntimeError, match="Could only load 4 of 5"):
+        sn.load_all(str(controls_dir), num_controls=5)
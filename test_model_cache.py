@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+"""
+Load the same model file into several Models: MODEL_CACHE reads the file once, all Models share
+its read-only template arrays, and each Model gets its own copy of the loaded table.
+"""
+
+import numpy as np
+import pytest
+
+import generate_detec_table
+from generate_detec_table import Model, MODEL_CACHE
+
+MODEL = """\
+MJD m
+0.0 21.0
+1.0 19.5
+2.0 19.0
+3.0 19.8
+4.0 20.6
+"""
+
+
+@pytest.fixture
+def model_file(tmp_path):
+    filename = tmp_path / "model.txt"
+    filename.write_text(MODEL)
+    MODEL_CACHE.clear()
+    yield str(filename)
+    MODEL_CACHE.clear()
+
+
+def test_model_cache(model_file, monkeypatch):
+    loads = []
+    load = Model.load
+
+    def counting_load(self, filename, **kwargs):
+        loads.append(filename)
+        load(self, filename, **kwargs)
+
+    monkeypatch.setattr(generate_detec_table.Model, "load", counting_load)
+
+    a = Model(model_file, mjd_colname="MJD", mag_colname="m")
+    b = Model(model_file, mjd_colname="MJD", mag_colname="m")
+    assert len(loads) == 1
+    assert len(MODEL_CACHE) == 1
+
+    # the templates are shared and read-only
+    assert a.template_mjds is b.template_mjds
+    assert a.template_flux is b.template_flux
+    np.testing.assert_array_equal(a.template_mjds, [-2.0, -1.0, 0.0, 1.0, 2.0])
+    assert a.template_flux[2] == 1.0
+    with pytest.raises(ValueError):
+        a.template_flux[0] = 0.0
+
+    # the tables are not
+    a.t.loc[0, "uJy"] = 0.0
+    assert b.t.loc[0, "uJy"] != 0.0
+    assert not np.shares_memory(a.t["uJy"].to_numpy(), b.t["uJy"].to_numpy())
+    cached, _, _ = MODEL_CACHE[(model_file, "MJD", "m", False)]
+    assert cached.loc[0, "uJy"] != 0.0
+
+    # another file is another cache entry
+    other_file = model_file.replace("model.txt", "other.txt")
+    with open(other_file, "w") as f:
+        f.write(MODEL)
+    c = Model(other_file, mjd_colname="MJD", mag_colname="m")
+    assert loads == [model_file, other_file]
+    assert not c.template_flux is a.template_flux
+
+
+def test_model_sim_flux(model_file):
+    model = Model(model_file, mjd_colname="MJD", mag_colname="m")
+    mjds = 60000.0 + np.arange(-3.0, 4.0, 0.5)
+    flux = model.get_sim_flux(mjds, 18.0, peak_mjd=60000.0)
+    expected = 10 ** (-0.4 * (18.0 - 23.9)) * np.interp(
+        mjds - 60000.0,
+        [-2.0, -1.0, 0.0, 1.0, 2.0],
+        10 ** (-0.4 * (np.array([21.0, 19.5, 19.0, 19.8, 20.6]) - 19.0)),
+        left=0,
+        right=0,
+    )
+    np.testing.assert_allclose(flux, expected, rtol=1e-12)
+    np.testing.assert_array_equal(
+        model.get_sim_fluxes(mjds, 18.0, [{"peak_mjd": 60000.0}] * 2), [flux, flux]
+    )
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+"""
+Compare the sigma-clipping kernel (sigmacut_stats, sigmacut_rows) with the pandas loop of
+pdastrostatsclass.calcaverage_sigmacutloop, which calculated all statistics before the kernel.
+The results must be identical, not only close.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pdastro import pdastrostatsclass, sigmacut_stats, sigmacut_rows
+from synthetic import make_lc
+
+STATKEYS = [
+    "mean",
+    "mean_err",
+    "stdev",
+    "stdev_err",
+    "X2norm",
+    "Ngood",
+    "Nclip",
+    "Nchanged",
+    "Nmask",
+    "Nnan",
+    "converged",
+    "i",
+]
+
+
+def get_data(seed, N=300):
+    rng = np.random.default_rng(seed)
+    # outliers, NaNs, and masked measurements
+    lc = make_lc(
+        58000.0 + np.arange(N),
+        seed=seed,
+        flux=rng.uniform(-5.0, 5.0),
+        outliers=N // 10,
+        nans=3,
+        flags=[0] * 19 + [0x4],
+    )
+    uJy, duJy, Mask = (lc.t[col].to_numpy(copy=True) for col in ["uJy", "duJy", "Mask"])
+    duJy[rng.choice(N, 2, replace=False)] = np.nan
+    return uJy, duJy, Mask
+
+
+def legacy_statparams(uJy, duJy, Mask, **kwargs):
+    stats = pdastrostatsclass()
+    stats.t = pd.DataFrame({"uJy": uJy, "duJy": duJy, "Mask": Mask})
+    # verbose skips the array fast path, so that the pandas loop is used
+    stats.calcaverage_sigmacutloop(
+        "uJy", maskcol="Mask", maskval=0x4, verbose=1, **kwargs
+    )
+    return stats.statparams
+
+
+def assert_identical(result, statparams):
+    for k in STATKEYS:
+        assert result[k] == statparams[k], k
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("sigmacutFlag", [False, True])
+def test_sigmacut_stats(seed, sigmacutFlag):
+    uJy, duJy, Mask = get_data(seed)
+    statparams = legacy_statparams(
+        uJy, duJy, Mask, noisecol="duJy", sigmacutFlag=sigmacutFlag, Nsigma=3.0
+    )
+    result = sigmacut_stats(
+        uJy, duJy, mask=(Mask & 0x4) > 0, sigmacutFlag=sigmacutFlag, Nsigma=3.0
+    )
+    assert_identical(result._asdict(), statparams)
+    np.testing.assert_array_equal(result.ix_good, statparams["ix_good"])
+    np.testing.assert_array_equal(result.ix_clip, statparams["ix_clip"])
+
+
+@pytest.mark.parametrize("Nsigma", [None, 2.0])
+def test_sigmacut_stats_without_noise(Nsigma):
+    uJy, duJy, Mask = get_data(0)
+    statparams = legacy_statparams(uJy, duJy, Mask, Nsigma=Nsigma)
+    result = sigmacut_stats(uJy, mask=(Mask & 0x4) > 0, Nsigma=Nsigma)
+    assert_identical(result._asdict(), statparams)
+
+
+def test_sigmacut_rows():
+    data = [get_data(seed, N=120) for seed in range(30)]
+    # rows with a single or no good value
+    data[3][0][1:] = np.nan
+    data[4][0][:] = np.nan
+    uJy, duJy, Mask = (np.array(values) for values in zip(*data))
+    stats = sigmacut_rows(uJy, duJy, valid=(Mask & 0x4) == 0, Nsigma=3.0)
+    for row in range(len(uJy)):
+        statparams = legacy_statparams(
+            uJy[row], duJy[row], Mask[row], noisecol="duJy", Nsigma=3.0
+        )
+        for k in STATKEYS:
+            if statparams[k] is None:
+                assert np.isnan(stats[k][row]), k
+            else:
+                assert stats[k][row] == statparams[k], k
+        np.testing.assert_array_equal(
+            np.where(stats["ix_good"][row])[0], statparams["ix_good"]
+        )
+
+
+@pytest.mark.parametrize("sigmacutFlag", [False, True])
+def test_sigmacut_rows_at_limits(sigmacutFlag):
+    # values on a grid with a large offset, so that many of them are within rounding of their limit
+    # after the first iteration, and the running sums have to fall back to summing up all good values
+    rng = np.random.default_rng(1)
+    uJy = 1e6 + 0.1 * rng.integers(-3, 4, (100, 8))
+    uJy[:, 0] += 0.1 * rng.integers(3, 8, 100)
+    duJy = np.full(uJy.shape, 0.1)
+    Mask = np.zeros(uJy.shape, dtype=int)
+    stats = sigmacut_rows(
+        uJy, duJy, sigmacutFlag=sigmacutFlag, Nsigma=1.0, median_firstiteration=False
+    )
+    assert (stats["i"] >= 3).any()
+    for row in range(len(uJy)):
+        statparams = legacy_statparams(
+            uJy[row],
+            duJy[row],
+            Mask[row],
+            noisecol="duJy",
+            sigmacutFlag=sigmacutFlag,
+            Nsigma=1.0,
+            median_firstiteration=False,
+        )
+        for k in STATKEYS:
+            if statparams[k] is None:
+                assert np.isnan(stats[k][row]), k
+            else:
+                assert stats[k][row] == statparams[k], k
+        np.testing.assert_array_equal(
+            np.where(stats["ix_good"][row])[0], statparams["ix_good"]
+        )
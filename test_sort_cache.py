@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+"""
+Check that the values cached with pdastroclass.getcached, e.g. the sort orders of getsortpositions,
+are calculated again after rows are added with newrow, a column is assigned, the table is replaced,
+or modified() is called, and that the cached sort orders match a stable sort of the current table.
+"""
+
+import numpy as np
+import pytest
+
+from synthetic import make_lc
+
+
+def get_lc(N=50, seed=0):
+    rng = np.random.default_rng(seed)
+    # repeated MJDs, so that the order of equal values matters
+    return make_lc(58000.0 + rng.integers(0, 20, N), seed=seed, flags=[0, 0x1, 0x2])
+
+
+def expected_positions(lc, cols):
+    t = lc.t[cols].reset_index(drop=True)
+    return t.sort_values(cols, kind="stable").index.values
+
+
+def counting(lc, cols):
+    calls = []
+
+    def func():
+        calls.append(None)
+        return lc.t[cols].sum().sum()
+
+    return calls, lambda: lc.getcached("test", cols, func)
+
+
+def test_getcached():
+    lc = get_lc()
+    calls, get = counting(lc, ["uJy"])
+    value = get()
+    assert get() == value
+    assert len(calls) == 1
+
+    # rows added with newrow
+    lc.newrow({"MJD": 58100.0, "uJy": 1000.0, "duJy": 10.0, "Mask": 0})
+    assert get() == value + 1000.0
+    assert len(calls) == 2
+
+    # column assignment
+    lc.t["uJy"] = lc.t["uJy"] + 1.0
+    assert get() == value + 1000.0 + len(lc.t)
+    assert len(calls) == 3
+
+    # assigning another column does not change the cached value
+    lc.t["duJy"] = 2.0 * lc.t["duJy"]
+    get()
+    assert len(calls) == 3
+
+    # in-place edits with modified()
+    lc.t.loc[0, "uJy"] += 500.0
+    lc.modified()
+    assert get() == value + 1500.0 + len(lc.t)
+    assert len(calls) == 4
+
+    # a new table
+    lc.t = lc.t.iloc[:10].copy()
+    get()
+    assert len(calls) == 5
+
+
+@pytest.mark.parametrize("cols", [["MJD"], ["MJD", "uJy"]])
+def test_getsortpositions(cols):
+    lc = get_lc()
+    positions = lc.getsortpositions(cols)
+    np.testing.assert_array_equal(positions, expected_positions(lc, cols))
+    assert lc.getsortpositions(cols) is positions
+
+    lc.newrow({"MJD": 57999.0, "uJy": 0.0, "duJy": 10.0, "Mask": 0})
+    positions = lc.getsortpositions(cols)
+    assert positions[0] == len(lc.t) - 1
+    np.testing.assert_array_equal(positions, expected_positions(lc, cols))
+
+    lc.t["MJD"] = lc.t["MJD"].to_numpy()[::-1]
+    np.testing.assert_array_equal(
+        lc.getsortpositions(cols), expected_positions(lc, cols)
+    )
+
+    lc.t.loc[lc.t.index[-1], "MJD"] = 60000.0
+    lc.modified()
+    positions = lc.getsortpositions(cols)
+    assert positions[-1] == len(lc.t) - 1
+    np.testing.assert_array_equal(positions, expected_positions(lc, cols))
+
+    # descending order is cached separately
+    np.testing.assert_array_equal(
+        lc.getsortpositions(cols, ascending=False),
+        lc.t[cols]
+        .reset_index(drop=True)
+        .sort_values(cols, ascending=False, kind="stable")
+        .index.values,
+    )
+
+
+def test_ix_sort_by_cols():
+    lc = get_lc()
+    lc.t.index = np.arange(len(lc.t)) * 3
+    indices = lc.getindices()[::2]
+    np.testing.assert_array_equal(
+        lc.ix_sort_by_cols("MJD", indices=indices),
+        lc.t.loc[indices].sort_values("MJD", kind="stable").index.values,
+    )
+
+    lc.add2row(indices[0], {"MJD": 0.0})
+    assert lc.ix_sort_by_cols("MJD", indices=indices)[0] == indices[0]
+    assert lc.ix_sort_by_cols("MJD")[0] == indices[0]
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""
+Pin the dtypes of the tables that are built with the row buffer of pdrowbuffer:
+rows added to a blank table get the declared column dtypes, and keep them when more rows are added later.
+"""
+
+import numpy as np
+import pandas as pd
+
+from clean import UncertEstTable, ChiSquareCutTable
+from download import ControlCoordinatesTable
+from lightcurve import SnInfoTable, Coordinates
+
+
+def assert_dtypes(t, dtypes):
+    for col, dtype in dtypes.items():
+        assert t[col].dtype == dtype, col
+
+
+def uncert_est_row(tnsname, filt):
+    return {
+        "tnsname": tnsname,
+        "filter": filt,
+        "sigma_extra": 0.0,
+        "sigma_typical_old": 12.5,
+        "sigma_typical_new": 13.0,
+        "sigma_typical_new_pct_greater": 4.0,
+        "recommended": False,
+        "applied": True,
+    }
+
+
+def test_uncert_est_table(tmp_path):
+    table = UncertEstTable(str(tmp_path))
+    table.add_row(uncert_est_row("2020abc", "o"))
+    assert_dtypes(table.t, UncertEstTable.coldtypes)
+    table.add_row(uncert_est_row("2020abc", "c"))
+    table.add_row(uncert_est_row("2021xyz", "o"))
+    assert len(table.t) == 3
+    assert_dtypes(table.t, UncertEstTable.coldtypes)
+
+
+def test_chi_square_cut_table(tmp_path):
+    table = ChiSquareCutTable(str(tmp_path))
+    for tnsname in ["2020abc", "2021xyz"]:
+        table.add_row(
+            {
+                "tnsname": tnsname,
+                "filter": "o",
+                "x2_cut": 10,
+                "use_pre_mjd0_lc": False,
+                "stn_bound": 3,
+                "pct_contamination": 4.21,
+                "pct_loss": 1.5,
+            }
+        )
+        assert_dtypes(table.t, ChiSquareCutTable.coldtypes)
+    assert list(table.t.columns[:2]) == ["tnsname", "filter"]
+
+
+def test_sninfo_table(tmp_path):
+    table = SnInfoTable(str(tmp_path))
+    table.update_row("2020abc", mjd0=58000.0)
+    coords = Coordinates("10:00:00.00", "-20:00:00.0")
+    table.update_row("2021xyz", coords=coords)
+    assert_dtypes(table.t, SnInfoTable.coldtypes)
+    assert np.isnan(table.t.loc[1, "mjd0"])
+    assert table.t.loc[1, "ra"] == f"{coords.ra.angle.degree:0.14f}"
+
+
+def test_control_coordinates_table():
+    table = ControlCoordinatesTable()
+    table.t = pd.DataFrame(columns=list(ControlCoordinatesTable.coldtypes))
+    table.add_row("2020abc", 0, Coordinates("10:00:00.00", "-20:00:00.0"), n_detec=100)
+    table.add_row(
+        np.nan,
+        1,
+        Coordinates("10:00:01.00", "-20:00:00.0"),
+        ra_offset="0.00416666666667",
+        radius=17,
+    )
+    assert_dtypes(table.t, ControlCoordinatesTable.coldtypes)
+    assert table.t["n_detec"].tolist() == [100, 0]